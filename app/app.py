@@ -1,22 +1,60 @@
-from flask import Flask, jsonify, request
-import gspread
-import pandas as pd
+from flask import Flask, g, jsonify, request
 import os
+import time
+from urllib.parse import unquote
+
+from sheet_cache import SheetCache, SheetCacheError
+from sheet_index import build_indexes
+from compression import accepts, choose_encoding, compress_stream, encoded_body, precompress, variant_etag
+from sheet_loader import open_spreadsheet
+from sheet_watcher import SheetWatcher, start_polling
+from shared_snapshot import SharedSnapshotLoader
+import metrics
+import snapshot_store
+from response_cache import ResponseCache
+from sheet_query import NDJSON_MIMETYPE, FilterSpec, QueryError, SheetQuery, SheetSpec, compile_sheet
+from sheet_search import SearchQuery, build_search_index
+from sheet_batch import BatchQuery
+from upstream_proxy import ProxyError, UpstreamProxy
 
 app = Flask(__name__)
 
 # --- Global Cache ---
-# We will store the data here after it's loaded once to minimize calls to Google Sheets
-# and improve response times for subsequent requests.
-_spreadsheet_data_cache = None
+# Spreadsheet data is held in a SheetCache (see sheet_cache.py) rather than loaded once
+# and kept forever. The cache refreshes stale data on a background thread, shares a
+# single load between concurrent requests on a cold start, and keeps serving the last
+# good snapshot (with retry backoff) if Google Sheets has a transient failure.
+# Which worksheets are loaded, and how each one's header row and column types are
+# parsed, is declared once in sheet_loader.WORKSHEET_SCHEMAS (shared with sheets_reader.py).
 
-def get_data():
+# On startup the cache is filled from the local on-disk snapshot (see snapshot_store.py),
+# if one exists, and then reconciled with Google Sheets in the background.
+# SHEETS_OFFLINE=1 serves from the local snapshot only and never contacts Google Sheets
+# (for tests and air-gapped deployments). SNAPSHOT_AUTOSAVE=0 stops successful Sheets
+# loads from being written back to disk.
+OFFLINE_MODE = os.environ.get("SHEETS_OFFLINE", "0") == "1"
+SNAPSHOT_AUTOSAVE = os.environ.get("SNAPSHOT_AUTOSAVE", "1") != "0"
+
+# Tracks the spreadsheet's Drive revision and per-worksheet checksums between loads,
+# so a refresh of unchanged data costs one metadata request (see sheet_watcher.py).
+sheet_watcher = SheetWatcher(open_spreadsheet)
+
+# SHARED_SNAPSHOT=1 makes the worker processes of one instance share the data: one of
+# them loads from Google Sheets and publishes to SNAPSHOT_DIR, and every worker serves
+# the published version memory-mapped from there (see shared_snapshot.py), so scaling
+# gunicorn's --workers no longer multiplies Sheets calls or resident data.
+SHARED_SNAPSHOT = os.environ.get("SHARED_SNAPSHOT", "0") == "1"
+shared_loader = SharedSnapshotLoader(sheet_watcher, can_lead=not OFFLINE_MODE) if SHARED_SNAPSHOT else None
+
+# Fetches Census and VA API URLs for '/proxy' through a pooled HTTP client and an
+# on-disk response cache shared by the worker processes (see upstream_proxy.py).
+upstream_proxy = UpstreamProxy()
+
+def load_spreadsheet_data():
     """
-    This function manages the retrieval of spreadsheet data.
-    It first checks a global cache (_spreadsheet_data_cache). If the cache is already
-    populated, it returns the cached data immediately.
-    If the cache is empty (e.g., on the first request to the API), it loads the data
-    from the specified Google Sheet and then populates the cache for future use.
+    Loads the configured worksheets from Google Sheets if they changed. This does no
+    caching of its own; it is the loader function that the SheetCache calls on cold
+    start and on refresh.
 
     Expected Data:
         - Google Sheets service account key file ('vista-api-backend-6578a1a1c769.json')
@@ -25,52 +63,275 @@ def get_data():
           "VA Data Census Bureau APIs", "Census Bureau APIs - Full List",
           "VISTA Custom GPT Actions", "Utilities".
 
+    Returns:
+        A dictionary where keys are worksheet names and values are typed pandas
+        DataFrames built from each worksheet's schema (header row, categorical columns),
+        or None if the spreadsheet has not changed since the last load. Worksheets that
+        did not change keep their previous DataFrame objects.
+        Any error is raised to the caller so the cache can apply its retry backoff.
+        With SHARED_SNAPSHOT=1 the frames are those of the newest shared version.
+    """
+    current = data_cache.peek()
+    current_frames = current.frames if current is not None else None
+    if shared_loader is not None:
+        return shared_loader.load(current_frames)
+
+    if OFFLINE_MODE:
+        # Never contact Google Sheets; re-read whatever snapshot is current on disk.
+        local = snapshot_store.load_snapshot()
+        if local is None:
+            raise RuntimeError(f"Offline mode is on but no snapshot exists in {snapshot_store.SNAPSHOT_DIR}.")
+        return local[0]
+
+    # One Drive metadata request; only if the spreadsheet changed is every worksheet
+    # fetched in one batch read (or in parallel threads as a fallback).
+    all_data = sheet_watcher.load(current_frames)
+    if all_data is None:
+        return None
+
+    if SNAPSHOT_AUTOSAVE:
+        # Keep the on-disk snapshot current so the next cold start can boot from it.
+        try:
+            version = snapshot_store.save_snapshot(all_data)
+            print(f"--- Saved local snapshot {version}. ---")
+        except Exception as e:
+            print(f"--- WARNING: could not save local snapshot: {e} ---")
+    return all_data
+
+def load_local_snapshot():
+    """
+    Reads the current on-disk snapshot for bootstrapping the cache (the current shared
+    version with SHARED_SNAPSHOT=1).
+
+    Returns:
+        A (frames, created_at) tuple, or None if no snapshot has been saved yet.
+    """
+    if shared_loader is not None:
+        return shared_loader.initial()
+    local = snapshot_store.load_snapshot()
+    if local is None:
+        return None
+    frames, manifest = local
+    print(f"--- Loaded local snapshot {manifest['version']} from {snapshot_store.SNAPSHOT_DIR}. ---")
+    return frames, manifest["created_at"]
+
+# --- Query engine configuration ---
+# Every worksheet is queried through '/sheets/<name>/query' as declared here: which
+# query parameters filter which columns, in which match modes, and which columns the
+# results can be sorted by (see sheet_query.SheetSpec). When a snapshot is loaded, each
+# spec is compiled against the sheet's actual columns, and a ColumnIndex is built for
+# every filtered or sortable column with exactly the lookups its modes need, so
+# requests never rescan a column. The smaller sheets have no fixed layout, so every
+# one of their columns is filterable and sortable.
+SHEET_SPECS = [
+    SheetSpec(
+        "api-paths", "API Name and Path",
+        filters=[
+            FilterSpec("category", "Categorization", ("contains", "exact", "prefix", "fuzzy")),
+            FilterSpec("api_name", "Dataset / Table Name", ("contains", "exact", "prefix", "fuzzy")),
+            FilterSpec("source", "Source", ("contains", "exact", "prefix")),
+        ],
+        sort=["Categorization", "Source", "Dataset / Table Name", "API Path"],
+        not_found="No matching API paths found for the given criteria.",
+    ),
+    SheetSpec(
+        "census-apis", "Census Bureau APIs - Full List",
+        filters=[
+            FilterSpec("dataset_name", "Dataset Name", ("contains", "exact", "prefix", "fuzzy")),
+            # The year is found in the 'API Base URL' ('.../data/2019/acs/acs1'). It is
+            # never fuzzy: a year that is one digit off is a different year.
+            FilterSpec("year", "API Base URL", ("year", "contains")),
+            FilterSpec("dataset_type", "Dataset Type", ("contains", "exact", "prefix")),
+        ],
+        sort=["Dataset Name", "Dataset Type", "API Base URL"],
+        not_found="No matching Census APIs found for the given criteria.",
+    ),
+    SheetSpec("va-census-apis", "VA Data Census Bureau APIs"),
+    SheetSpec("gpt-actions", "VISTA Custom GPT Actions"),
+    SheetSpec("utilities", "Utilities"),
+]
+SHEET_SPECS_BY_NAME = {spec.name: spec for spec in SHEET_SPECS}
+
+# The original query endpoints, kept as aliases of their sheets' '/sheets/<name>/query'.
+# Shared by the Flask views below and the ASGI server (asgi.py), so both modes answer identically.
+QUERY_ALIASES = {
+    "/query_api_paths": "api-paths",
+    "/query_census_apis_full_list": "census-apis",
+}
+
+def find_sheet_plan(snapshot, name):
+    """
+    Returns the SheetPlan for a sheet URL name (or worksheet title) in `snapshot`.
+
+    Raises:
+        QueryError: 404 for an unknown name, 500 if the sheet is configured but was
+            not loaded.
+    """
+    spec = SHEET_SPECS_BY_NAME.get(name) or next((s for s in SHEET_SPECS if s.sheet == name), None)
+    if spec is None:
+        raise QueryError(404, f"Unknown sheet '{name}'. Available sheets: {list(SHEET_SPECS_BY_NAME)}")
+    plan = snapshot.plans.get(spec.name)
+    if plan is None:
+        raise QueryError(500, f"Sheet '{spec.sheet}' not found in cache.")
+    return plan
+
+def build_query(snapshot, name, args):
+    """
+    Builds the SheetQuery for a sheet URL name (see SHEET_SPECS) from its request arguments.
+
+    Raises:
+        QueryError: For an unknown sheet, invalid parameters or a missing sheet/column.
+    """
+    return SheetQuery.from_args(snapshot, find_sheet_plan(snapshot, name), args)
+
+def build_endpoint_query(snapshot, endpoint, args):
+    """
+    Builds the query that a GET to `endpoint` ('/search', '/sheets/<name>/query' or one
+    of the QUERY_ALIASES) with request arguments `args` would run. Used by '/batch'.
+
+    Raises:
+        QueryError: For an unknown endpoint, invalid parameters or a missing sheet/column.
+    """
+    if endpoint == '/search':
+        return SearchQuery.from_args(snapshot, args)
+    name = QUERY_ALIASES.get(endpoint)
+    if name is None:
+        parts = endpoint.strip('/').split('/')
+        if len(parts) != 3 or parts[0] != 'sheets' or parts[2] != 'query':
+            raise QueryError(400, f"Unknown endpoint '{endpoint}'. Batches can query '/search', "
+                                  f"'/sheets/<name>/query' and {list(QUERY_ALIASES)}.")
+        name = unquote(parts[1])
+    return build_query(snapshot, name, args)
+
+def prepare_snapshot(snapshot):
+    """
+    Builds the derived lookup structures for a freshly loaded snapshot. Called by the
+    SheetCache on its loading thread, before the snapshot is made visible to requests.
+
+    This compiles the SHEET_SPECS against the loaded sheets, builds their column
+    indexes and the '/search' index over every worksheet, and pre-encodes each sheet's
+    whole-sheet (no filter) response, the most frequently requested bodies, together
+    with their gzip and brotli variants. These are pinned in the response cache, outside
+    its byte budget.
+
+    Worksheets whose DataFrame is the same object as in the current snapshot (the sheet
+    watcher keeps unchanged worksheets) reuse that snapshot's column indexes.
+    """
+    snapshot.plans = {spec.name: compile_sheet(spec, snapshot.frames[spec.sheet])
+                      for spec in SHEET_SPECS if spec.sheet in snapshot.frames}
+    index_modes = {plan.spec.sheet: plan.index_modes() for plan in snapshot.plans.values()}
+
+    previous = data_cache.peek()
+    reused = {}
+    if previous is not None:
+        reused = {sheet_name: previous.indexes[sheet_name] for sheet_name, df in snapshot.frames.items()
+                  if previous.frames.get(sheet_name) is df and sheet_name in previous.indexes}
+    changed_modes = {sheet_name: modes for sheet_name, modes in index_modes.items() if sheet_name not in reused}
+    snapshot.indexes = build_indexes(snapshot.frames, changed_modes)
+    snapshot.indexes.update(reused)
+    snapshot.search = build_search_index(snapshot.frames)
+    snapshot.responses = ResponseCache()
+    with snapshot.responses.pinned():
+        for plan in snapshot.plans.values():
+            query = SheetQuery(snapshot, plan)
+            precompress(query, query.execute())
+
+data_cache = SheetCache(load_spreadsheet_data, prepare=prepare_snapshot)
+
+def get_snapshot():
+    """
+    Returns the current SheetSnapshot from the cache.
+
+    Raises:
+        SheetCacheError: If no data has been loaded successfully yet.
+    """
+    return data_cache.get()
+
+def get_data():
+    """
+    This function manages the retrieval of spreadsheet data.
+    It returns the worksheets of the current cached snapshot. On a cold start the
+    first requests wait for one shared load; after that, requests never wait on
+    Google Sheets because stale data is refreshed in the background.
+
     Returns:
         A dictionary where keys are worksheet names and values are pandas DataFrames
         containing the data from each respective worksheet.
-        If an error occurs during data loading, it returns a dictionary with an
-        'error' key and a descriptive message, along with a 500 status.
+        If no data could be loaded, it returns a dictionary with an 'error' key and
+        a descriptive message, which the routes return with a 500 status.
     """
-    global _spreadsheet_data_cache
-    if _spreadsheet_data_cache is not None:
-        # If data is already in cache, return it directly.
-        return _spreadsheet_data_cache
-
-    print("--- First request received. Loading data from Google Sheets into cache... ---")
     try:
-        # Path to your Google Sheets service account key file.
-        # This file contains credentials to authenticate with Google Sheets API.
-        key_file = 'vista-api-backend-6578a1a1c769.json'
-        spreadsheet_title = 'Open VA Data APIs'
-        # List of worksheet names to load from the Google Spreadsheet.
-        worksheet_names = [
-            "API Name and Path", "VA Data Census Bureau APIs",
-            "Census Bureau APIs - Full List", "VISTA Custom GPT Actions", "Utilities"
-        ]
-
-        # Authenticate with Google Sheets using the service account.
-        gc = gspread.service_account(filename=key_file)
-        # Open the specified spreadsheet by its title.
-        spreadsheet = gc.open(spreadsheet_title)
-        all_data = {}
-        # Iterate through each specified worksheet and load its contents into a pandas DataFrame.
-        for sheet_name in worksheet_names:
-            worksheet = spreadsheet.worksheet(sheet_name)
-            records = worksheet.get_all_records() # Get all rows as a list of dictionaries.
-            if records:
-                df = pd.DataFrame(records)
-                all_data[sheet_name] = df # Store DataFrame in the dictionary with sheet name as key.
-
-        _spreadsheet_data_cache = all_data # Cache the loaded data.
-        print("--- Caching complete. ---")
-        return _spreadsheet_data_cache
-
-    except Exception as e:
-        # If any error occurs during data loading, capture it and store in cache.
-        error_info = {"error": "Failed to load data on first request", "message": str(e)}
-        _spreadsheet_data_cache = error_info
-        print(f"--- ERROR during data load: {str(e)} ---")
-        return _spreadsheet_data_cache
+        return get_snapshot().frames
+    except SheetCacheError as e:
+        return {"error": "Failed to load data", "message": str(e)}
+
+def collect_snapshot_metrics():
+    """
+    Updates the gauges that describe the served snapshot (age, version, and per
+    worksheet row counts and fetch times). Registered as a metrics collector, so it
+    runs on every scrape of '/metrics' and never triggers a load.
+    """
+    snapshot = data_cache.peek()
+    metrics.WORKSHEET_ROWS.clear()
+    metrics.WORKSHEET_FETCH_SECONDS.clear()
+    if snapshot is None:
+        return
+    metrics.SNAPSHOT_AGE_SECONDS.set(snapshot.age)
+    metrics.SNAPSHOT_VERSION.set(snapshot.version)
+    for sheet_name, df in snapshot.frames.items():
+        metrics.WORKSHEET_ROWS.labels(sheet_name).set(len(df))
+        # Only set for sheets fetched from Google Sheets (see sheet_watcher.SheetWatcher).
+        if "fetch_seconds" in df.attrs:
+            metrics.WORKSHEET_FETCH_SECONDS.labels(sheet_name).set(df.attrs["fetch_seconds"])
+
+metrics.REGISTRY.add_collector(collect_snapshot_metrics)
+
+# Start loading as soon as the worker boots, so the first user request does not pay
+# for the whole Google Sheets round trip: the local snapshot is served first, then
+# reconciled with Sheets (except in offline mode). Set SHEET_CACHE_PRELOAD=0 to disable.
+if os.environ.get("SHEET_CACHE_PRELOAD", "1") != "0":
+    data_cache.bootstrap(load_local_snapshot, reconcile=not OFFLINE_MODE)
+    # Check Google Sheets (or, for shared snapshot followers, the shared directory) for
+    # changes every SHEET_WATCH_INTERVAL_SECONDS in the background, so edits show up even
+    # while no requests arrive.
+    if not OFFLINE_MODE or shared_loader is not None:
+        start_polling(data_cache)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """
+    Records the latency and body size of every response. Requests are labelled by
+    their route pattern (not the raw path), so unknown URLs all count as 'unmatched'.
+    Streamed responses have no size yet when this runs and only count towards latency.
+    """
+    started = g.get("request_started")
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        metrics.REQUEST_SECONDS.labels(route, request.method, response.status_code).observe(
+            time.perf_counter() - started)
+        if not response.is_streamed:
+            metrics.RESPONSE_BYTES.labels(route).observe(response.content_length or 0)
+    return response
+
+@app.route('/metrics')
+def metrics_page():
+    """
+    Exposes the API's metrics in the Prometheus text format: request latency and
+    response size histograms per route, sheet cache and response cache counters, the
+    snapshot's age, per-worksheet row counts and fetch times, and the time spent
+    filtering, materializing rows (to_dict) and encoding JSON for uncached queries.
+
+    Expected Data: None.
+
+    Returns:
+        The metrics as text/plain. The values belong to the worker process that
+        answered the request.
+    """
+    return app.response_class(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
 
 @app.route('/')
 def home():
@@ -91,89 +352,313 @@ def home():
     # If data loaded successfully, return a success message.
     return "VA Data Backend API is running."
 
+def _query_response(name):
+    """
+    Answers a query against the sheet with URL name `name` (see SHEET_SPECS) with a
+    cached, pre-encoded JSON body.
+
+    The sheet's filter parameters and `match`, `sort`, `limit`, `offset`, `fields` and
+    `format` are read from the request, then a SheetQuery is run against the current
+    snapshot (see _serve_query).
+
+    Returns:
+        A Flask response: 200 with a JSON array (and an X-Total-Count header holding the
+        number of matches before paging), 304, 404 (unknown sheet, or no matching rows),
+        or a JSON error with status 400 (bad parameters) or 500 (data could not be
+        loaded, sheet or column missing).
+    """
+    return _serve_query(lambda snapshot, args: build_query(snapshot, name, args))
+
+def _serve_query(make_query, conditional=True):
+    """
+    Runs a query built by `make_query(snapshot, request.args)` (a SheetQuery,
+    SearchQuery or BatchQuery) and answers with its cached, pre-encoded JSON body.
+
+    The body is compressed with brotli or gzip when the client's Accept-Encoding allows
+    it (see compression.py); compressed bodies are cached per snapshot like the JSON.
+    Queries with `format=ndjson` are streamed instead, with chunked transfer encoding.
+
+    The response carries a strong ETag derived from the snapshot's content fingerprint,
+    the normalized query and the content coding. If the client's If-None-Match already
+    has that ETag (and `conditional` is True, i.e. for GET requests), a 304 is returned
+    without running or serializing anything.
+
+    Returns:
+        A Flask response with the query's status (X-Total-Count is set when the query
+        reports a total), 304, or a JSON error with status 400 or 500.
+    """
+    try:
+        snapshot = get_snapshot()
+    except SheetCacheError as e:
+        return jsonify({"error": "Failed to load data", "message": str(e)}), 500
+
+    try:
+        query = make_query(snapshot, request.args)
+    except QueryError as e:
+        return jsonify(e.payload), e.status
+
+    encoding = choose_encoding(request.headers.get("Accept-Encoding"))
+    # Small bodies are sent uncompressed whatever the client accepts, so the identity
+    # ETag is valid for them too.
+    for etag in dict.fromkeys([variant_etag(query.etag, encoding), query.etag]):
+        if conditional and request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            response.vary.add("Accept-Encoding")
+            return response
+
+    if query.output_format == "ndjson":
+        status, chunks, total = query.stream()
+        if status == 200:
+            if encoding is not None:
+                chunks = compress_stream(chunks, encoding)
+            response = app.response_class(chunks, status=status, mimetype=NDJSON_MIMETYPE)
+        else:
+            encoding = None
+            response = app.response_class(b"".join(chunks), status=status, mimetype=app.json.mimetype)
+    else:
+        result = query.cached_result()
+        result = result if result is not None else query.execute()
+        status, _, total = result
+        body, encoding = encoded_body(query, result, encoding)
+        response = app.response_class(body, status=status, mimetype=app.json.mimetype)
+    response.vary.add("Accept-Encoding")
+    if encoding is not None:
+        response.content_encoding = encoding
+    if status == 200:
+        response.set_etag(variant_etag(query.etag, encoding))
+        if total is not None:
+            response.headers["X-Total-Count"] = str(total)
+    return response
+
 @app.route('/query_api_paths')
 def query_api_paths():
     """
     Queries the 'API Name and Path' sheet from the cached spreadsheet data.
-    Allows filtering of API paths by 'category'.
+    Allows filtering of API paths by 'category', 'api_name' and 'source'.
+    An alias of '/sheets/api-paths/query'.
 
     Expected Data (Query Parameters):
         - `category` (optional, string): A string to filter the 'Categorization' column
-          (e.g., 'Demographics', 'Benefits & Claims'). The search is case-insensitive.
+          (e.g., 'Demographics', 'Benefits & Claims'). The search is a case-insensitive
+          substring match, resolved through the snapshot's prebuilt index.
+        - `api_name` (optional, string): A string to filter the 'Dataset / Table Name'
+          column (e.g., 'VetPop', 'COVID-19'). Also case-insensitive.
+        - `source` (optional, string): A string to filter the 'Source' column (e.g., 'VA').
+        - `match` (optional, string): 'contains' (default), 'exact' (whole value),
+          'prefix' or 'fuzzy'. Fuzzy matching tolerates typos and abbreviated words in
+          `category` and `api_name` (e.g., 'benifits', 'demographic') and returns the
+          rows ranked by how well they match; `source` is never fuzzy.
+        - `sort` (optional, string): Comma-separated columns to sort by, each prefixed
+          with '-' for descending order (e.g., 'Categorization,-Dataset / Table Name').
+        - `limit` / `offset` (optional, integers): Return at most `limit` rows, starting
+          after the first `offset` matches.
+        - `fields` (optional, string): Comma-separated list of columns to return
+          (e.g., 'Dataset / Table Name,API Path').
+        - `format` (optional, string): 'json' (default) or 'ndjson' to stream one JSON
+          object per line as the rows are encoded.
 
     Returns:
         A JSON array of dictionaries, where each dictionary represents a row from
         the 'API Name and Path' sheet that matches the query.
-        If no `category` parameter is provided, it returns all records from the sheet.
+        If no filter is provided, it returns all records from the sheet (subject to paging).
+        Returns 404 with a message if the filters match no rows.
+        Responses carry an ETag; a matching If-None-Match returns 304 Not Modified.
+        Bodies are gzip or brotli compressed when Accept-Encoding allows it.
         Returns a JSON error response if the 'API Name and Path' sheet is not found
         in the cached data or if initial data loading failed.
     """
-    data = get_data()
-    if isinstance(data, dict) and data.get("error"):
-        # If get_data returned an error, jsonify it and return with a 500 status.
-        return jsonify(data), 500
-
-    if "API Name and Path" not in data:
-        # Ensure the required sheet is present in the loaded data.
-        return jsonify({"error": "Sheet 'API Name and Path' not found in cache."}), 500
-
-    df_api_paths = data["API Name and Path"] # Access the DataFrame for this specific sheet.
-    category = request.args.get('category') # Get the 'category' query parameter.
-
-    if not category:
-        # If no category is provided, return all records from the sheet.
-        return jsonify(df_api_paths.to_dict(orient='records'))
-
-    # Filter the DataFrame based on the 'Categorization' column, case-insensitive.
-    # .str.contains() is used for flexible substring matching.
-    results = df_api_paths[df_api_paths['Categorization'].str.contains(category, case=False, na=False)]
-    return jsonify(results.to_dict(orient='records'))
+    # Same as '/sheets/api-paths/query'.
+    return _query_response(QUERY_ALIASES['/query_api_paths'])
 
 @app.route('/query_census_apis_full_list')
 def query_census_apis_full_list():
     """
     Queries the 'Census Bureau APIs - Full List' sheet from the cached spreadsheet data.
-    Allows filtering by 'dataset_name' or 'year'.
+    Allows filtering by 'dataset_name', 'year' or 'dataset_type'.
+    An alias of '/sheets/census-apis/query'.
 
     Expected Data (Query Parameters):
         - `dataset_name` (optional, string): Filter by Census dataset name (e.g., 'cbp', 'acs').
           The search is case-insensitive.
-        - `year` (optional, string): Filter by year (e.g., '1986'). This searches
-          within the 'API Base URL' field. The search is case-insensitive.
+        - `year` (optional, string): Filter by four-digit year (e.g., '1986'). This
+          matches the year within the 'API Base URL' field ('.../data/1986/...'); any
+          other value (e.g., '201') is matched as a substring of that field.
+        - `dataset_type` (optional, string): Filter by 'Dataset Type' (e.g., 'Timeseries').
+        - `match` (optional, string): 'contains' (default), 'exact' (whole value),
+          'prefix' or 'fuzzy'. Fuzzy matching applies to `dataset_name` (e.g., 'amer
+          community survey') and ranks the rows by how well they match; `year` is matched
+          as a year unless `match` is 'contains'.
+        - `sort` (optional, string): Comma-separated columns to sort by, each prefixed
+          with '-' for descending order (e.g., 'Dataset Name,-API Base URL').
+        - `limit` / `offset` (optional, integers): Return at most `limit` rows, starting
+          after the first `offset` matches.
+        - `fields` (optional, string): Comma-separated list of columns to return
+          (e.g., 'Dataset Name,API Base URL').
+        - `format` (optional, string): 'json' (default) or 'ndjson' to stream one JSON
+          object per line as the rows are encoded.
 
     Returns:
         A JSON array of dictionaries, where each dictionary represents a row from
         the 'Census Bureau APIs - Full List' sheet that matches the query.
-        If no filtering parameters are provided, it returns all records from the sheet.
+        If no filtering parameters are provided, it returns all records from the sheet
+        (subject to paging).
+        When both filters are given, the row sets matched by each index are intersected.
+        Returns 404 with a message if the filters match no rows.
+        Responses carry an ETag; a matching If-None-Match returns 304 Not Modified.
+        Bodies are gzip or brotli compressed when Accept-Encoding allows it.
         Returns a JSON error response if the 'Census Bureau APIs - Full List' sheet
         is not found in the cached data or if initial data loading failed.
     """
-    data = get_data()
-    if isinstance(data, dict) and data.get("error"):
-        return jsonify(data), 500
+    # Same as '/sheets/census-apis/query'.
+    return _query_response(QUERY_ALIASES['/query_census_apis_full_list'])
+
+@app.route('/sheets')
+def list_sheets():
+    """
+    Lists the sheets that can be queried through '/sheets/<name>/query', with their
+    filter parameters, match modes and sortable columns.
+
+    Expected Data: None.
+
+    Returns:
+        A JSON array with one object per loaded sheet: its URL `name`, worksheet title
+        (`sheet`), `filters` (each with its query `param`, `column` and supported
+        `modes`, the first being its default), `sort` (sortable columns) and default
+        `fields` (null for every column). Returns a JSON error with status 500 if
+        data loading failed.
+    """
+    try:
+        snapshot = get_snapshot()
+    except SheetCacheError as e:
+        return jsonify({"error": "Failed to load data", "message": str(e)}), 500
+    return jsonify([plan.describe() for plan in snapshot.plans.values()])
+
+@app.route('/sheets/<name>/query')
+def query_sheet(name):
+    """
+    Queries any worksheet through the declarative query engine (see SHEET_SPECS).
 
-    if "Census Bureau APIs - Full List" not in data:
-        return jsonify({"error": "Sheet 'Census Bureau APIs - Full List' not found in cache."}), 500
+    Expected Data:
+        - `name` (path): The sheet's URL name ('api-paths', 'census-apis',
+          'va-census-apis', 'gpt-actions', 'utilities'; see '/sheets') or its
+          worksheet title.
+        - Filter parameters (optional, strings): The sheet's filters as listed by
+          '/sheets'. On sheets without a fixed layout every column is a filter, named
+          after the column in lower case with underscores (e.g., `notes` for 'Notes').
+          Several filters must all match.
+        - `match` (optional, string): 'contains', 'exact', 'prefix', 'year' or 'fuzzy'.
+          Applies to every filter that supports the mode; the others keep their
+          default mode. All matching ignores case.
+        - `sort` (optional, string): Comma-separated sortable columns, each prefixed
+          with '-' for descending order. Blank cells sort last.
+        - `limit` / `offset` (optional, integers), `fields` (optional, string) and
+          `format` (optional, 'json' or 'ndjson'): As for '/query_api_paths'.
+
+    Returns:
+        A JSON array of the matching rows (all rows if no filter is given), in sheet
+        order unless sorted or fuzzy-ranked, with an X-Total-Count header and an ETag.
+        Returns 404 for an unknown sheet or when the filters match no rows, 400 for bad
+        parameters, and 500 if data loading failed.
+    """
+    return _query_response(name)
 
-    df_census_apis = data["Census Bureau APIs - Full List"]
-    dataset_name = request.args.get('dataset_name')
-    year = request.args.get('year')
+@app.route('/search')
+def search():
+    """
+    Full-text search across every worksheet in the cache, ranked with BM25.
 
-    # Start with all data and apply filters sequentially.
-    filtered_results = df_census_apis
+    Each row of each sheet is a document made of the words of all its cells, so one
+    request finds matching rows whichever sheet they are in, including the
+    'VA Data Census Bureau APIs', 'VISTA Custom GPT Actions' and 'Utilities' sheets.
+    The index is built when a snapshot is loaded; a search only reads it.
 
-    if dataset_name:
-        filtered_results = filtered_results[
-            filtered_results['Dataset Name'].str.contains(dataset_name, case=False, na=False)
-        ]
+    Expected Data (Query Parameters):
+        - `q` (required, string): Words to search for (e.g., 'acs population 2019').
+          Matching is on whole words and ignores case and punctuation.
+        - `limit` (optional, integer): Number of results, 10 by default, at most 100.
+        - `sheets` (optional, string): Comma-separated worksheet names to restrict the
+          search to (e.g., 'Utilities,VISTA Custom GPT Actions').
 
-    if year:
-        # Search for the year within the 'API Base URL' column.
-        filtered_results = filtered_results[
-            filtered_results['API Base URL'].str.contains(year, case=False, na=False)
-        ]
+    Returns:
+        A JSON array of the best matches, best first. Each item has the worksheet name
+        (`sheet`), the row's position in it (`row`), its BM25 `score` and the row itself
+        (`record`). The array is empty if no row contains any of the words.
+        Returns 400 for a missing query, a bad limit or unknown sheet names, and 500
+        if data loading failed. Responses carry an ETag; a matching If-None-Match
+        returns 304 Not Modified.
+    """
+    return _serve_query(SearchQuery.from_args)
+
+@app.route('/batch', methods=['POST'])
+def batch():
+    """
+    Runs several queries in one request, all against the same snapshot, so a GPT action
+    that needs several lookups pays for one round trip and gets consistent results.
+
+    Expected Data (JSON body):
+        - `queries` (required, array of at most BATCH_MAX_QUERIES objects): Each has an
+          `endpoint` ('/query_api_paths', '/query_census_apis_full_list',
+          '/sheets/<name>/query' or '/search', optionally with a query string) or a
+          `sheet` (a '/sheets/<name>/query' name), and optional `params`, an object of
+          the endpoint's query parameters (e.g., {"year": "2019", "limit": 10}).
+          Parameters are the same as on the GET endpoints, except that `format` must
+          be 'json'.
+
+    Returns:
+        A JSON object with `snapshot` (the data's content fingerprint), `results` (one
+        per query, in order: its `status`, and for status 200 the `rows` it matched as
+        positions in the `rows` array plus `total` or, for searches, `scores`; otherwise
+        the `message` or `error` its endpoint would have returned) and `rows` (each
+        distinct row returned by any query, once: its `sheet`, `row` position and
+        `record`). The status is 200 even if single queries failed; it is 400 for a
+        malformed body and 500 if data loading failed. The body is compressed like
+        the query endpoints' bodies.
+    """
+    payload = request.get_json(silent=True)
+    return _serve_query(lambda snapshot, args: BatchQuery.from_json(snapshot, payload, build_endpoint_query),
+                        conditional=False)
+
+@app.route('/proxy')
+def proxy():
+    """
+    Fetches a Census Bureau or VA API URL (such as the 'API Base URL' values listed by
+    '/query_census_apis_full_list') and returns the upstream response, caching it on
+    disk so repeated queries are answered locally.
+
+    Responses are cached for PROXY_CACHE_TTL_SECONDS, keyed by the URL with its query
+    parameters sorted (the Census API `key` is not part of the key), and the least
+    recently used ones are deleted once the cache exceeds PROXY_CACHE_MAX_BYTES.
+    Concurrent requests for the same uncached URL share one upstream request.
+
+    Expected Data (Query Parameters):
+        - `url` (required, string): Absolute URL on one of PROXY_ALLOWED_HOSTS (e.g.,
+          'https://api.census.gov/data/2019/acs/acs5?get=NAME&for=state:*').
+        - Any other parameter is added to the upstream URL's query string (e.g.,
+          `get=NAME,B21001_002E`, `for=state:*`, `key=...`).
+
+    Returns:
+        The upstream status, Content-Type and body, gzip-compressed if the client
+        accepts it. `X-Cache` is HIT (from the disk cache), MISS or COALESCED, and
+        `Age` is the seconds since the upstream fetch. Upstream errors are passed
+        through uncached. Returns 400 for a missing or malformed URL, 403 for a host
+        that is not allowed, 502 if the upstream cannot be reached and 504 if it times out.
+    """
+    params = [(name, value) for name, value in request.args.items(multi=True) if name != "url"]
+    try:
+        result = upstream_proxy.fetch(request.args.get("url"), params)
+    except ProxyError as e:
+        return jsonify(e.payload), e.status
 
-    return jsonify(filtered_results.to_dict(orient='records'))
+    if accepts(request.headers.get("Accept-Encoding"), "gzip"):
+        response = app.response_class(result.gzip_body, status=result.status, content_type=result.content_type)
+        response.content_encoding = "gzip"
+    else:
+        response = app.response_class(result.body(), status=result.status, content_type=result.content_type)
+    response.vary.add("Accept-Encoding")
+    response.headers["X-Cache"] = result.cache_status.upper()
+    response.headers["Age"] = str(int(result.age))
+    return response
 
 if __name__ == '__main__':
     # This block is executed when the script is run directly.
@@ -0,0 +1,164 @@
+import asyncio
+import functools
+import time
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+import metrics
+from app import QUERY_ALIASES, app as flask_app, build_query, data_cache
+from sheet_cache import SheetCacheError
+from compression import choose_encoding, compress_stream, encoded_body, needs_compressing, variant_etag
+from sheet_query import NDJSON_MIMETYPE, QueryError, encode_json
+
+# --- ASGI entry point ---
+# Run with an ASGI server instead of gunicorn's threaded WSGI workers, e.g.:
+#
+#     uvicorn asgi:app --host 0.0.0.0 --port $PORT --workers 1
+#
+# The hot read-only routes ('/', '/sheets/<name>/query' and its aliases
+# '/query_api_paths' and '/query_census_apis_full_list') are served natively on the
+# event loop, straight from the in-memory snapshot: a cached response never touches a
+# thread. Queries that still have to be computed run in a
+# worker thread, and stale-snapshot refreshes are scheduled as asyncio tasks, so a slow
+# Google Sheets load never holds up other requests. Every other route falls through to
+# the Flask app (run in a thread pool), so both serving modes expose the same API.
+# The native routes record the same request metrics as the Flask hooks do ('/metrics'
+# itself is one of the routes served by Flask).
+
+# Strong references to running refresh tasks, so they are not garbage collected early.
+_background_tasks = set()
+
+
+def _schedule_on_loop(load):
+    """SheetCache runner that performs a refresh as an asyncio task (in a worker thread)."""
+    task = asyncio.get_running_loop().create_task(asyncio.to_thread(load))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def current_snapshot():
+    """
+    Returns the current SheetSnapshot without blocking the event loop.
+
+    On a cold start the shared single-flight load is awaited in a worker thread;
+    afterwards the snapshot is returned immediately and, if stale, a refresh task is
+    scheduled on the loop.
+
+    Raises:
+        SheetCacheError: If no data has been loaded successfully yet.
+    """
+    if data_cache.peek() is None:
+        return await asyncio.to_thread(data_cache.get)
+    return data_cache.get(runner=_schedule_on_loop)
+
+
+def _json_response(payload, status):
+    # Encoded the same way as the Flask responses, so both modes return identical bytes.
+    return Response(encode_json(payload), status_code=status, media_type="application/json")
+
+
+def _etag_matches(if_none_match, etag):
+    # Same rule as Werkzeug's ETags.contains(): '*' or an exact strong tag.
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag == f'"{etag}"':
+            return True
+    return False
+
+
+async def home(request):
+    """
+    Health check, same as the Flask '/' route.
+
+    Returns:
+        A plain message if data is loaded, or a JSON error with status 500.
+    """
+    try:
+        await current_snapshot()
+    except SheetCacheError as e:
+        return _json_response({"error": "Failed to load data", "message": str(e)}, 500)
+    return Response("VA Data Backend API is running.", media_type="text/html")
+
+
+async def query_endpoint(request, name=None):
+    """
+    Serves '/sheets/<name>/query' (or, given `name`, one of the QUERY_ALIASES) with the
+    same parameters, caching, ETags, compression, NDJSON streaming and status codes as
+    the Flask views in app.py.
+
+    Returns:
+        A 200/304/404 response, or a JSON error with status 400 or 500.
+    """
+    try:
+        snapshot = await current_snapshot()
+    except SheetCacheError as e:
+        return _json_response({"error": "Failed to load data", "message": str(e)}, 500)
+
+    try:
+        query = build_query(snapshot, name or request.path_params["name"], request.query_params)
+    except QueryError as e:
+        return _json_response(e.payload, e.status)
+
+    encoding = choose_encoding(request.headers.get("accept-encoding"))
+    for etag in dict.fromkeys([variant_etag(query.etag, encoding), query.etag]):
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers={"ETag": f'"{etag}"', "Vary": "Accept-Encoding"})
+
+    headers = {"Vary": "Accept-Encoding"}
+    if query.output_format == "ndjson":
+        # Filtering runs off the loop; the chunks are then encoded in Starlette's thread
+        # pool as they are sent.
+        status, chunks, total = await asyncio.to_thread(query.stream)
+        if status != 200:
+            return Response(b"".join(chunks), status_code=status, media_type="application/json", headers=headers)
+        if encoding is not None:
+            chunks = compress_stream(chunks, encoding)
+            headers["Content-Encoding"] = encoding
+        headers.update({"ETag": f'"{variant_etag(query.etag, encoding)}"', "X-Total-Count": str(total)})
+        return StreamingResponse(chunks, media_type=NDJSON_MIMETYPE, headers=headers)
+
+    # Cached results are answered on the loop; anything else is computed off the loop.
+    result = query.cached_result()
+    if result is None:
+        result = await asyncio.to_thread(query.execute)
+    status, _, total = result
+    if needs_compressing(query, result, encoding):
+        body, encoding = await asyncio.to_thread(encoded_body, query, result, encoding)
+    else:
+        body, encoding = encoded_body(query, result, encoding)
+
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    if status == 200:
+        headers.update({"ETag": f'"{variant_etag(query.etag, encoding)}"', "X-Total-Count": str(total)})
+    return Response(body, status_code=status, media_type="application/json", headers=headers)
+
+
+def _instrumented(route, handler):
+    """Wraps a native handler so it records request latency and response size under `route`."""
+    async def endpoint(request):
+        started = time.perf_counter()
+        response = await handler(request)
+        metrics.REQUEST_SECONDS.labels(route, request.method, response.status_code).observe(
+            time.perf_counter() - started)
+        # Streamed responses have no size yet and only count towards latency.
+        if not isinstance(response, StreamingResponse):
+            metrics.RESPONSE_BYTES.labels(route).observe(len(response.body))
+        return response
+    return endpoint
+
+
+routes = [Route("/", _instrumented("/", home))]
+# Labelled with Flask's route pattern, so both modes report the same metrics.
+routes.append(Route("/sheets/{name}/query", _instrumented("/sheets/<name>/query", query_endpoint)))
+routes += [Route(path, _instrumented(path, functools.partial(query_endpoint, name=name)))
+           for path, name in QUERY_ALIASES.items()]
+# Anything not ported above is handled by the Flask app.
+routes.append(Mount("/", app=WSGIMiddleware(flask_app)))
+
+app = Starlette(routes=routes)
@@ -0,0 +1,155 @@
+import os
+import zlib
+
+import brotli
+
+# --- Configuration ---
+# Responses smaller than this are always sent uncompressed: the saving would not be
+# worth the CPU time or the extra cache entry.
+COMPRESSION_MIN_BYTES = int(os.environ.get("COMPRESSION_MIN_BYTES", 1024))
+# Compression effort. Bodies are compressed once per snapshot and then served from the
+# response cache, so these lean towards smaller output over speed, without reaching
+# the levels whose cost grows steeply (gzip 9, brotli 10-11).
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", 5))
+# Set to 0 to skip compressing the whole-sheet responses while a snapshot is prepared
+# (they are then compressed on first request instead).
+RESPONSE_PRECOMPRESS = os.environ.get("RESPONSE_PRECOMPRESS", "1") != "0"
+
+# Supported content codings, in order of preference when the client accepts several
+# with the same weight.
+ENCODINGS = ("br", "gzip")
+
+
+def _coding_weights(accept_encoding):
+    # Accept-Encoding header -> {coding: q-value}; an unparsable q-value counts as 0.
+    weights = {}
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name] = weight
+    return weights
+
+
+def choose_encoding(accept_encoding):
+    """
+    Picks the content coding for a response from the request's Accept-Encoding header.
+
+    Codings with a q-value of 0 are refused; '*' stands for any coding not listed.
+
+    Returns:
+        'br', 'gzip', or None for an uncompressed (identity) response.
+    """
+    if not accept_encoding:
+        return None
+    weights = _coding_weights(accept_encoding)
+    wildcard = weights.get("*", 0.0)
+    best, best_weight = None, 0.0
+    for encoding in ENCODINGS:
+        weight = weights.get(encoding, wildcard)
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def accepts(accept_encoding, encoding):
+    """
+    Returns True if the request's Accept-Encoding header allows `encoding` (e.g. 'gzip'),
+    for bodies that are already stored compressed and only need decompressing for
+    clients that refuse it.
+    """
+    weights = _coding_weights(accept_encoding)
+    return weights.get(encoding, weights.get("*", 0.0)) > 0
+
+
+def compress(body, encoding):
+    """Compresses a whole body (bytes) with 'br' or 'gzip'."""
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31) # 31: gzip container.
+    return compressor.compress(body) + compressor.flush()
+
+
+def compress_stream(chunks, encoding):
+    """
+    Compresses a stream of byte chunks with 'br' or 'gzip', flushing after every chunk
+    so the client can decode each one as soon as it arrives.
+
+    Returns:
+        A generator of compressed chunks.
+    """
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+
+def variant_etag(etag, encoding):
+    """
+    Returns the strong ETag of the `encoding` variant of a response: compressed bodies
+    differ byte for byte from the identity body, so they get their own validator.
+    """
+    return etag if encoding is None else f"{etag}-{encoding}"
+
+
+def _compresses(result, encoding):
+    status, body, _ = result
+    return encoding is not None and status == 200 and len(body) >= COMPRESSION_MIN_BYTES
+
+
+def _variant_key(query, encoding):
+    return query.key + (("encoding", encoding),)
+
+
+def needs_compressing(query, result, encoding):
+    """
+    Tells whether encoded_body() would have to compress the body now, i.e. the variant
+    is not cached yet. Lets the ASGI server do that work off the event loop.
+    """
+    return _compresses(result, encoding) and query.snapshot.responses.peek(_variant_key(query, encoding)) is None
+
+
+def encoded_body(query, result, encoding):
+    """
+    Returns the body of a query result in the negotiated content coding.
+
+    Compressed bodies are kept in the snapshot's ResponseCache next to the identity
+    body, so each variant is compressed once per snapshot. Error responses and bodies
+    under COMPRESSION_MIN_BYTES are left uncompressed.
+
+    Expected Data:
+        - `query`: The SheetQuery or SearchQuery the result belongs to.
+        - `result`: Its (status, body, total) tuple.
+        - `encoding`: The coding picked by choose_encoding(), or None.
+
+    Returns:
+        A (body, encoding) pair; `encoding` is None if the body is not compressed.
+    """
+    body = result[1]
+    if not _compresses(result, encoding):
+        return body, None
+    return query.snapshot.responses.get_or_build(
+        _variant_key(query, encoding), lambda: compress(body, encoding)), encoding
+
+
+def precompress(query, result):
+    """Stores every compressed variant of a (whole-sheet) query result in its snapshot's cache."""
+    if not RESPONSE_PRECOMPRESS:
+        return
+    for encoding in ENCODINGS:
+        encoded_body(query, result, encoding)
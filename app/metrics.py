@@ -0,0 +1,292 @@
+import math
+import threading
+import time
+
+# --- Prometheus metrics ---
+# A minimal, dependency-free implementation of the Prometheus text exposition format
+# (version 0.0.4), enough for counters, gauges and histograms with labels. The metrics
+# the API records are declared at the bottom of this file and rendered by the '/metrics'
+# route. Values live in the memory of the worker process that serves the scrape, like
+# the sheet cache itself (see the "--workers 1" note in the README).
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets in seconds. Cached responses are answered in well under a millisecond,
+# so the low end is finer than Prometheus' default buckets.
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Response size buckets in bytes (256 B to 64 MB, in steps of 4x).
+SIZE_BUCKETS = tuple(256 * 4 ** n for n in range(10))
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class _Metric:
+    """Base class: a named metric family with a fixed set of label names."""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def labels(self, *values):
+        """
+        Returns the child metric for one combination of label values.
+
+        Raises:
+            ValueError: If the number of values does not match the label names.
+        """
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def clear(self):
+        """Drops every labelled child, e.g. before re-publishing per-worksheet gauges."""
+        with self._lock:
+            self._children = {}
+
+    def _unlabelled(self):
+        return self.labels()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {_escape(self.documentation)}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(child.render(self.name, self.labelnames, key))
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def render(self, name, labelnames, key):
+        return [f"{name}{_format_labels(labelnames, key)} {_format_value(self.value)}"]
+
+
+class Counter(_Metric):
+    """A value that only goes up (requests served, cache hits, loads)."""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._unlabelled().inc(amount)
+
+
+class _GaugeChild(_CounterChild):
+    def set(self, value):
+        with self._lock:
+            self.value = value
+
+
+class Gauge(_Metric):
+    """A value that can go up and down (snapshot age, row counts)."""
+
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self._unlabelled().set(value)
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+            self.sum += value
+            self.count += 1
+
+    def render(self, name, labelnames, key):
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        lines, cumulative = [], 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            labels = _format_labels(labelnames, key, [("le", _format_value(bound))])
+            lines.append(f"{name}_bucket{labels} {cumulative}")
+        lines.append(f"{name}_bucket{_format_labels(labelnames, key, [('le', '+Inf')])} {count}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, key)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(labelnames, key)} {count}")
+        return lines
+
+
+class Histogram(_Metric):
+    """A distribution of observations (latencies, sizes) counted into fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._unlabelled().observe(value)
+
+
+class Registry:
+    """
+    The set of metrics exposed together on one '/metrics' page.
+
+    Collectors are callables run just before rendering, to update gauges that are
+    read from current state (such as the snapshot age) rather than set as events happen.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+
+    def render(self):
+        """
+        Runs the collectors and renders every metric.
+
+        Returns:
+            The exposition as UTF-8 bytes.
+        """
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                print(f"--- WARNING: metrics collector failed: {e} ---")
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class Timer:
+    """
+    Context manager that observes the elapsed wall time into a histogram child.
+
+        with Timer(QUERY_PHASE_SECONDS.labels(sheet, "encode")):
+            body = encode_json(records)
+    """
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed = time.perf_counter() - self.started
+        self.histogram.observe(self.elapsed)
+        return False
+
+
+REGISTRY = Registry()
+
+# --- API metrics ---
+
+REQUEST_SECONDS = Histogram(
+    "vista_api_request_duration_seconds", "Time spent answering HTTP requests.",
+    ["route", "method", "status"])
+RESPONSE_BYTES = Histogram(
+    "vista_api_response_size_bytes", "Size of HTTP response bodies.",
+    ["route"], buckets=SIZE_BUCKETS)
+QUERY_PHASE_SECONDS = Histogram(
+    "vista_api_query_phase_seconds",
+    "Time spent in each phase of building an uncached query response: "
+    "'filter' (index lookup and row/column selection), 'to_dict' (row materialization) "
+    "and 'encode' (JSON encoding).",
+    ["sheet", "phase"])
+RESPONSE_CACHE_LOOKUPS = Counter(
+    "vista_api_response_cache_lookups_total",
+    "Query requests answered from the snapshot's response cache (hit) or built (miss).",
+    ["sheet", "result"])
+SHEET_CACHE_REQUESTS = Counter(
+    "vista_api_sheet_cache_requests_total",
+    "Snapshot lookups by cache state: 'fresh', 'stale' (served while refreshing) or "
+    "'miss' (waited for a load).",
+    ["result"])
+SHEET_CACHE_REFRESHES = Counter(
+    "vista_api_sheet_cache_refreshes_total", "Background snapshot refreshes started.")
+SHEET_CACHE_LOADS = Counter(
+    "vista_api_sheet_cache_loads_total",
+    "Completed snapshot loads by outcome: 'success' (new snapshot), 'unchanged' (the data "
+    "had not changed, the snapshot was kept) or 'failure'.",
+    ["result"])
+SHEET_CACHE_LOAD_SECONDS = Gauge(
+    "vista_api_sheet_cache_last_load_seconds",
+    "Duration of the last successful snapshot load, including index building.")
+SNAPSHOT_AGE_SECONDS = Gauge(
+    "vista_api_snapshot_age_seconds", "Seconds since the served snapshot was loaded.")
+SNAPSHOT_VERSION = Gauge(
+    "vista_api_snapshot_version", "Version number of the served snapshot within this process.")
+WORKSHEET_ROWS = Gauge(
+    "vista_api_worksheet_rows", "Rows in each worksheet of the served snapshot.", ["sheet"])
+WORKSHEET_FETCH_SECONDS = Gauge(
+    "vista_api_worksheet_fetch_seconds",
+    "Time spent fetching each worksheet from Google Sheets for the served snapshot "
+    "(absent for snapshots read from disk).",
+    ["sheet"])
+SHARED_SNAPSHOT_LEADER = Gauge(
+    "vista_api_shared_snapshot_leader",
+    "1 if this worker loads from Google Sheets for every worker (SHARED_SNAPSHOT=1), else 0.")
+PROXY_REQUESTS = Counter(
+    "vista_api_proxy_requests_total",
+    "'/proxy' requests by outcome: 'hit' (disk cache), 'miss' (fetched upstream), "
+    "'coalesced' (shared a concurrent fetch) or 'error'.",
+    ["result"])
+PROXY_UPSTREAM_SECONDS = Histogram(
+    "vista_api_proxy_upstream_seconds", "Time spent fetching '/proxy' responses from upstream APIs.")
+PROXY_CACHE_EVICTIONS = Counter(
+    "vista_api_proxy_cache_evictions_total",
+    "Responses deleted from the '/proxy' disk cache to stay under PROXY_CACHE_MAX_BYTES.")
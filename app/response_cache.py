@@ -0,0 +1,137 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# --- Configuration ---
+# Maximum number of distinct queries whose encoded JSON is kept per snapshot, and the
+# most bytes of encoded (and compressed) bodies they may hold together. Paging
+# parameters make every offset its own entry, so the byte budget is what bounds memory;
+# a body larger than the whole budget is returned but not kept. Whole-sheet responses
+# encoded when the snapshot is loaded are pinned and count towards neither limit.
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", 256))
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+
+def _value_bytes(value):
+    # Size of a cached value: an encoded body, or a (status, body, total) tuple.
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, tuple):
+        return sum(len(item) for item in value if isinstance(item, (bytes, bytearray)))
+    return 0
+
+
+class ResponseCache:
+    """
+    A small thread-safe LRU of encoded query results, keyed by the normalized query
+    (sheet, filters, paging and projection). Values are whatever the builder returns,
+    typically a (status, body, total) tuple or a compressed body. The least recently
+    used entries are evicted once there are more than `max_entries` of them or their
+    bodies add up to more than `max_bytes`.
+
+    One ResponseCache belongs to one snapshot, so entries never need invalidating:
+    when a new snapshot is published the old cache is simply dropped with it.
+
+    Attributes:
+        size_bytes: Total size of the bodies of the evictable entries.
+    """
+
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES, max_bytes=RESPONSE_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self._entries = OrderedDict()
+        self._pinned = {}
+        self._pinning = False
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def pinned(self):
+        """
+        Pins every entry stored inside the block: it is never evicted and does not count
+        towards the limits. Used while a snapshot is prepared (before any request can
+        see it) for the handful of whole-sheet responses, so a budget sized for
+        filtered queries never turns those into a rebuild on every request.
+        """
+        self._pinning = True
+        try:
+            yield self
+        finally:
+            self._pinning = False
+
+    def _lookup(self, key):
+        value = self._pinned.get(key)
+        if value is None:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+        return value
+
+    def peek(self, key):
+        """Returns the cached value for `key`, or None, without building anything."""
+        with self._lock:
+            return self._lookup(key)
+
+    def get_or_build(self, key, build):
+        """
+        Returns the cached value for `key`, calling `build()` to create it on a miss.
+        `build` runs outside the lock; if two threads miss at once both build, and the
+        first result stored wins.
+
+        Returns:
+            The cached (or newly built) value.
+        """
+        with self._lock:
+            value = self._lookup(key)
+            if value is not None:
+                return value
+
+        value = build()
+
+        with self._lock:
+            existing = self._lookup(key)
+            if existing is not None:
+                return existing
+            if self._pinning:
+                self._pinned[key] = value
+                return value
+            size = _value_bytes(value)
+            if self.max_entries <= 0 or size > self.max_bytes:
+                return value # Too large to keep: built again on every request.
+            self._entries[key] = value
+            self.size_bytes += size
+            while len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size_bytes -= _value_bytes(evicted)
+        return value
+
+    def __len__(self):
+        return len(self._entries) + len(self._pinned)
+
+
+def cache_key(sheet_name, filters):
+    """
+    Builds the normalized cache key for a query. Filters are matched case-insensitively,
+    so their values are lowercased; empty filters are dropped.
+
+    Expected Data:
+        - `filters`: List of (name, value) pairs.
+
+    Returns:
+        A hashable tuple.
+    """
+    normalized = tuple(sorted((name, value.lower()) for name, value in filters if value))
+    return (sheet_name, normalized)
+
+
+def make_etag(fingerprint, key):
+    """
+    Builds a strong ETag from the snapshot's content fingerprint and the query's cache key.
+    The same query on the same data produces the same ETag in every worker process.
+
+    Returns:
+        The ETag value (unquoted).
+    """
+    return hashlib.sha1(f"{fingerprint}:{key!r}".encode("utf-8")).hexdigest()
@@ -0,0 +1,154 @@
+import fcntl
+import os
+import time
+
+import metrics
+import snapshot_store
+from sheet_cache import fingerprint_frames
+
+# --- Shared snapshot across worker processes ---
+# With SHARED_SNAPSHOT=1, the gunicorn workers of one instance share a single copy of
+# the sheet data instead of each loading and holding its own:
+#
+# - One worker at a time is the leader: it holds an exclusive lock on a file in the
+#   snapshot directory, fetches from Google Sheets (through the SheetWatcher) and saves
+#   every change as a new snapshot version (see snapshot_store.py).
+# - Every worker, the leader included, serves the current version memory-mapped from
+#   that directory. The operating system keeps one copy of the mapped pages, shared by
+#   all workers; put SNAPSHOT_DIR on a tmpfs such as /dev/shm to keep it in RAM.
+# - Followers notice a new version by reading the CURRENT pointer file, which is all a
+#   refresh costs them. If the leader exits, the lock is released and the next worker
+#   to refresh takes over.
+#
+# Indexes and cached responses are still built by each worker from the shared columns.
+
+# How long a worker with nothing to serve waits for the leader to publish the first
+# snapshot before its load fails (and is retried with the cache's backoff).
+SHARED_SNAPSHOT_WAIT_SECONDS = float(os.environ.get("SHARED_SNAPSHOT_WAIT_SECONDS", 120))
+SHARED_SNAPSHOT_POLL_SECONDS = 0.5
+
+LEADER_LOCK_FILE = ".leader.lock"
+
+
+class SharedSnapshotLoader:
+    """
+    A SheetCache loader that serves the current shared snapshot version, and fetches
+    from Google Sheets only while this process is the leader.
+
+    Expected Data:
+        - `watcher`: the SheetWatcher used by the leader to fetch changed worksheets.
+        - `snapshot_dir` (optional): the shared snapshot directory.
+        - `can_lead` (optional): False to only ever follow (e.g. in offline mode, where
+          the snapshot directory is filled by `python snapshot_store.py build`).
+
+    Attributes:
+        version: The snapshot version this process last loaded, or None.
+        is_leader: True once this process holds the leader lock.
+    """
+
+    def __init__(self, watcher, snapshot_dir=snapshot_store.SNAPSHOT_DIR, can_lead=True):
+        self._watcher = watcher
+        self._snapshot_dir = snapshot_dir
+        self._can_lead = can_lead
+        self._lock_file = None
+        self._frames = None
+        self._fingerprints = {}
+        self.version = None
+        self.is_leader = False
+
+    def initial(self):
+        """
+        Maps the current shared version without waiting or fetching, for
+        SheetCache.bootstrap.
+
+        Returns:
+            A (frames, created_at) tuple, or None if nothing has been published yet.
+        """
+        version = snapshot_store.current_version(self._snapshot_dir)
+        if version is None:
+            return None
+        frames, manifest = self._map(version)
+        return frames, manifest["created_at"]
+
+    def load(self, current_frames=None):
+        """
+        Loads the newest shared version, publishing one first if this process leads.
+
+        Expected Data:
+            - `current_frames` (optional): the frames the cache is serving (None if
+              it has none); if they are not the ones this loader returned last, those
+              are returned again.
+
+        Returns:
+            A dictionary of worksheet name -> DataFrame if there is a version this
+            process is not serving yet, otherwise None.
+
+        Raises:
+            RuntimeError: If no version is published within SHARED_SNAPSHOT_WAIT_SECONDS.
+            Exception: Whatever the leader's fetch or save raised.
+        """
+        if self._can_lead and self._try_lead():
+            frames = self._watcher.load()
+            if frames is not None:
+                self._publish(frames)
+
+        version = self._wait_for_version()
+        in_use = current_frames is not None and current_frames is self._frames
+        if version == self.version:
+            return None if in_use else self._frames
+        frames, _ = self._map(version)
+        return frames
+
+    def _try_lead(self):
+        if self._lock_file is not None:
+            return True
+        os.makedirs(self._snapshot_dir, exist_ok=True)
+        lock_file = open(os.path.join(self._snapshot_dir, LEADER_LOCK_FILE), "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        # Kept open (and locked) for the life of the process.
+        self._lock_file = lock_file
+        self.is_leader = True
+        metrics.SHARED_SNAPSHOT_LEADER.set(1)
+        print(f"--- Worker {os.getpid()} is now the shared snapshot leader. ---")
+        return True
+
+    def _publish(self, frames):
+        # A new leader's first fetch usually matches what is already published.
+        current = snapshot_store.current_version(self._snapshot_dir)
+        if current is not None:
+            published = snapshot_store.read_manifest(current, self._snapshot_dir)["fingerprint"]
+            if published == fingerprint_frames(frames):
+                print(f"--- Shared snapshot {current} is already up to date. ---")
+                self._watcher.adopt(self._map(current)[0])
+                return
+        version = snapshot_store.save_snapshot(frames, self._snapshot_dir)
+        print(f"--- Published shared snapshot {version}. ---")
+        # Serve (and keep) the mapped copy rather than the freshly parsed one.
+        self._watcher.adopt(self._map(version)[0])
+
+    def _wait_for_version(self):
+        deadline = time.monotonic() + SHARED_SNAPSHOT_WAIT_SECONDS
+        while True:
+            version = snapshot_store.current_version(self._snapshot_dir)
+            if version is not None:
+                return version
+            if self.is_leader or time.monotonic() >= deadline:
+                raise RuntimeError(f"No shared snapshot has been published in {self._snapshot_dir} yet.")
+            time.sleep(SHARED_SNAPSHOT_POLL_SECONDS)
+
+    def _map(self, version):
+        if version == self.version:
+            return self._frames, snapshot_store.read_manifest(version, self._snapshot_dir)
+        # Worksheets whose fingerprint did not change keep their DataFrame objects, so
+        # prepare_snapshot can reuse their indexes.
+        reuse = {name: (self._fingerprints[name], df) for name, df in (self._frames or {}).items()
+                 if name in self._fingerprints}
+        frames, manifest = snapshot_store.load_snapshot(version, self._snapshot_dir, reuse=reuse)
+        self._frames = frames
+        self._fingerprints = {name: entry.get("fingerprint") for name, entry in manifest["sheets"].items()}
+        self.version = version
+        return frames, manifest
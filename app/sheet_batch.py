@@ -0,0 +1,193 @@
+import os
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+
+import metrics
+from response_cache import make_etag
+from sheet_query import QueryError, encode_json
+from sheet_search import SearchQuery
+
+# --- Configuration ---
+# Most queries one '/batch' request may contain.
+BATCH_MAX_QUERIES = int(os.environ.get("BATCH_MAX_QUERIES", 20))
+
+
+def _query_args(spec, position):
+    """
+    Merges a batch entry's `endpoint` query string and `params` into one dictionary of
+    request arguments (later `params` win), the way Flask's request.args would read them.
+
+    Raises:
+        QueryError: 400 if `params` is not an object of plain values.
+    """
+    where = f"queries[{position}]"
+    args = dict(parse_qsl(urlsplit(spec.get("endpoint") or "").query))
+    params = spec.get("params") or {}
+    if not isinstance(params, dict):
+        raise QueryError(400, f"{where}: 'params' must be an object.")
+    for name, value in params.items():
+        if isinstance(value, (dict, list)):
+            raise QueryError(400, f"{where}: parameter '{name}' must be a string or a number.")
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            value = "true" if value else "false"
+        args[name] = str(value)
+    return args
+
+
+class BatchQuery:
+    """
+    Several queries answered together, all from one snapshot (POST '/batch').
+
+    Each query is built exactly as its GET endpoint would build it, so it accepts the
+    same parameters and fails the same way; a query that fails only turns its own
+    result into an error. Rows are looked up per query but materialized once per
+    batch: every distinct (sheet, row) that any query returns appears once in the
+    response's `rows` array, and each result lists the positions of its rows in that
+    array. When queries on one sheet asked for different `fields`, its rows carry the
+    union of those columns. The encoded response is memoized in the snapshot's
+    ResponseCache, keyed by the keys of its queries.
+
+    Attributes:
+        key: Normalized cache key (the key or error of every query, in order).
+        etag: Strong ETag for the batch on this snapshot.
+    """
+
+    # Batch results are always one JSON document.
+    output_format = "json"
+
+    def __init__(self, snapshot, queries):
+        self.snapshot = snapshot
+        # SheetQuery / SearchQuery objects, or the QueryError a query failed with.
+        self.queries = queries
+        self.key = ("batch",) + tuple(("error", q.status, str(q)) if isinstance(q, QueryError) else q.key
+                                      for q in queries)
+        self.etag = make_etag(snapshot.fingerprint, self.key)
+
+    @classmethod
+    def from_json(cls, snapshot, payload, build_endpoint_query):
+        """
+        Builds a batch from a request body of the form
+        `{"queries": [{"endpoint": "/query_census_apis_full_list", "params": {"year": "2019"}}, ...]}`.
+
+        Each entry names a query endpoint ('/query_api_paths',
+        '/query_census_apis_full_list', '/sheets/<name>/query' or '/search'), which may
+        carry a query string, and optional `params`. `{"sheet": "<name>", ...}` is short
+        for `{"endpoint": "/sheets/<name>/query", ...}`. A bare list of entries is
+        accepted as well.
+
+        Expected Data:
+            - `build_endpoint_query(snapshot, endpoint, args)`: Builds the SheetQuery or
+              SearchQuery for an endpoint path, raising QueryError if it cannot.
+
+        Raises:
+            QueryError: 400 for a malformed body, an empty batch or more than
+                BATCH_MAX_QUERIES queries. Errors of single queries do not raise.
+        """
+        specs = payload.get("queries") if isinstance(payload, dict) else payload
+        if not isinstance(specs, list) or not specs:
+            raise QueryError(400, "The request body must be a JSON object with a non-empty 'queries' list.")
+        if len(specs) > BATCH_MAX_QUERIES:
+            raise QueryError(400, f"A batch may contain at most {BATCH_MAX_QUERIES} queries.")
+
+        queries = []
+        for position, spec in enumerate(specs):
+            if not isinstance(spec, dict) or not (spec.get("endpoint") or spec.get("sheet")):
+                raise QueryError(400, f"queries[{position}] must be an object with an 'endpoint' or a 'sheet'.")
+            for field in ("endpoint", "sheet"):
+                if spec.get(field) is not None and not isinstance(spec[field], str):
+                    raise QueryError(400, f"queries[{position}]: '{field}' must be a string.")
+            endpoint = urlsplit(spec["endpoint"]).path if spec.get("endpoint") else f"/sheets/{spec['sheet']}/query"
+            args = _query_args(spec, position)
+            try:
+                query = build_endpoint_query(snapshot, endpoint, args)
+                if query.output_format != "json":
+                    raise QueryError(400, "Query parameter 'format' must be 'json' in a batch.")
+            except QueryError as e:
+                query = e
+            queries.append(query)
+        return cls(snapshot, queries)
+
+    def _build(self):
+        # Pass 1: run every query down to row positions. Each result keeps a list of
+        # (sheet name, positions) segments, in result order.
+        results, segments = [], []
+        columns = {} # sheet name -> set of requested columns, or None for every column
+        with metrics.Timer(metrics.QUERY_PHASE_SECONDS.labels("batch", "filter")):
+            for query in self.queries:
+                if isinstance(query, QueryError):
+                    results.append(dict(query.payload, status=query.status))
+                    segments.append([])
+                elif isinstance(query, SearchQuery):
+                    hits = query.hits()
+                    results.append({"status": 200, "scores": [round(score, 4) for _, _, score in hits]})
+                    segments.append([(sheet_name, np.array([row])) for sheet_name, row, _ in hits])
+                    for sheet_name, _, _ in hits:
+                        columns[sheet_name] = None
+                else:
+                    positions, total = query.page()
+                    if positions is None:
+                        results.append({"status": 404, "message": query.not_found_message})
+                        segments.append([])
+                        continue
+                    results.append({"status": 200, "total": total})
+                    segments.append([(query.sheet_name, positions)])
+                    wanted = columns.get(query.sheet_name, set())
+                    columns[query.sheet_name] = None if wanted is None or not query.fields else wanted | set(query.fields)
+
+        # Pass 2: the distinct rows of each sheet, in order of first appearance.
+        with metrics.Timer(metrics.QUERY_PHASE_SECONDS.labels("batch", "to_dict")):
+            by_sheet = {}
+            for result_segments in segments:
+                for sheet_name, positions in result_segments:
+                    by_sheet.setdefault(sheet_name, []).append(positions)
+            rows, lookups, start = [], {}, 0
+            for sheet_name, arrays in by_sheet.items():
+                combined = np.concatenate(arrays)
+                distinct, first = np.unique(combined, return_index=True)
+                ordered = combined[np.sort(first)]
+                # rank[i] is the position within `ordered` of distinct[i].
+                rank = np.empty(len(distinct), dtype=np.int64)
+                rank[np.searchsorted(distinct, ordered)] = np.arange(len(ordered))
+                lookups[sheet_name] = (distinct, rank, start)
+                start += len(ordered)
+
+                df = self.snapshot.frames[sheet_name]
+                wanted = columns[sheet_name]
+                page = df.iloc[ordered]
+                if wanted is not None:
+                    page = page[[column for column in df.columns if column in wanted]]
+                rows += [{"sheet": sheet_name, "row": row, "record": record}
+                         for row, record in zip(ordered.tolist(), page.to_dict(orient='records'))]
+
+            # Pass 3: point each result at its rows.
+            for result, result_segments in zip(results, segments):
+                if result["status"] != 200:
+                    continue
+                refs = []
+                for sheet_name, positions in result_segments:
+                    distinct, rank, offset = lookups[sheet_name]
+                    refs += (offset + rank[np.searchsorted(distinct, positions)]).tolist()
+                result["rows"] = refs
+
+        with metrics.Timer(metrics.QUERY_PHASE_SECONDS.labels("batch", "encode")):
+            body = encode_json({"snapshot": self.snapshot.fingerprint, "results": results, "rows": rows})
+        return 200, body, None
+
+    def execute(self):
+        """
+        Runs the batch, or returns its memoized result.
+
+        Returns:
+            A (status, body, total) tuple like SheetQuery.execute: status 200 (whatever
+            the status of the single queries), the encoded JSON document, and None.
+        """
+        return self.snapshot.responses.get_or_build(self.key, self._build)
+
+    def cached_result(self):
+        """Returns the memoized result, or None, counting a response cache hit or miss."""
+        result = self.snapshot.responses.peek(self.key)
+        metrics.RESPONSE_CACHE_LOOKUPS.labels("batch", "miss" if result is None else "hit").inc()
+        return result
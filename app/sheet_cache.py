@@ -0,0 +1,338 @@
+import hashlib
+import os
+import threading
+import time
+
+import pandas as pd
+
+import metrics
+
+# --- Configuration ---
+# How long (in seconds) a loaded snapshot is considered fresh. Once it is older than
+# this, the next request still gets the cached snapshot immediately, but a refresh is
+# started on a background thread (stale-while-revalidate).
+SHEET_CACHE_TTL_SECONDS = float(os.environ.get("SHEET_CACHE_TTL_SECONDS", 300))
+# After a failed load we wait this long before trying again, doubling on each
+# consecutive failure up to SHEET_CACHE_MAX_BACKOFF_SECONDS.
+SHEET_CACHE_MIN_BACKOFF_SECONDS = float(os.environ.get("SHEET_CACHE_MIN_BACKOFF_SECONDS", 5))
+SHEET_CACHE_MAX_BACKOFF_SECONDS = float(os.environ.get("SHEET_CACHE_MAX_BACKOFF_SECONDS", 300))
+
+
+def fingerprint_frames(frames):
+    """
+    Computes a content hash of a dictionary of DataFrames. Two loads of identical sheet
+    contents give the same fingerprint, regardless of process or load order.
+
+    Returns:
+        A hex digest string.
+    """
+    digest = hashlib.sha1()
+    for sheet_name in sorted(frames):
+        df = frames[sheet_name]
+        digest.update(sheet_name.encode("utf-8"))
+        digest.update("\x1f".join(map(str, df.columns)).encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+class SheetCacheError(Exception):
+    """Raised when no snapshot is available because every load so far has failed."""
+
+
+class SheetSnapshot:
+    """
+    One consistent, read-only view of every worksheet, produced by a single load.
+
+    Requests should grab a snapshot once and read everything from it, so a refresh
+    that lands mid-request can never mix rows from two different loads.
+
+    Attributes:
+        frames: Dictionary mapping worksheet names to pandas DataFrames.
+        version: Integer that increases by one every time a new snapshot is published.
+        fingerprint: Content hash of `frames` (see fingerprint_frames), stable across
+            processes, used to build ETags.
+        loaded_at: Unix timestamp of when the load finished, moved forward whenever a
+            later load confirms the data has not changed.
+        plans: Dictionary of sheet URL name -> SheetPlan (see sheet_query.py), filled in
+            by the cache's `prepare` hook.
+        indexes: Dictionary of worksheet name -> {column name -> ColumnIndex},
+            filled in by `prepare`.
+        responses: ResponseCache of encoded JSON bodies, filled in by `prepare`.
+        search: SearchIndex over every worksheet (see sheet_search.py), filled in by `prepare`.
+    """
+
+    def __init__(self, frames, version, loaded_at=None):
+        self.frames = frames
+        self.version = version
+        self.loaded_at = loaded_at if loaded_at is not None else time.time()
+        self.fingerprint = fingerprint_frames(frames)
+        self.plans = {}
+        self.indexes = {}
+        self.responses = None
+        self.search = None
+
+    @property
+    def age(self):
+        """Seconds since this snapshot was loaded."""
+        return time.time() - self.loaded_at
+
+
+class SheetCache:
+    """
+    A TTL-aware cache around a spreadsheet loader function.
+
+    - Cold start: the first caller(s) wait for a single load; concurrent callers share
+      it instead of each hitting Google Sheets (single-flight).
+    - Stale data: once the snapshot is older than `ttl_seconds`, callers keep getting the
+      old snapshot immediately while one background thread reloads it.
+    - Failures: a failed load never replaces a good snapshot. Retries are spaced out
+      with exponential backoff, and the last good snapshot keeps being served.
+
+    Expected Data:
+        - `loader`: a callable taking no arguments and returning a dictionary of
+          worksheet name -> DataFrame. It should raise on failure. It may return None
+          to report that the data has not changed since the current snapshot was
+          loaded (see sheet_watcher.SheetWatcher); the snapshot is then kept, and
+          counts as freshly loaded, without being rebuilt.
+        - `prepare` (optional): a callable taking the new SheetSnapshot. It runs on the
+          loading thread before the snapshot is published, so derived structures
+          (search indexes and the like) are never built on a request thread.
+    """
+
+    def __init__(self, loader, prepare=None, ttl_seconds=SHEET_CACHE_TTL_SECONDS,
+                 min_backoff_seconds=SHEET_CACHE_MIN_BACKOFF_SECONDS,
+                 max_backoff_seconds=SHEET_CACHE_MAX_BACKOFF_SECONDS):
+        self._loader = loader
+        self._prepare = prepare
+        self.ttl_seconds = ttl_seconds
+        self.min_backoff_seconds = min_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+
+        self._snapshot = None
+        self._lock = threading.Lock()
+        # Set while a load is running; waiters block on `_load_done` until it finishes.
+        self._loading = False
+        self._load_done = threading.Condition(self._lock)
+
+        self.last_error = None
+        self._consecutive_failures = 0
+        self._retry_at = 0.0
+
+    # --- Public API ---
+
+    def get(self, runner=None):
+        """
+        Returns the current SheetSnapshot, loading it first if nothing has been loaded yet.
+
+        Expected Data:
+            - `runner` (optional): how to start a background refresh; see
+              refresh_in_background.
+
+        Returns:
+            A SheetSnapshot. If the snapshot is stale a background refresh is started,
+            but the (stale) snapshot is still returned without waiting.
+
+        Raises:
+            SheetCacheError: If there is no snapshot and the load failed (or a
+            previous failure is still inside its backoff window).
+        """
+        snapshot = self._snapshot
+        if snapshot is not None:
+            if snapshot.age >= self.ttl_seconds:
+                metrics.SHEET_CACHE_REQUESTS.labels("stale").inc()
+                self.refresh_in_background(runner)
+            else:
+                metrics.SHEET_CACHE_REQUESTS.labels("fresh").inc()
+            return snapshot
+        metrics.SHEET_CACHE_REQUESTS.labels("miss").inc()
+        return self._wait_for_first_snapshot()
+
+    def peek(self):
+        """Returns the current snapshot (or None) without ever triggering a load."""
+        return self._snapshot
+
+    def refresh_in_background(self, runner=None):
+        """
+        Starts a background reload unless one is already running or we are backing off.
+
+        Expected Data:
+            - `runner` (optional): a callable that is handed the load function and must
+              arrange for it to run without blocking the caller. By default it is run on
+              a new daemon thread; the ASGI server passes a runner that schedules it as
+              an asyncio task instead.
+
+        Returns:
+            True if a refresh was started, False otherwise.
+        """
+        with self._lock:
+            if not self._claim_load_locked():
+                return False
+        metrics.SHEET_CACHE_REFRESHES.inc()
+        if runner is None:
+            thread = threading.Thread(target=self._run_load, name="sheet-cache-refresh", daemon=True)
+            thread.start()
+        else:
+            runner(self._run_load)
+        return True
+
+    def refresh_now(self):
+        """
+        Reloads synchronously in the calling thread, ignoring TTL and backoff.
+        If another load is already running this waits for it instead.
+
+        Returns:
+            The snapshot that is current after the load finished.
+        """
+        with self._lock:
+            if self._loading:
+                while self._loading:
+                    self._load_done.wait()
+                return self._snapshot
+            self._loading = True
+        self._run_load()
+        return self._snapshot
+
+    def publish(self, frames, loaded_at=None):
+        """
+        Installs an already-loaded set of frames as the new snapshot.
+
+        Expected Data:
+            - `loaded_at` (optional): when the data was originally loaded. Passing an
+              older time makes the snapshot count as stale sooner.
+
+        Returns:
+            The newly published SheetSnapshot.
+        """
+        snapshot = self._build_snapshot(frames, loaded_at)
+        with self._lock:
+            self._install_locked(snapshot)
+            return snapshot
+
+    def bootstrap(self, initial_loader, reconcile=True):
+        """
+        Starts the cache from a quick local source (e.g. an on-disk snapshot) on a
+        background thread, then reconciles with the real loader.
+
+        Requests that arrive during bootstrap wait for it like any cold-start load. If
+        `initial_loader` has nothing to offer (returns None) or fails, the real loader
+        is used straight away instead.
+
+        Expected Data:
+            - `initial_loader`: a callable returning a (frames, loaded_at) tuple, or None.
+            - `reconcile`: if True, a background refresh from the real loader is started
+              as soon as the initial snapshot is published.
+
+        Returns:
+            True if the bootstrap thread was started, False if a load was already running.
+        """
+        with self._lock:
+            if not self._claim_load_locked():
+                return False
+        thread = threading.Thread(target=self._run_bootstrap, args=(initial_loader, reconcile),
+                                  name="sheet-cache-bootstrap", daemon=True)
+        thread.start()
+        return True
+
+    # --- Internals ---
+
+    def _build_snapshot(self, frames, loaded_at=None):
+        # The version is filled in when the snapshot is installed.
+        snapshot = SheetSnapshot(frames, version=0, loaded_at=loaded_at)
+        if self._prepare is not None:
+            self._prepare(snapshot)
+        return snapshot
+
+    def _install_locked(self, snapshot):
+        # Must be called with self._lock held.
+        snapshot.version = self._snapshot.version + 1 if self._snapshot is not None else 1
+        self._snapshot = snapshot
+
+    def _claim_load_locked(self):
+        # Must be called with self._lock held. Returns True if the caller now owns the load.
+        if self._loading or time.time() < self._retry_at:
+            return False
+        self._loading = True
+        return True
+
+    def _wait_for_first_snapshot(self):
+        with self._lock:
+            if self._snapshot is None and self._claim_load_locked():
+                owner = True
+            else:
+                owner = False
+                while self._loading:
+                    self._load_done.wait()
+        if owner:
+            self._run_load()
+
+        snapshot = self._snapshot
+        if snapshot is None:
+            raise SheetCacheError(str(self.last_error) if self.last_error else "Data has not been loaded yet.")
+        return snapshot
+
+    def _run_bootstrap(self, initial_loader, reconcile):
+        # Runs while this thread holds the load claim (self._loading is True).
+        snapshot = None
+        try:
+            initial = initial_loader()
+            if initial is not None:
+                frames, loaded_at = initial
+                snapshot = self._build_snapshot(frames, loaded_at)
+        except Exception as e:
+            print(f"--- WARNING: could not bootstrap the sheet cache ({e}); loading normally. ---")
+
+        if snapshot is None:
+            self._run_load()
+            return
+
+        with self._lock:
+            self._install_locked(snapshot)
+            self._loading = False
+            self._load_done.notify_all()
+        print(f"--- Sheet cache bootstrapped snapshot v{snapshot.version} ({snapshot.age:.0f}s old). ---")
+        if reconcile:
+            self.refresh_in_background()
+
+    def _run_load(self):
+        # Runs the loader outside the lock so readers are never blocked by Google Sheets.
+        started = time.perf_counter()
+        snapshot = None
+        error = None
+        try:
+            frames = self._loader()
+            if frames is not None:
+                snapshot = self._build_snapshot(frames)
+            elif self._snapshot is None:
+                raise RuntimeError("The loader reported no changes, but no data has been loaded yet.")
+        except Exception as e:
+            error = e
+
+        with self._lock:
+            elapsed = time.perf_counter() - started
+            if error is None and snapshot is None:
+                # Nothing changed: the current snapshot is still up to date.
+                self._snapshot.loaded_at = time.time()
+                self.last_error = None
+                self._consecutive_failures = 0
+                self._retry_at = 0.0
+                metrics.SHEET_CACHE_LOADS.labels("unchanged").inc()
+                print(f"--- Sheet cache confirmed snapshot v{self._snapshot.version} is current in {elapsed:.2f}s. ---")
+            elif error is None:
+                self._install_locked(snapshot)
+                self.last_error = None
+                self._consecutive_failures = 0
+                self._retry_at = 0.0
+                metrics.SHEET_CACHE_LOADS.labels("success").inc()
+                metrics.SHEET_CACHE_LOAD_SECONDS.set(elapsed)
+                print(f"--- Sheet cache loaded snapshot v{snapshot.version} in {elapsed:.2f}s. ---")
+            else:
+                metrics.SHEET_CACHE_LOADS.labels("failure").inc()
+                self.last_error = error
+                self._consecutive_failures += 1
+                backoff = min(self.max_backoff_seconds,
+                              self.min_backoff_seconds * (2 ** (self._consecutive_failures - 1)))
+                self._retry_at = time.time() + backoff
+                serving = "serving last good snapshot" if self._snapshot is not None else "no snapshot available"
+                print(f"--- ERROR during data load: {error} ({serving}; retrying in {backoff:.0f}s) ---")
+            self._loading = False
+            self._load_done.notify_all()
@@ -0,0 +1,457 @@
+import bisect
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+# --- Configuration ---
+# Length of the character n-grams used to find candidate values for a substring query.
+# Needles shorter than this fall back to a scan over the column's distinct values.
+NGRAM_SIZE = 3
+# Fuzzy matching ('match=fuzzy'): a word of the query matches a word of a value when
+# their similarity (1 - edit distance / length of the longer word) is at least
+# FUZZY_MIN_SIMILARITY, and a value matches the query when the average similarity of
+# the query's words to their best match in the value is at least FUZZY_MIN_SCORE.
+FUZZY_MIN_SIMILARITY = float(os.environ.get("FUZZY_MIN_SIMILARITY", 0.7))
+FUZZY_MIN_SCORE = float(os.environ.get("FUZZY_MIN_SCORE", 0.7))
+# Number of vocabulary words (those sharing the most n-grams with a query word) whose
+# edit distance to the query word is actually computed.
+FUZZY_CANDIDATES = 32
+# A query word of at least this many letters that starts a longer word ('amer' for
+# 'american') counts as a match with FUZZY_PREFIX_SIMILARITY.
+FUZZY_MIN_PREFIX = 3
+FUZZY_PREFIX_SIMILARITY = 0.9
+
+# Match modes a ColumnIndex can be built for ('sort' is not a match mode but is built
+# the same way).
+MATCH_MODES = ("contains", "exact", "prefix", "year", "fuzzy")
+
+_WORD_PATTERN = re.compile(r"\w+")
+# A four-digit number that is not part of a longer one.
+_YEAR_PATTERN = re.compile(r"(?<!\d)\d{4}(?!\d)")
+
+
+def _ngrams(text, n=NGRAM_SIZE):
+    """Returns the set of character n-grams in `text`."""
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class ColumnIndex:
+    """
+    A case-insensitive index over one DataFrame column, answering the lookups of the
+    query engine's match modes (see MATCH_MODES) and its sort orders.
+
+    The index works on the column's distinct lowercased values rather than on rows:
+    a lookup finds the matching values, which are then expanded to the row positions
+    that hold them. Columns like 'Categorization' only have a few dozen distinct
+    values, so lookups touch very little data. For 'category' dtype columns the index
+    reuses the column's own integer codes.
+
+    Only the structures needed for the requested `modes` are built:
+        - 'contains': a trigram posting list narrows a query down to a handful of
+          candidate values, each verified with a plain `in` check. Equivalent to
+          `Series.str.contains(needle, case=False, na=False, regex=False)`.
+        - 'exact': a dictionary from value to value id (whole-value match).
+        - 'prefix' and 'sort': the distinct values in sorted order; a prefix matches
+          a contiguous run of them, found by binary search.
+        - 'year': the ids of the values containing each four-digit number that is not
+          part of a longer number ('2019' in '.../data/2019/acs/acs1').
+        - 'fuzzy': a FuzzyIndex, kept as the `fuzzy` attribute (None otherwise). It
+          also builds the trigram postings, for literal matches.
+
+    Cells that are not strings (blanks from the sheet, numbers) never match, as before.
+    """
+
+    def __init__(self, values, modes=("contains",)):
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Categorical columns already carry integer codes: only the categories need
+            # lowercasing, and categories that differ only in case are merged.
+            category_codes, uniques = pd.factorize(
+                values.cat.categories.map(lambda v: v.lower() if isinstance(v, str) else None),
+                use_na_sentinel=True,
+            )
+            lookup = np.append(category_codes, -1) # Maps the -1 "missing" code to -1.
+            codes = lookup[values.cat.codes.to_numpy()]
+        else:
+            lowered = values.map(lambda v: v.lower() if isinstance(v, str) else None)
+            codes, uniques = pd.factorize(lowered, use_na_sentinel=True)
+        # codes[row] is the id of the row's distinct value (-1 for non-strings).
+        self._codes = codes.astype(np.int64, copy=False)
+        self._values = [str(u) for u in uniques]
+        self.row_count = len(values)
+        self.modes = frozenset(modes)
+
+        # Row positions grouped by distinct value: rows of value i are
+        # self._rows_by_value[self._offsets[i]:self._offsets[i + 1]], already sorted.
+        self._rows_by_value = np.argsort(self._codes, kind="stable")
+        self._offsets = np.searchsorted(self._codes[self._rows_by_value],
+                                        np.arange(len(self._values) + 1))
+
+        self._postings = {}
+        if self.modes & {"contains", "fuzzy"}:
+            for value_id, value in enumerate(self._values):
+                for gram in _ngrams(value):
+                    self._postings.setdefault(gram, set()).add(value_id)
+
+        if "exact" in self.modes:
+            self._ids_by_value = {value: i for i, value in enumerate(self._values)}
+
+        if self.modes & {"prefix", "sort"}:
+            # Value ids in sorted value order, and each value's rank in that order; the
+            # extra last rank (for the -1 code) sorts blank cells after every value.
+            # Empty strings (the loader's blank cells) share that last rank.
+            self._sorted_ids = np.array(sorted(range(len(self._values)), key=self._values.__getitem__),
+                                        dtype=np.int64)
+            self._sorted_values = [self._values[i] for i in self._sorted_ids]
+            self._ranks = np.empty(len(self._values) + 1, dtype=np.int64)
+            self._ranks[self._sorted_ids] = np.arange(len(self._values))
+            self._ranks[-1] = len(self._values)
+            if "" in self._values:
+                self._ranks[self._values.index("")] = len(self._values)
+
+        if "year" in self.modes:
+            self._ids_by_year = {}
+            for value_id, value in enumerate(self._values):
+                for year in set(_YEAR_PATTERN.findall(value)):
+                    self._ids_by_year.setdefault(year, []).append(value_id)
+
+        self.fuzzy = FuzzyIndex(self) if "fuzzy" in self.modes else None
+
+    def _matching_value_ids(self, needle):
+        if len(needle) < NGRAM_SIZE:
+            return [i for i, value in enumerate(self._values) if needle in value]
+
+        # Intersect the smallest posting lists first; an n-gram that never occurs
+        # means nothing can match.
+        postings = []
+        for gram in _ngrams(needle):
+            posting = self._postings.get(gram)
+            if not posting:
+                return []
+            postings.append(posting)
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates &= posting
+            if not candidates:
+                return []
+        return [i for i in candidates if needle in self._values[i]]
+
+    def _prefixed_value_ids(self, prefix):
+        start = bisect.bisect_left(self._sorted_values, prefix)
+        # Every string starting with `prefix` sorts before prefix + the highest code point.
+        stop = bisect.bisect_left(self._sorted_values, prefix + "\U0010ffff", start)
+        return self._sorted_ids[start:stop]
+
+    def value_ids(self, needle, mode="contains"):
+        """
+        Returns the ids of the distinct values matching `needle` (ignoring case) in
+        `mode`: 'contains', 'exact', 'prefix' or 'year'.
+
+        Raises:
+            ValueError: If the index was not built for `mode`.
+        """
+        if mode not in self.modes or mode == "fuzzy":
+            raise ValueError(f"This index does not support '{mode}' lookups.")
+        needle = needle.lower()
+        if mode == "exact":
+            value_id = self._ids_by_value.get(needle)
+            return [] if value_id is None else [value_id]
+        if mode == "prefix":
+            return self._prefixed_value_ids(needle)
+        if mode == "year":
+            return self._ids_by_year.get(needle, [])
+        return self._matching_value_ids(needle)
+
+    @property
+    def value_count(self):
+        """Number of distinct (lowercased, non-missing) values in the column."""
+        return len(self._values)
+
+    def value_rows(self, value_id):
+        """Returns the sorted row positions holding distinct value `value_id`."""
+        return self._rows_by_value[self._offsets[value_id]:self._offsets[value_id + 1]]
+
+    def lookup(self, needle, mode="contains"):
+        """
+        Finds the rows whose value matches `needle` in `mode` (see value_ids), ignoring case.
+
+        Returns:
+            A sorted numpy array of row positions (suitable for `DataFrame.iloc`).
+        """
+        value_ids = self.value_ids(needle, mode)
+        if len(value_ids) == 0:
+            return np.empty(0, dtype=np.int64)
+        if len(value_ids) == 1:
+            return self.value_rows(value_ids[0])
+
+        # Many matching values: mark them in a lookup table and select rows in one
+        # vectorized pass. The extra last slot stays False and absorbs the -1 codes.
+        selected = np.zeros(len(self._values) + 1, dtype=bool)
+        selected[value_ids] = True
+        return np.flatnonzero(selected[self._codes])
+
+    def sort_keys(self, rows, descending=False):
+        """
+        Returns a sort key for each of `rows` (row positions): the rank of the row's
+        value in case-insensitive order, reversed if `descending`. Blank cells get the
+        highest key either way, so they always sort last.
+
+        Raises:
+            ValueError: If the index was not built with the 'sort' mode.
+        """
+        if "sort" not in self.modes:
+            raise ValueError("This index does not support sorting.")
+        ranks = self._ranks[self._codes[rows]]
+        if descending:
+            blank = len(self._values)
+            ranks = np.where(ranks == blank, blank, blank - 1 - ranks)
+        return ranks
+
+
+def _edit_distance(a, b, limit):
+    """
+    Returns the optimal string alignment distance between `a` and `b` (insertions,
+    deletions, substitutions and swaps of adjacent letters, each costing 1), or
+    `limit + 1` as soon as it is known to exceed `limit`.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def word_similarity(query_word, word):
+    """
+    Scores how closely `word` matches `query_word`, between 0 and 1: 1 for the same
+    word, FUZZY_PREFIX_SIMILARITY when the query word is the start of `word`, and
+    otherwise 1 - edit distance / length of the longer word (0 below FUZZY_MIN_SIMILARITY).
+    """
+    if word == query_word:
+        return 1.0
+    if len(query_word) >= FUZZY_MIN_PREFIX and word.startswith(query_word):
+        return FUZZY_PREFIX_SIMILARITY
+    longest = max(len(query_word), len(word))
+    limit = int(longest * (1 - FUZZY_MIN_SIMILARITY) + 1e-9)
+    similarity = 1 - _edit_distance(query_word, word, limit) / longest
+    return similarity if similarity >= FUZZY_MIN_SIMILARITY else 0.0
+
+
+class FuzzyIndex:
+    """
+    A typo-tolerant word index over the distinct values of a ColumnIndex.
+
+    Values are split into lowercase words. Every word of the vocabulary is indexed by
+    the n-grams of its space-padded form, so the words that share the most n-grams
+    with a query word can be found without comparing it to the whole vocabulary; only
+    those FUZZY_CANDIDATES words are compared by edit distance. Words made only of
+    digits (row numbers, years) are matched exactly and are not n-gram indexed.
+
+    A value scores the average, over the query's words, of the best similarity of that
+    query word to any word of the value ('amer community survey' scores 0.97 against
+    'American Community Survey'). Values that contain the query literally score 1, so
+    a fuzzy lookup returns everything a plain substring lookup would, ranked first.
+    Scores are computed per distinct value and then spread to that value's rows.
+    """
+
+    def __init__(self, column_index):
+        self._index = column_index
+        values = pd.Series(column_index._values, dtype=object)
+        words = values.str.findall(_WORD_PATTERN.pattern).explode().dropna()
+        # word_codes[k] is the vocabulary id of the k-th (value, word) pair.
+        word_codes, vocabulary = pd.factorize(words.to_numpy())
+        value_ids = words.index.to_numpy(dtype=np.int64)
+        self._vocabulary = [str(w) for w in vocabulary]
+        self._word_ids = {word: i for i, word in enumerate(self._vocabulary)}
+
+        # Value ids grouped by word: the values containing word i are
+        # self._values_by_word[self._word_offsets[i]:self._word_offsets[i + 1]].
+        # A word repeated within one value is kept once.
+        order = np.lexsort((value_ids, word_codes))
+        word_codes, value_ids = word_codes[order], value_ids[order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = (word_codes[1:] != word_codes[:-1]) | (value_ids[1:] != value_ids[:-1])
+        self._values_by_word = value_ids[first]
+        self._word_offsets = np.searchsorted(word_codes[first], np.arange(len(self._vocabulary) + 1))
+
+        postings = {}
+        self._gram_counts = np.zeros(len(self._vocabulary), dtype=np.int64)
+        for word_id, word in enumerate(self._vocabulary):
+            if word.isdigit():
+                continue
+            grams = _ngrams(f" {word} ")
+            self._gram_counts[word_id] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(word_id)
+        self._postings = {gram: np.array(ids, dtype=np.int64) for gram, ids in postings.items()}
+
+    def _similar_words(self, query_word):
+        """Returns a list of (vocabulary id, similarity) for the words matching `query_word`."""
+        exact = self._word_ids.get(query_word)
+        if query_word.isdigit():
+            return [] if exact is None else [(exact, 1.0)]
+
+        grams = _ngrams(f" {query_word} ")
+        postings = [self._postings[gram] for gram in grams if gram in self._postings]
+        if not postings:
+            return [] if exact is None else [(exact, 1.0)]
+        candidates, shared = np.unique(np.concatenate(postings), return_counts=True)
+        # Dice coefficient of the two n-gram sets, used only to pick whom to compare.
+        dice = 2 * shared / (len(grams) + self._gram_counts[candidates])
+        if len(candidates) > FUZZY_CANDIDATES:
+            best = np.argpartition(-dice, FUZZY_CANDIDATES - 1)[:FUZZY_CANDIDATES]
+            candidates = candidates[best]
+
+        matches = {} if exact is None else {exact: 1.0}
+        for word_id in candidates.tolist():
+            similarity = word_similarity(query_word, self._vocabulary[word_id])
+            if similarity > 0:
+                matches[word_id] = max(similarity, matches.get(word_id, 0.0))
+        return list(matches.items())
+
+    def value_scores(self, needle):
+        """
+        Scores every distinct value against `needle`.
+
+        Returns:
+            A (value_ids, scores) pair of numpy arrays holding the values that score at
+            least FUZZY_MIN_SCORE, in no particular order.
+        """
+        needle = needle.lower()
+        query_words = _WORD_PATTERN.findall(needle)
+        scores = np.zeros(self._index.value_count)
+        for query_word in query_words:
+            best = np.zeros(self._index.value_count)
+            for word_id, similarity in self._similar_words(query_word):
+                ids = self._values_by_word[self._word_offsets[word_id]:self._word_offsets[word_id + 1]]
+                best[ids] = np.maximum(best[ids], similarity)
+            scores += best
+        if query_words:
+            scores /= len(query_words)
+        scores[self._index._matching_value_ids(needle)] = 1.0
+
+        value_ids = np.flatnonzero(scores >= FUZZY_MIN_SCORE)
+        return value_ids, scores[value_ids]
+
+    def lookup(self, needle):
+        """
+        Finds the rows whose value approximately matches `needle`, ignoring case.
+
+        Returns:
+            A (rows, scores) pair: a sorted numpy array of row positions and the score
+            of each row's value, between FUZZY_MIN_SCORE and 1.
+        """
+        value_ids, scores = self.value_scores(needle)
+        if len(value_ids) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        if len(value_ids) == 1:
+            rows = self._index.value_rows(value_ids[0])
+            return rows, np.full(len(rows), scores[0])
+
+        # Same vectorized pass as ColumnIndex.lookup, carrying scores instead of a
+        # mask. The extra last slot stays 0 and absorbs the -1 codes.
+        table = np.zeros(self._index.value_count + 1)
+        table[value_ids] = scores
+        row_scores = table[self._index._codes]
+        rows = np.flatnonzero(row_scores)
+        return rows, row_scores[rows]
+
+
+def build_indexes(frames, index_modes):
+    """
+    Builds a ColumnIndex for every column the query engine filters or sorts on.
+
+    Expected Data:
+        - `frames`: Dictionary of worksheet name -> DataFrame.
+        - `index_modes`: Dictionary of worksheet name -> {column name -> collection of
+          modes to build the column's index for (see ColumnIndex)}. Sheets or columns
+          missing from `frames` are skipped.
+
+    Returns:
+        A dictionary of worksheet name -> {column name -> ColumnIndex}.
+    """
+    indexes = {}
+    for sheet_name, columns in index_modes.items():
+        df = frames.get(sheet_name)
+        if df is None:
+            continue
+        indexes[sheet_name] = {column: ColumnIndex(df[column], modes)
+                               for column, modes in columns.items() if column in df.columns}
+    return indexes
+
+
+def filter_rows(sheet_indexes, filters):
+    """
+    Resolves several filters on one sheet to the rows matching all of them.
+
+    Each filter is looked up in its column's ColumnIndex in its own match mode. If any
+    filter is fuzzy (see FuzzyIndex), the rows are ranked by the sum of their fuzzy
+    scores, best first, with ties in sheet order; the other filters do not affect the
+    ranking.
+
+    Expected Data:
+        - `sheet_indexes`: Dictionary of column name -> ColumnIndex for one sheet.
+        - `filters`: List of (column name, match mode, needle) triples. Empty needles
+          are ignored.
+
+    Returns:
+        A numpy array of row positions (sorted, unless ranked), or None if no filter
+        was applied (meaning "every row").
+
+    Raises:
+        KeyError: If a filter names a column that has no index.
+        ValueError: If a column's index was not built for the filter's mode.
+    """
+    filters = [(column, mode, needle) for column, mode, needle in filters if needle]
+    ranked = any(mode == "fuzzy" for _, mode, _ in filters)
+    rows, scores = None, None
+    for column, mode, needle in filters:
+        index = sheet_indexes[column]
+        if mode == "fuzzy":
+            if index.fuzzy is None:
+                raise ValueError(f"Column '{column}' has no fuzzy index.")
+            matches, match_scores = index.fuzzy.lookup(needle)
+        else:
+            matches = index.lookup(needle, mode)
+            match_scores = np.zeros(len(matches)) if ranked else None
+        if rows is None:
+            rows, scores = matches, match_scores
+        elif ranked:
+            rows, mine, theirs = np.intersect1d(rows, matches, assume_unique=True, return_indices=True)
+            scores = scores[mine] + match_scores[theirs]
+        else:
+            rows = np.intersect1d(rows, matches, assume_unique=True)
+        if len(rows) == 0:
+            break
+    if rows is None or not ranked:
+        return rows
+    return rows[np.lexsort((rows, -scores))]
+
+
+def sort_rows(sheet_indexes, rows, sort):
+    """
+    Orders row positions by one or more columns, ignoring case (see ColumnIndex.sort_keys).
+    The sort is stable, so rows with equal keys keep their order in `rows`.
+
+    Expected Data:
+        - `sheet_indexes`: Dictionary of column name -> ColumnIndex for one sheet.
+        - `rows`: Numpy array of row positions.
+        - `sort`: List of (column name, descending) pairs, most significant first.
+
+    Returns:
+        The reordered numpy array of row positions.
+    """
+    # np.lexsort sorts by its last key first.
+    keys = [sheet_indexes[column].sort_keys(rows, descending) for column, descending in reversed(sort)]
+    return rows[np.lexsort(keys)]
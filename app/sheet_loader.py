@@ -0,0 +1,243 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import gspread
+import pandas as pd
+
+# --- Configuration ---
+SERVICE_ACCOUNT_KEY_FILE = 'vista-api-backend-6578a1a1c769.json'
+SPREADSHEET_TITLE = 'Open VA Data APIs'
+# Number of threads used when worksheets are fetched one request per sheet
+# (the fallback when a single batch read is not possible).
+SHEET_FETCH_MAX_WORKERS = int(os.environ.get("SHEET_FETCH_MAX_WORKERS", 8))
+
+
+class WorksheetSchema:
+    """
+    Declares how one worksheet's raw cell values become a DataFrame.
+
+    Attributes:
+        name: Worksheet title.
+        header_row: 1-based row that holds the column names; data starts on the next row.
+            "API Name and Path" and "Census Bureau APIs - Full List" have a title row
+            above the headers, so they use row 2.
+        categorical: Columns with few distinct values (e.g. 'Categorization'). They are
+            stored as pandas 'category' dtype, so each cell is a small integer code
+            instead of its own string object.
+        dtypes: Dictionary of column name -> dtype for any other column that should not
+            stay a plain string column. No worksheet declares any at the moment: every
+            other column is kept as the text shown in the sheet (see WORKSHEET_SCHEMAS).
+    """
+
+    def __init__(self, name, header_row=1, categorical=(), dtypes=None):
+        self.name = name
+        self.header_row = header_row
+        self.categorical = list(categorical)
+        self.dtypes = dtypes or {}
+
+
+# Every worksheet the API loads, in load order.
+# Cells are kept as text, so a numeric-looking cell such as 2019 is returned as the
+# string "2019". The old get_all_records() reads of "VA Data Census Bureau APIs",
+# "VISTA Custom GPT Actions" and "Utilities" returned such cells as JSON numbers; they
+# are strings now because every column of those sheets is a substring filter, which
+# only works on text.
+WORKSHEET_SCHEMAS = [
+    WorksheetSchema("API Name and Path", header_row=2,
+                    categorical=["Categorization", "Source"]),
+    WorksheetSchema("VA Data Census Bureau APIs"),
+    WorksheetSchema("Census Bureau APIs - Full List", header_row=2,
+                    categorical=["Dataset Type"]),
+    WorksheetSchema("VISTA Custom GPT Actions"),
+    WorksheetSchema("Utilities"),
+]
+WORKSHEET_NAMES = [schema.name for schema in WORKSHEET_SCHEMAS]
+
+
+def quote_sheet_range(sheet_name):
+    """
+    Returns an A1 range covering a whole worksheet, e.g. "'API Name and Path'".
+    Single quotes inside the name are doubled, as the Sheets API requires.
+    """
+    return "'" + sheet_name.replace("'", "''") + "'"
+
+
+class FetchResult:
+    """
+    The raw cell values of several worksheets, fetched together.
+
+    Attributes:
+        values: Dictionary of worksheet name -> list of rows (each a list of strings),
+            exactly as returned by the Sheets API. Missing worksheets are left out.
+        timings: Dictionary of worksheet name -> seconds spent fetching it. In batch
+            mode every sheet arrives in the same call, so each gets the call's duration.
+        mode: "batch" if one `values_batch_get` call was used, "parallel" otherwise.
+        errors: Dictionary of worksheet name -> exception for sheets that failed to load
+            in parallel mode.
+    """
+
+    def __init__(self, values, timings, mode, errors=None):
+        self.values = values
+        self.timings = timings
+        self.mode = mode
+        self.errors = errors or {}
+
+
+def _fetch_batch(spreadsheet, worksheet_names):
+    started = time.perf_counter()
+    response = spreadsheet.values_batch_get([quote_sheet_range(name) for name in worksheet_names])
+    elapsed = time.perf_counter() - started
+
+    # valueRanges come back in the same order as the requested ranges.
+    value_ranges = response.get("valueRanges", [])
+    values = {name: value_range.get("values", [])
+              for name, value_range in zip(worksheet_names, value_ranges)}
+    timings = {name: elapsed for name in values}
+    return FetchResult(values, timings, "batch")
+
+
+def _fetch_one(spreadsheet, sheet_name):
+    started = time.perf_counter()
+    values = spreadsheet.worksheet(sheet_name).get_all_values()
+    return values, time.perf_counter() - started
+
+
+def _fetch_parallel(spreadsheet, worksheet_names, max_workers):
+    values, timings, errors = {}, {}, {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(worksheet_names)))) as pool:
+        futures = {name: pool.submit(_fetch_one, spreadsheet, name) for name in worksheet_names}
+        for name, future in futures.items():
+            try:
+                values[name], timings[name] = future.result()
+            except Exception as e:
+                errors[name] = e
+    return FetchResult(values, timings, "parallel", errors)
+
+
+def fetch_worksheet_values(spreadsheet, worksheet_names, max_workers=SHEET_FETCH_MAX_WORKERS):
+    """
+    Fetches the cell values of all `worksheet_names` with as few round trips as possible.
+
+    One `values_batch_get` call is tried first, so the whole load costs a single API
+    request. If that fails (for example because one of the worksheets does not exist,
+    which makes the Sheets API reject the entire batch), each worksheet is fetched in
+    its own thread instead, so the load time is that of the slowest sheet rather than
+    the sum of all of them.
+
+    Expected Data:
+        - `spreadsheet`: a gspread Spreadsheet, or any object offering the same
+          `values_batch_get(ranges)` and `worksheet(name).get_all_values()` methods
+          (e.g. a local fake used for testing).
+        - `worksheet_names`: list of worksheet titles to load.
+
+    Returns:
+        A FetchResult. Per-sheet timings are printed as well.
+    """
+    try:
+        result = _fetch_batch(spreadsheet, worksheet_names)
+    except Exception as e:
+        print(f"--- Batch read failed ({e}); fetching worksheets in parallel instead. ---")
+        result = _fetch_parallel(spreadsheet, worksheet_names, max_workers)
+
+    for name in worksheet_names:
+        if name in result.timings:
+            print(f"  -> Fetched '{name}' ({len(result.values[name])} rows) in {result.timings[name]:.2f}s [{result.mode}]")
+        elif name in result.errors:
+            print(f"  -> Failed to fetch '{name}': {result.errors[name]}")
+    return result
+
+
+def clean_headers(headers):
+    """
+    Makes a header row safe to use as DataFrame columns.
+    Duplicate names get a numeric suffix ("Notes", "Notes_1", ...) and blank headers
+    get a generic name ("Unnamed_Column_3"), so a sheet with repeated or empty header
+    cells still loads instead of failing.
+
+    Returns:
+        A list of unique column names, the same length as `headers`.
+    """
+    cleaned_headers = []
+    header_counts = {}
+    for h in headers:
+        if h: # Only include non-empty headers
+            original_h = h
+            count = header_counts.get(original_h, 0)
+            if count > 0:
+                h = f"{original_h}_{count}" # Append count for duplicates
+            cleaned_headers.append(h)
+            header_counts[original_h] = count + 1
+        else:
+            # If a header is completely empty, give it a generic name
+            unique_blank_name = f"Unnamed_Column_{len(cleaned_headers)}"
+            cleaned_headers.append(unique_blank_name)
+    return cleaned_headers
+
+
+def build_frame(values, schema):
+    """
+    Converts one worksheet's raw values into a compact, typed DataFrame using its schema.
+
+    Expected Data:
+        - `values`: list of rows as returned by the Sheets API (rows may be shorter than
+          the header row, because trailing blank cells are omitted).
+        - `schema`: the WorksheetSchema for this sheet.
+
+    Returns:
+        A pandas DataFrame. It is empty (but keeps its columns) if the sheet has a
+        header row and no data, and has no columns if the header row is missing.
+    """
+    if len(values) < schema.header_row:
+        return pd.DataFrame()
+    headers = clean_headers(values[schema.header_row - 1])
+    width = len(headers)
+    # Pad (or trim) every row to the header width.
+    data_rows = [(row + [""] * width)[:width] for row in values[schema.header_row:]]
+    df = pd.DataFrame(data_rows, columns=headers, dtype=str)
+
+    for column, dtype in schema.dtypes.items():
+        if column in df.columns:
+            df[column] = df[column].astype(dtype)
+    for column in schema.categorical:
+        if column in df.columns:
+            df[column] = df[column].astype("category")
+    return df
+
+
+def open_spreadsheet(key_file=SERVICE_ACCOUNT_KEY_FILE, title=SPREADSHEET_TITLE):
+    """
+    Authenticates with the service account key file and opens the spreadsheet by title.
+
+    Returns:
+        A gspread Spreadsheet.
+    """
+    gc = gspread.service_account(filename=key_file)
+    return gc.open(title)
+
+
+def load_worksheets(spreadsheet, schemas=WORKSHEET_SCHEMAS):
+    """
+    Fetches and parses every worksheet described by `schemas`.
+
+    Expected Data:
+        - `spreadsheet`: a gspread Spreadsheet or a fake with the same read methods
+          (see fetch_worksheet_values).
+        - `schemas`: list of WorksheetSchema.
+
+    Returns:
+        A (frames, fetch_result) tuple. `frames` maps worksheet names to DataFrames and
+        only includes sheets that have at least one data row; each frame's
+        `attrs["fetch_seconds"]` holds its fetch time. `fetch_result` is the FetchResult,
+        whose `errors` lists worksheets that could not be read.
+    """
+    fetched = fetch_worksheet_values(spreadsheet, [schema.name for schema in schemas])
+    frames = {}
+    for schema in schemas:
+        if schema.name not in fetched.values:
+            continue
+        df = build_frame(fetched.values[schema.name], schema)
+        if not df.empty:
+            df.attrs["fetch_seconds"] = fetched.timings[schema.name]
+            frames[schema.name] = df
+    return frames, fetched
@@ -0,0 +1,433 @@
+import json
+import os
+import re
+
+import numpy as np
+
+import metrics
+from response_cache import cache_key, make_etag
+from sheet_index import MATCH_MODES, filter_rows, sort_rows
+
+# --- Configuration ---
+# Rows converted and encoded at a time when a query result is streamed as NDJSON
+# ('format=ndjson'), which bounds the memory a large response needs.
+NDJSON_BLOCK_ROWS = int(os.environ.get("NDJSON_BLOCK_ROWS", 1000))
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+
+class QueryError(Exception):
+    """
+    Raised for a query that cannot be answered (bad parameters, missing columns).
+
+    Attributes:
+        status: HTTP status code to return (400 for bad input, 500 for sheet problems).
+        payload: JSON-serializable error body.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.payload = {"error": message}
+
+
+def encode_json(obj):
+    """
+    Encodes `obj` the same way Flask's default JSON provider does in production
+    (sorted keys, ASCII-escaped, compact separators, trailing newline), so cached bodies
+    are byte-for-byte what `jsonify` would have produced, whichever server sends them.
+
+    Returns:
+        The UTF-8 encoded JSON document (bytes).
+    """
+    return (json.dumps(obj, ensure_ascii=True, sort_keys=True, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def encode_ndjson(records):
+    """
+    Encodes a list of records as newline-delimited JSON, one record per line, each
+    encoded like encode_json.
+
+    Returns:
+        The UTF-8 encoded lines (bytes).
+    """
+    return "".join(json.dumps(record, ensure_ascii=True, sort_keys=True, separators=(",", ":")) + "\n"
+                   for record in records).encode("utf-8")
+
+
+def _parse_non_negative_int(args, name):
+    value = args.get(name)
+    if value is None or value == "":
+        return None
+    try:
+        number = int(value)
+    except ValueError:
+        raise QueryError(400, f"Query parameter '{name}' must be a whole number.")
+    if number < 0:
+        raise QueryError(400, f"Query parameter '{name}' must not be negative.")
+    return number
+
+
+def _parse_fields(args, df):
+    value = args.get("fields")
+    if not value:
+        return None
+    fields = [field.strip() for field in value.split(",") if field.strip()]
+    unknown = [field for field in fields if field not in df.columns]
+    if unknown:
+        raise QueryError(400, f"Unknown field(s) {unknown}. Available fields: {list(df.columns)}")
+    # Drop repeats but keep the requested order.
+    return list(dict.fromkeys(fields))
+
+
+# Values accepted by the `format` query parameter (`match` takes any of MATCH_MODES).
+OUTPUT_FORMATS = ("json", "ndjson")
+# Query parameters that are never filters.
+RESERVED_PARAMS = ("match", "format", "limit", "offset", "fields", "sort")
+
+_YEAR_NEEDLE_PATTERN = re.compile(r"\d{4}")
+
+
+def _parse_match(args):
+    value = args.get("match")
+    if not value:
+        return None
+    if value not in MATCH_MODES:
+        raise QueryError(400, f"Query parameter 'match' must be one of {list(MATCH_MODES)}.")
+    return value
+
+
+def _parse_format(args):
+    value = args.get("format") or "json"
+    if value not in OUTPUT_FORMATS:
+        raise QueryError(400, f"Query parameter 'format' must be one of {list(OUTPUT_FORMATS)}.")
+    return value
+
+
+def _parse_sort(args, plan):
+    value = args.get("sort")
+    if not value:
+        return None
+    sort = {}
+    for item in value.split(","):
+        item = item.strip()
+        descending = item.startswith("-")
+        column = item[1:].strip() if descending else item
+        if not column:
+            continue
+        if column not in plan.sort_columns:
+            raise QueryError(400, f"Cannot sort by '{column}'. Sortable columns: {plan.sort_columns}")
+        # A column repeated later in the list could not change the order any more.
+        sort.setdefault(column, descending)
+    return list(sort.items()) or None
+
+
+# Stands for "every column of the sheet" in a SheetSpec.
+ALL_COLUMNS = "*"
+# Match modes of the filters a SheetSpec generates for ALL_COLUMNS.
+DEFAULT_FILTER_MODES = ("contains", "exact", "prefix", "fuzzy")
+
+
+def column_param(column):
+    """Derives a query parameter name from a column name ('Dataset / Table Name' -> 'dataset_table_name')."""
+    return re.sub(r"[^0-9a-z]+", "_", column.lower()).strip("_")
+
+
+class FilterSpec:
+    """
+    Declares one filterable column of a sheet.
+
+    Attributes:
+        param: Query parameter holding the filter's value.
+        column: Column the filter matches against.
+        modes: Match modes the filter supports (see sheet_index.MATCH_MODES). The first
+            one is its default; a request's `match` parameter picks another one only if
+            it is listed here.
+    """
+
+    def __init__(self, param, column, modes=("contains",)):
+        self.param = param
+        self.column = column
+        self.modes = tuple(modes)
+
+
+class SheetSpec:
+    """
+    Declares how one worksheet is queried through '/sheets/<name>/query'.
+
+    Attributes:
+        name: Name of the sheet in the URL (e.g. 'census-apis').
+        sheet: Worksheet title.
+        filters: List of FilterSpec, or ALL_COLUMNS to make every column a filter
+            with DEFAULT_FILTER_MODES, named by column_param().
+        sort: Columns the results can be sorted by (ALL_COLUMNS for every column).
+        fields: Columns returned when the request has no `fields` parameter (None for
+            every column).
+        not_found: Message returned with a 404 when the filters match no rows.
+    """
+
+    def __init__(self, name, sheet, filters=ALL_COLUMNS, sort=ALL_COLUMNS, fields=None, not_found=None):
+        self.name = name
+        self.sheet = sheet
+        self.filters = filters
+        self.sort = sort
+        self.fields = fields
+        self.not_found = not_found or f"No matching rows found in '{sheet}' for the given criteria."
+
+
+class SheetPlan:
+    """
+    A SheetSpec compiled against the columns of one loaded worksheet (see compile_sheet).
+
+    Attributes:
+        spec: The SheetSpec.
+        filters: Dictionary of query parameter -> FilterSpec, for columns present in
+            the sheet.
+        sort_columns: Sortable columns present in the sheet.
+        fields: Default columns to return, or None for all.
+    """
+
+    def __init__(self, spec, filters, sort_columns, fields):
+        self.spec = spec
+        self.filters = filters
+        self.sort_columns = sort_columns
+        self.fields = fields
+
+    def index_modes(self):
+        """Returns {column -> set of ColumnIndex modes} needed to answer this sheet's queries."""
+        modes = {}
+        for filter_spec in self.filters.values():
+            modes.setdefault(filter_spec.column, set()).update(filter_spec.modes)
+        for column in self.sort_columns:
+            modes.setdefault(column, set()).add("sort")
+        return modes
+
+    def describe(self):
+        """Returns the sheet's query options as a JSON-serializable dictionary (for '/sheets')."""
+        return {
+            "name": self.spec.name,
+            "sheet": self.spec.sheet,
+            "filters": [{"param": f.param, "column": f.column, "modes": list(f.modes)}
+                        for f in self.filters.values()],
+            "sort": self.sort_columns,
+            "fields": self.fields,
+        }
+
+
+def compile_sheet(spec, df):
+    """
+    Resolves a SheetSpec against a loaded worksheet: ALL_COLUMNS is expanded to the
+    sheet's columns, and declared columns that are missing from it are left out with a
+    warning, so one renamed column in the spreadsheet does not take the sheet down.
+
+    Generated parameter names that collide with RESERVED_PARAMS or with each other get
+    a trailing underscore ('sort_').
+
+    Returns:
+        A SheetPlan.
+    """
+    if spec.filters == ALL_COLUMNS:
+        filter_specs = [FilterSpec(column_param(str(column)), column, DEFAULT_FILTER_MODES) for column in df.columns]
+    else:
+        filter_specs = spec.filters
+    filters = {}
+    for filter_spec in filter_specs:
+        if filter_spec.column not in df.columns:
+            print(f"  -> WARNING: filter column '{filter_spec.column}' is missing from sheet '{spec.sheet}'.")
+            continue
+        param = filter_spec.param or "column"
+        while param in RESERVED_PARAMS or param in filters:
+            param += "_"
+        filters[param] = FilterSpec(param, filter_spec.column, filter_spec.modes)
+
+    sort_columns = list(df.columns) if spec.sort == ALL_COLUMNS else [c for c in spec.sort if c in df.columns]
+    fields = [c for c in spec.fields if c in df.columns] if spec.fields else None
+    return SheetPlan(spec, filters, sort_columns, fields or None)
+
+
+class SheetQuery:
+    """
+    One validated query against one worksheet of a snapshot, as declared by its SheetPlan.
+
+    Each filter is resolved through the snapshot's ColumnIndex for its column, in the
+    filter's match mode: a case-insensitive substring ('contains'), whole-value
+    ('exact'), prefix or year match, or a fuzzy match, in which case the rows come back
+    ranked, best match first. `sort` reorders the matches (stably, so ties keep the
+    fuzzy ranking or sheet order). Paging (`limit`/`offset`) slices the matching row
+    positions and `fields` picks columns before anything is converted to dictionaries,
+    so only the rows and columns being returned are ever serialized. With
+    `output_format="ndjson"` the result is not cached but streamed (see stream()).
+
+    Attributes:
+        key: Normalized cache key for this query (filters with their match modes,
+            sort, paging, fields and output format). Equal queries made through
+            different endpoints share it.
+        etag: Strong ETag for the query on this snapshot; computing it does no work
+            beyond hashing, so a 304 can be answered before the query runs.
+    """
+
+    def __init__(self, snapshot, plan, filters=(), limit=None, offset=None, fields=None, sort=None,
+                 output_format="json"):
+        sheet_name = plan.spec.sheet
+        if sheet_name not in snapshot.frames:
+            raise QueryError(500, f"Sheet '{sheet_name}' not found in cache.")
+        self.snapshot = snapshot
+        self.plan = plan
+        self.sheet_name = sheet_name
+        self.df = snapshot.frames[sheet_name]
+        self.sheet_indexes = snapshot.indexes.get(sheet_name, {})
+        # (column, match mode, needle) triples.
+        self.filters = [(column, mode, needle) for column, mode, needle in filters if needle]
+        for column, _, _ in self.filters:
+            if column not in self.sheet_indexes:
+                raise QueryError(500, f"Column '{column}' not found in sheet '{sheet_name}'.")
+        self.limit = limit
+        self.offset = offset or 0
+        self.fields = fields or plan.fields
+        self.sort = sort
+        self.not_found_message = plan.spec.not_found
+        self.output_format = output_format
+
+        options = (("sort", tuple(sort or ())), ("limit", limit), ("offset", self.offset),
+                   ("fields", tuple(self.fields or ())), ("format", output_format))
+        self.key = cache_key(sheet_name, [((column, mode), needle) for column, mode, needle in self.filters]) + options
+        self.etag = make_etag(snapshot.fingerprint, self.key)
+
+    @classmethod
+    def from_args(cls, snapshot, plan, args):
+        """
+        Builds a query from request arguments (any mapping with `.get`, such as Flask's
+        request.args): one value per filter parameter of the plan, plus `match`,
+        `sort`, `format`, `limit`, `offset` and a comma-separated `fields` list.
+
+        Each filter uses the mode named by `match` if it supports it, and its default
+        mode otherwise. A 'year' filter given anything but a four-digit year (e.g. '201'
+        for the 2010s) falls back to a substring match if it supports 'contains'.
+
+        Raises:
+            QueryError: For invalid paging values, an unknown match mode or format,
+                a bad year, unknown fields or sort columns, or a missing sheet.
+        """
+        if plan.spec.sheet not in snapshot.frames:
+            raise QueryError(500, f"Sheet '{plan.spec.sheet}' not found in cache.")
+        match = _parse_match(args)
+        filters = []
+        for param, filter_spec in plan.filters.items():
+            needle = args.get(param)
+            if not needle:
+                continue
+            mode = match if match in filter_spec.modes else filter_spec.modes[0]
+            if mode == "year" and not _YEAR_NEEDLE_PATTERN.fullmatch(needle):
+                if "contains" not in filter_spec.modes:
+                    raise QueryError(400, f"Query parameter '{param}' must be a four-digit year.")
+                mode = "contains"
+            filters.append((filter_spec.column, mode, needle))
+        return cls(snapshot, plan, filters,
+                   limit=_parse_non_negative_int(args, "limit"),
+                   offset=_parse_non_negative_int(args, "offset"),
+                   fields=_parse_fields(args, snapshot.frames[plan.spec.sheet]),
+                   sort=_parse_sort(args, plan),
+                   output_format=_parse_format(args))
+
+    def row_positions(self):
+        """
+        Returns the positions of all rows matching the filters (before paging), in the
+        order they are returned, or None if no filter or sort was given (meaning
+        "every row, in sheet order").
+        """
+        rows = filter_rows(self.sheet_indexes, self.filters)
+        if self.sort:
+            if rows is None:
+                rows = np.arange(len(self.df))
+            rows = sort_rows(self.sheet_indexes, rows, self.sort)
+        return rows
+
+    def _select(self):
+        # Returns (positions, total): the rows of the requested page (a slice when
+        # neither filter nor sort was given) and the number of matches before paging.
+        # `positions` is None when the filters matched nothing.
+        rows = self.row_positions()
+        total = len(self.df) if rows is None else len(rows)
+        if self.filters and total == 0:
+            return None, 0
+        stop = None if self.limit is None else self.offset + self.limit
+        if rows is None:
+            return slice(self.offset, stop), total
+        return rows[self.offset:stop], total
+
+    def _frame(self, positions):
+        page = self.df.iloc[positions]
+        return page[self.fields] if self.fields else page
+
+    def _not_found_body(self):
+        return encode_json({"message": self.not_found_message})
+
+    def _build(self):
+        # Each phase is timed separately (see metrics.QUERY_PHASE_SECONDS), so the
+        # '/metrics' page shows whether slow queries spend their time filtering,
+        # materializing rows or encoding JSON.
+        with metrics.Timer(metrics.QUERY_PHASE_SECONDS.labels(self.sheet_name, "filter")):
+            positions, total = self._select()
+            if positions is None:
+                return 404, self._not_found_body(), 0
+            page = self._frame(positions)
+        with metrics.Timer(metrics.QUERY_PHASE_SECONDS.labels(self.sheet_name, "to_dict")):
+            records = page.to_dict(orient='records')
+        with metrics.Timer(metrics.QUERY_PHASE_SECONDS.labels(self.sheet_name, "encode")):
+            body = encode_json(records)
+        return 200, body, total
+
+    def execute(self):
+        """
+        Runs the query, or returns its memoized result from the snapshot's ResponseCache.
+
+        Returns:
+            A (status, body, total) tuple: the HTTP status (200, or 404 with the sheet's
+            not-found message when filters matched nothing), the encoded JSON body,
+            and the number of matching rows before paging.
+        """
+        return self.snapshot.responses.get_or_build(self.key, self._build)
+
+    def stream(self):
+        """
+        Runs the query for streaming: only the filtering happens now, and the page of
+        rows is converted and encoded as NDJSON NDJSON_BLOCK_ROWS rows at a time, as the
+        returned iterator is consumed. Streamed results are never cached.
+
+        Returns:
+            A (status, chunks, total) tuple like execute(), where `chunks` is an iterator
+            of bytes. For a 404 it yields the JSON not-found message.
+        """
+        positions, total = self.page()
+        if positions is None:
+            return 404, iter([self._not_found_body()]), 0
+        return 200, self._ndjson_chunks(positions), total
+
+    def page(self):
+        """
+        Runs only the filtering, sorting and paging, for callers that materialize the
+        rows themselves (streaming, '/batch'). Never cached.
+
+        Returns:
+            A (positions, total) pair: a numpy array of the row positions of the
+            requested page, in order, and the number of matches before paging.
+            `positions` is None when the filters matched nothing (a 404).
+        """
+        with metrics.Timer(metrics.QUERY_PHASE_SECONDS.labels(self.sheet_name, "filter")):
+            positions, total = self._select()
+        if isinstance(positions, slice):
+            positions = np.arange(len(self.df))[positions]
+        return positions, total
+
+    def _ndjson_chunks(self, positions):
+        for start in range(0, len(positions), NDJSON_BLOCK_ROWS):
+            records = self._frame(positions[start:start + NDJSON_BLOCK_ROWS]).to_dict(orient='records')
+            yield encode_ndjson(records)
+
+    def cached_result(self):
+        """
+        Returns the memoized (status, body, total) result of this query, or None if it
+        has not been built yet. Counts the lookup as a response cache hit or miss.
+        """
+        result = self.snapshot.responses.peek(self.key)
+        metrics.RESPONSE_CACHE_LOOKUPS.labels(self.sheet_name, "miss" if result is None else "hit").inc()
+        return result
@@ -0,0 +1,347 @@
+import os
+import re
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from response_cache import make_etag
+from sheet_query import QueryError, encode_json
+
+# --- Configuration ---
+# Number of results '/search' returns when no `limit` is given, and the most it returns.
+SEARCH_DEFAULT_LIMIT = int(os.environ.get("SEARCH_DEFAULT_LIMIT", 10))
+SEARCH_MAX_LIMIT = int(os.environ.get("SEARCH_MAX_LIMIT", 100))
+# BM25 parameters: term frequency saturation (k1) and document length normalization (b).
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Rows are tokenized in blocks of this many, which bounds the temporary memory the
+# index build needs for very large sheets.
+SEARCH_BUILD_BLOCK_ROWS = 65536
+# A search stops reading the query terms' postings best-first and adds all of them up
+# instead once it would read more than 1 / SEARCH_DENSE_FRACTION of them.
+SEARCH_DENSE_FRACTION = 32
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """Splits text into lowercase word tokens ('acs/acs5' -> ['acs', 'acs5'])."""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+def _column_tokens(values, vocabulary):
+    """
+    Tokenizes each distinct value of a column once.
+
+    Returns:
+        (codes, offsets, token_ids, token_counts, value_lengths): `codes[row]` is the row's
+        distinct value id (-1 for missing), the tokens of value i are
+        token_ids[offsets[i]:offsets[i + 1]] (each with its count in the value), and
+        value_lengths[i] is the value's total number of tokens.
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    offsets, token_ids, token_counts, value_lengths = [0], [], [], []
+    for value in uniques:
+        counts = Counter(tokenize(str(value)))
+        for token, count in counts.items():
+            token_ids.append(vocabulary.setdefault(token, len(vocabulary)))
+            token_counts.append(count)
+        offsets.append(len(token_ids))
+        value_lengths.append(sum(counts.values()))
+    return (np.asarray(codes, dtype=np.int64), np.asarray(offsets, dtype=np.int64),
+            np.asarray(token_ids, dtype=np.int64), np.asarray(token_counts, dtype=np.float32),
+            np.asarray(value_lengths, dtype=np.float32))
+
+
+def _expand(codes, offsets):
+    # For rows whose value ids are `codes`, returns (row, position in the value's token
+    # list) pairs covering every token of every row, without a Python loop over rows.
+    valid = np.flatnonzero(codes >= 0)
+    per_row = offsets[codes[valid] + 1] - offsets[codes[valid]]
+    total = int(per_row.sum())
+    rows = np.repeat(valid, per_row)
+    starts = np.repeat(offsets[codes[valid]] - (np.cumsum(per_row) - per_row), per_row)
+    return rows, starts + np.arange(total)
+
+
+class SearchIndex:
+    """
+    A BM25 inverted index over every cell of every worksheet of a snapshot.
+
+    Each row of each sheet is one document, made of the words of all its cells. The
+    postings of a term hold the documents containing it with their precomputed BM25
+    weight, so answering a query is only a matter of reading and adding up weights
+    (see search()); no cell is tokenized or scanned at query time.
+
+    Attributes:
+        sheet_names: The indexed worksheets, in document order.
+        doc_count: Total number of documents (rows of all sheets).
+    """
+
+    def __init__(self, frames, k1=BM25_K1, b=BM25_B, block_rows=SEARCH_BUILD_BLOCK_ROWS):
+        vocabulary = {}
+        self.sheet_names = list(frames)
+        self.sheet_starts = np.zeros(len(self.sheet_names) + 1, dtype=np.int64)
+        for i, sheet_name in enumerate(self.sheet_names):
+            self.sheet_starts[i + 1] = self.sheet_starts[i] + len(frames[sheet_name])
+        self.doc_count = int(self.sheet_starts[-1])
+
+        # (term, document, term frequency) triples, merged per block of rows.
+        term_parts, doc_parts, tf_parts = [], [], []
+        doc_lengths = np.zeros(self.doc_count, dtype=np.float32)
+        for i, sheet_name in enumerate(self.sheet_names):
+            df = frames[sheet_name]
+            base = int(self.sheet_starts[i])
+            columns = [_column_tokens(df[column], vocabulary) for column in df.columns]
+            for start in range(0, len(df), block_rows):
+                stop = min(start + block_rows, len(df))
+                keys, counts = [], []
+                for codes, offsets, token_ids, token_counts, value_lengths in columns:
+                    block_codes = codes[start:stop]
+                    present = block_codes >= 0
+                    doc_lengths[base + start:base + stop][present] += value_lengths[block_codes[present]]
+                    rows, positions = _expand(block_codes, offsets)
+                    keys.append(token_ids[positions] * block_rows + rows)
+                    counts.append(token_counts[positions])
+                if not keys:
+                    continue
+                # A word can occur in several cells of a row: sum its counts per row.
+                unique_keys, inverse = np.unique(np.concatenate(keys), return_inverse=True)
+                tf = np.bincount(inverse, weights=np.concatenate(counts)).astype(np.float32)
+                term_parts.append((unique_keys // block_rows).astype(np.int32))
+                doc_parts.append((unique_keys % block_rows + base + start).astype(np.int32))
+                tf_parts.append(tf)
+
+        self.vocabulary = vocabulary
+        terms = np.concatenate(term_parts) if term_parts else np.empty(0, dtype=np.int32)
+        docs = np.concatenate(doc_parts) if doc_parts else np.empty(0, dtype=np.int32)
+        tf = np.concatenate(tf_parts) if tf_parts else np.empty(0, dtype=np.float32)
+
+        # BM25 weight of each posting: idf(term) * saturated, length-normalized tf.
+        document_frequency = np.bincount(terms, minlength=len(vocabulary))
+        idf = np.log1p((self.doc_count - document_frequency + 0.5) / (document_frequency + 0.5))
+        average_length = float(doc_lengths.mean()) if self.doc_count else 0.0
+        norm = k1 * (1 - b + b * doc_lengths / average_length) if average_length else np.full(self.doc_count, k1)
+        weights = (idf[terms] * tf * (k1 + 1) / (tf + norm[docs])).astype(np.float32)
+
+        # Postings grouped by term, documents in ascending order within a term (for
+        # looking up a document's weight), plus each term's postings ranked by weight
+        # (for reading its best documents first). Equal weights keep document order.
+        order = np.argsort(terms, kind="stable")
+        terms = terms[order]
+        self._docs = docs[order]
+        self._weights = weights[order]
+        self._offsets = np.searchsorted(terms, np.arange(len(vocabulary) + 1))
+        ranked = np.lexsort((-self._weights, terms))
+        self._ranked = (ranked - self._offsets[terms]).astype(np.int32)
+
+    def _postings(self, token):
+        term = self.vocabulary.get(token)
+        if term is None:
+            return None
+        start, stop = self._offsets[term], self._offsets[term + 1]
+        return self._docs[start:stop], self._weights[start:stop], self._ranked[start:stop]
+
+    @staticmethod
+    def _score(postings, candidates):
+        # Exact BM25 scores of `candidates` (sorted document ids) for the query terms.
+        scores = np.zeros(len(candidates), dtype=np.float32)
+        for docs, weights, _ in postings:
+            positions = np.minimum(np.searchsorted(docs, candidates), len(docs) - 1)
+            scores += np.where(docs[positions] == candidates, weights[positions], 0)
+        return scores
+
+    def _score_all(self, postings, allowed):
+        # Adds up every posting of the query terms into one score per document. Linear in
+        # the number of postings, which beats reading ranked lists deeply.
+        totals = np.zeros(self.doc_count, dtype=np.float32)
+        for docs, weights, _ in postings:
+            totals[docs] += weights # A term lists each document once, so this is exact.
+        if allowed is not None:
+            for i, keep in enumerate(allowed):
+                if not keep:
+                    totals[self.sheet_starts[i]:self.sheet_starts[i + 1]] = 0
+        seen = np.flatnonzero(totals)
+        return seen, totals[seen]
+
+    def search(self, tokens, limit, sheets=None):
+        """
+        Finds the `limit` best-scoring documents for the query terms.
+
+        Each term's postings are read best-weight first, a few at a time, and the
+        documents seen so far are scored exactly. A document not seen yet can score at
+        most the sum of the next weight in every term's list, so as soon as the
+        `limit`-th best score reaches that bound the result is final (the threshold
+        algorithm). Most queries stop after a few hundred postings, however many rows
+        contain the query's words. Otherwise, the current limit-th score rules out the
+        rows that only contain common, low-weight terms, and just the postings of the
+        rarer terms are scored (MaxScore). If neither applies, all postings are added
+        up in one pass.
+
+        Expected Data:
+            - `tokens`: Query terms, as returned by tokenize().
+            - `limit`: Number of results to return.
+            - `sheets` (optional): Only return rows of these worksheets.
+
+        Returns:
+            A list of (sheet name, row position, score) tuples, best first (equal
+            scores in sheet and row order).
+        """
+        postings = [p for p in (self._postings(token) for token in dict.fromkeys(tokens)) if p is not None]
+        if not postings:
+            return []
+        allowed = None
+        if sheets is not None:
+            allowed = np.array([name in sheets for name in self.sheet_names])
+
+        total_postings = sum(len(docs) for docs, _, _ in postings)
+        longest = max(len(docs) for docs, _, _ in postings)
+        depth = limit
+        while True:
+            if depth * len(postings) * SEARCH_DENSE_FRACTION >= total_postings or depth >= longest:
+                seen, scores = self._score_all(postings, allowed)
+                break
+            seen = np.unique(np.concatenate([docs[ranked[:depth]] for docs, _, ranked in postings]))
+            if allowed is not None:
+                seen = seen[allowed[np.searchsorted(self.sheet_starts, seen, side="right") - 1]]
+            scores = self._score(postings, seen)
+            if len(seen) >= limit:
+                threshold = float(np.partition(scores, len(seen) - limit)[len(seen) - limit])
+                bound = sum(float(weights[ranked[depth]]) for _, weights, ranked in postings if depth < len(ranked))
+                if threshold >= bound:
+                    break
+                # Rows containing only terms whose best weights add up to at most the
+                # current limit-th score cannot rank higher, so only the postings of the
+                # other ("essential") terms need scoring. Worth it when those are short.
+                essential, best_sum = [], 0.0
+                for docs, weights, ranked in sorted(postings, key=lambda p: p[1][p[2][0]]):
+                    best_sum += float(weights[ranked[0]])
+                    if best_sum > threshold:
+                        essential.append(docs)
+                if sum(len(docs) for docs in essential) * len(postings) * 4 < total_postings:
+                    candidates = np.unique(np.concatenate(essential + [seen]))
+                    if allowed is not None:
+                        candidates = candidates[allowed[np.searchsorted(self.sheet_starts, candidates, side="right") - 1]]
+                    seen, scores = candidates, self._score(postings, candidates)
+                    break
+            depth *= 4
+
+        if len(seen) > limit:
+            # Keep the documents scoring at least the limit-th best score (and all ties).
+            threshold = np.partition(scores, len(seen) - limit)[len(seen) - limit]
+            keep = scores >= threshold
+            seen, scores = seen[keep], scores[keep]
+        best = np.lexsort((seen, -scores))[:limit]
+        sheet_ids = np.searchsorted(self.sheet_starts, seen[best], side="right") - 1
+        return [(self.sheet_names[s], int(seen[i] - self.sheet_starts[s]), float(scores[i]))
+                for i, s in zip(best, sheet_ids)]
+
+
+def build_search_index(frames):
+    """
+    Builds the SearchIndex of a snapshot's worksheets (called from the cache's prepare hook).
+
+    Returns:
+        A SearchIndex.
+    """
+    return SearchIndex(frames)
+
+
+class SearchQuery:
+    """
+    One validated '/search' request against a snapshot, answered from the snapshot's
+    SearchIndex and memoized in its ResponseCache like a SheetQuery.
+
+    Attributes:
+        key: Normalized cache key (query terms, limit and sheets).
+        etag: Strong ETag for the query on this snapshot.
+    """
+
+    # Search results are small (at most SEARCH_MAX_LIMIT rows), so they are never streamed.
+    output_format = "json"
+
+    def __init__(self, snapshot, text, limit=SEARCH_DEFAULT_LIMIT, sheets=None):
+        self.snapshot = snapshot
+        self.tokens = tokenize(text or "")
+        if not self.tokens:
+            raise QueryError(400, "Query parameter 'q' must contain at least one word.")
+        if sheets:
+            unknown = [name for name in sheets if name not in snapshot.frames]
+            if unknown:
+                raise QueryError(400, f"Unknown sheet(s) {unknown}. Available sheets: {list(snapshot.frames)}")
+        self.limit = limit
+        self.sheets = tuple(sorted(set(sheets))) if sheets else None
+        self.key = ("search", tuple(self.tokens), limit, self.sheets)
+        self.etag = make_etag(snapshot.fingerprint, self.key)
+
+    @classmethod
+    def from_args(cls, snapshot, args):
+        """
+        Builds a search from request arguments: the text `q`, an optional `limit`
+        (default SEARCH_DEFAULT_LIMIT, at most SEARCH_MAX_LIMIT) and an optional
+        comma-separated list of `sheets` to search in.
+
+        Raises:
+            QueryError: For a missing query, a bad limit or unknown sheet names.
+        """
+        limit = args.get("limit")
+        if limit is None or limit == "":
+            limit = SEARCH_DEFAULT_LIMIT
+        else:
+            try:
+                limit = int(limit)
+            except ValueError:
+                raise QueryError(400, "Query parameter 'limit' must be a whole number.")
+            if limit < 1 or limit > SEARCH_MAX_LIMIT:
+                raise QueryError(400, f"Query parameter 'limit' must be between 1 and {SEARCH_MAX_LIMIT}.")
+        sheets = [name.strip() for name in (args.get("sheets") or "").split(",") if name.strip()]
+        return cls(snapshot, args.get("q"), limit, sheets or None)
+
+    def hits(self):
+        """
+        Runs the search without materializing any row (see SearchIndex.search).
+
+        Returns:
+            A list of (sheet name, row position, score) tuples, best first.
+        """
+        with metrics.Timer(metrics.QUERY_PHASE_SECONDS.labels("search", "filter")):
+            return self.snapshot.search.search(self.tokens, self.limit, self.sheets)
+
+    def _build(self):
+        hits = self.hits()
+
+        with metrics.Timer(metrics.QUERY_PHASE_SECONDS.labels("search", "to_dict")):
+            # Materialize the hit rows sheet by sheet, then put them back in score order.
+            records = {}
+            by_sheet = {}
+            for sheet_name, row, _ in hits:
+                by_sheet.setdefault(sheet_name, []).append(row)
+            for sheet_name, rows in by_sheet.items():
+                for row, record in zip(rows, self.snapshot.frames[sheet_name].iloc[rows].to_dict(orient='records')):
+                    records[(sheet_name, row)] = record
+            results = [{"sheet": sheet_name, "row": row, "score": round(score, 4),
+                        "record": records[(sheet_name, row)]}
+                       for sheet_name, row, score in hits]
+
+        with metrics.Timer(metrics.QUERY_PHASE_SECONDS.labels("search", "encode")):
+            body = encode_json(results)
+        return 200, body, None
+
+    def execute(self):
+        """
+        Runs the search, or returns its memoized result.
+
+        Returns:
+            A (status, body, total) tuple like SheetQuery.execute: status 200 and the
+            encoded JSON array of results. `total` is None, since a search stops as soon
+            as its top results are certain and does not count every match.
+        """
+        return self.snapshot.responses.get_or_build(self.key, self._build)
+
+    def cached_result(self):
+        """Returns the memoized result, or None, counting a response cache hit or miss."""
+        result = self.snapshot.responses.peek(self.key)
+        metrics.RESPONSE_CACHE_LOOKUPS.labels("search", "miss" if result is None else "hit").inc()
+        return result
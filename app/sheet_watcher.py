@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from sheet_loader import WORKSHEET_SCHEMAS, build_frame, fetch_worksheet_values
+
+# --- Configuration ---
+# How often (in seconds) the watcher checks the spreadsheet for changes in the
+# background. A check that finds nothing new costs a single Drive metadata request.
+# 0 disables polling; the cache then only checks when a request finds it stale.
+SHEET_WATCH_INTERVAL_SECONDS = float(os.environ.get("SHEET_WATCH_INTERVAL_SECONDS", 60))
+
+
+def worksheet_checksum(values):
+    """
+    Hashes one worksheet's raw cell values (a list of rows of strings), so a worksheet
+    whose contents did not change can be recognized without parsing it again.
+
+    Returns:
+        A hex digest string.
+    """
+    return hashlib.sha1(json.dumps(values, ensure_ascii=False, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+class SheetWatcher:
+    """
+    A SheetCache loader that only re-reads the spreadsheet when it changed, and only
+    rebuilds the worksheets whose contents changed.
+
+    Each load first asks Drive for the spreadsheet's `modifiedTime` (one metadata
+    request). If it is the same as at the last load, the load returns None and the
+    cache keeps its current snapshot. Otherwise every worksheet is fetched in one batch
+    read, each one's raw values are checksummed, and only worksheets whose checksum
+    differs from the last load are parsed into new DataFrames. Unchanged worksheets
+    keep their existing DataFrame objects, so the cache's `prepare` hook can reuse
+    whatever it derived from them.
+
+    Only the parsing (and indexing) is incremental, not the fetch: `modifiedTime` is
+    kept per spreadsheet and the Sheets API offers no revision per worksheet, so a
+    changed revision always costs a batch read of every worksheet.
+
+    Expected Data:
+        - `open_spreadsheet`: a callable returning a gspread Spreadsheet, or any object
+          offering `get_lastUpdateTime()` plus the read methods used by
+          sheet_loader.fetch_worksheet_values (e.g. a local fake used for testing).
+          It is called once and the spreadsheet is reused until a load fails.
+        - `schemas` (optional): list of WorksheetSchema to load.
+
+    Attributes:
+        revision: The `modifiedTime` seen at the last load, or None before the first.
+        changed: Names of the worksheets rebuilt (or dropped) by the last load.
+    """
+
+    def __init__(self, open_spreadsheet, schemas=WORKSHEET_SCHEMAS):
+        self._open_spreadsheet = open_spreadsheet
+        self._schemas = schemas
+        self._spreadsheet = None
+        self._frames = None
+        self._checksums = {}
+        self.revision = None
+        self.changed = []
+
+    def load(self, current_frames=None):
+        """
+        Loads whatever changed since the last call.
+
+        Expected Data:
+            - `current_frames` (optional): the frames the cache is serving. If they are
+              not the ones this watcher last returned (e.g. the cache failed to publish
+              them, or booted from a local snapshot), the watcher's frames are returned
+              again instead of None, so the cache never keeps serving older data.
+
+        Returns:
+            A dictionary of worksheet name -> DataFrame if anything changed (or on the
+            first call), otherwise None.
+
+        Raises:
+            Exception: Whatever opening or reading the spreadsheet raised, or
+            RuntimeError if some worksheets could not be read. The next load then
+            starts over with a freshly opened spreadsheet.
+        """
+        try:
+            return self._load(current_frames)
+        except Exception:
+            self._spreadsheet = None
+            raise
+
+    def _load(self, current_frames):
+        if self._spreadsheet is None:
+            self._spreadsheet = self._open_spreadsheet()
+        spreadsheet = self._spreadsheet
+
+        # Read the revision before the values: an edit that lands in between then shows
+        # up as a newer revision on the next check instead of being missed.
+        revision = spreadsheet.get_lastUpdateTime()
+        in_use = current_frames is None or current_frames is self._frames
+        if self._frames is not None and revision == self.revision:
+            self.changed = []
+            if not in_use:
+                print(f"--- Spreadsheet unchanged since {revision}; republishing its data. ---")
+                return self._frames
+            print(f"--- Spreadsheet unchanged since {revision}; keeping the current data. ---")
+            return None
+
+        fetched = fetch_worksheet_values(spreadsheet, [schema.name for schema in self._schemas])
+        if fetched.errors:
+            raise RuntimeError(f"Failed to load worksheets: {fetched.errors}")
+
+        previous = self._frames or {}
+        frames, checksums, changed = {}, {}, []
+        for schema in self._schemas:
+            if schema.name not in fetched.values:
+                continue
+            checksum = worksheet_checksum(fetched.values[schema.name])
+            checksums[schema.name] = checksum
+            if self._checksums.get(schema.name) == checksum:
+                # Unchanged; worksheets without data rows were left out and stay out.
+                if schema.name in previous:
+                    frames[schema.name] = previous[schema.name]
+                continue
+            changed.append(schema.name)
+            df = build_frame(fetched.values[schema.name], schema)
+            if not df.empty:
+                df.attrs["fetch_seconds"] = fetched.timings[schema.name]
+                frames[schema.name] = df
+        changed += [name for name in previous if name not in checksums]
+
+        first_load = self._frames is None
+        self._frames, self._checksums, self.revision, self.changed = frames, checksums, revision, changed
+        if not changed and not first_load and in_use:
+            # Edits that do not touch cell values (formatting, other worksheets).
+            print(f"--- Spreadsheet modified at {revision} but no loaded worksheet changed. ---")
+            return None
+        print(f"--- Spreadsheet revision {revision}: reloaded {len(changed)} worksheet(s) {changed}. ---")
+        return frames
+
+    def adopt(self, frames):
+        """
+        Replaces the DataFrames kept for unchanged worksheets with equivalent ones, such
+        as the memory-mapped copies read back from a shared snapshot, so the watcher
+        does not hold a private copy of the data.
+
+        Expected Data:
+            - `frames`: Dictionary of worksheet name -> DataFrame with the same contents
+              as the frames the last load returned.
+        """
+        if self._frames is not None:
+            self._frames = {name: frames.get(name, df) for name, df in self._frames.items()}
+
+
+def start_polling(cache, interval_seconds=SHEET_WATCH_INTERVAL_SECONDS):
+    """
+    Starts a daemon thread that asks `cache` (a SheetCache) to refresh every
+    `interval_seconds`, so changes are picked up even while no requests arrive. The
+    refreshes go through the cache as usual: they never overlap, and they honour its
+    retry backoff after failures.
+
+    Returns:
+        The started thread, or None if polling is disabled (interval of 0 or less).
+    """
+    if interval_seconds <= 0:
+        return None
+
+    def poll():
+        while True:
+            time.sleep(interval_seconds)
+            cache.refresh_in_background()
+
+    thread = threading.Thread(target=poll, name="sheet-watcher", daemon=True)
+    thread.start()
+    return thread
@@ -1,16 +1,14 @@
 import gspread
-import pandas as pd
+
+from sheet_loader import (
+    SERVICE_ACCOUNT_KEY_FILE, SPREADSHEET_TITLE, WORKSHEET_NAMES, WORKSHEET_SCHEMAS,
+    load_worksheets, open_spreadsheet,
+)
 
 # --- Configuration ---
-SERVICE_ACCOUNT_KEY_FILE = 'vista-api-backend-6578a1a1c769.json'
-SPREADSHEET_TITLE = 'Open VA Data APIs'
-WORKSHEET_NAMES = [
-    "API Name and Path",
-    "VA Data Census Bureau APIs",
-    "Census Bureau APIs - Full List",
-    "VISTA Custom GPT Actions",
-    "Utilities"
-]
+# The key file, spreadsheet title and per-worksheet schemas (header rows, categorical
+# columns) live in sheet_loader.py, which app.py uses as well, so the standalone reader
+# and the API always see the same columns.
 
 def get_data_from_sheet():
     """
@@ -18,71 +16,20 @@ def get_data_from_sheet():
     from specified worksheets, returning them as a dictionary of DataFrames.
     """
     try:
-        gc = gspread.service_account(filename=SERVICE_ACCOUNT_KEY_FILE)
-        print(f"Type of gspread client object after authentication: {type(gc)}")
-        spreadsheet = gc.open(SPREADSHEET_TITLE)
-
-        all_data = {}
-        for sheet_name in WORKSHEET_NAMES:
-            try:
-                worksheet = spreadsheet.worksheet(sheet_name)
-
-                # --- NEW LOGIC: Manually handle header rows for specific sheets ---
-                if sheet_name in ["API Name and Path", "Census Bureau APIs - Full List"]:
-                    # Get all values from the sheet
-                    list_of_lists = worksheet.get_all_values()
-                    
-                    if not list_of_lists:
-                        print(f"Worksheet '{sheet_name}' is empty.")
-                        continue # Skip to next sheet
+        spreadsheet = open_spreadsheet(SERVICE_ACCOUNT_KEY_FILE, SPREADSHEET_TITLE)
 
-                    # Assuming headers are on row 2 (index 1 in a 0-indexed list)
-                    headers = list_of_lists[1]
-                    # Data starts from row 3 (index 2)
-                    data_rows = list_of_lists[2:]
+        # Fetch all worksheets in one batch read and parse them with their schemas.
+        all_data, fetched = load_worksheets(spreadsheet, WORKSHEET_SCHEMAS)
 
-                    # Clean headers: remove empty strings if any appear due to sheet structure
-                    # And handle potential duplicate names by making them unique
-                    cleaned_headers = []
-                    header_counts = {}
-                    for h in headers:
-                        if h: # Only include non-empty headers
-                            original_h = h
-                            count = header_counts.get(original_h, 0)
-                            if count > 0:
-                                h = f"{original_h}_{count}" # Append count for duplicates
-                            cleaned_headers.append(h)
-                            header_counts[original_h] = count + 1
-                        else:
-                            # If a header is completely empty, give it a generic name
-                            # This handles the original '' duplicates error
-                            unique_blank_name = f"Unnamed_Column_{len(cleaned_headers)}"
-                            cleaned_headers.append(unique_blank_name)
-                    
-                    if data_rows:
-                        df = pd.DataFrame(data_rows, columns=cleaned_headers)
-                    else:
-                        df = pd.DataFrame(columns=cleaned_headers) # Create empty DF with headers
-                    
-                else:
-                    # For all other sheets, use the default get_all_records()
-                    records = worksheet.get_all_records()
-                    if records:
-                        df = pd.DataFrame(records)
-                    else:
-                        df = pd.DataFrame() # Create empty DataFrame if no records/headers found
-
-                if not df.empty: # Check if DataFrame was successfully created
-                    all_data[sheet_name] = df
-                    print(f"Successfully loaded data from '{sheet_name}'. Rows: {len(df)}")
-                else:
-                    print(f"Worksheet '{sheet_name}' is empty or has no recognizable headers/data.")
-
-            except gspread.exceptions.WorksheetNotFound:
+        for sheet_name in WORKSHEET_NAMES:
+            if sheet_name in all_data:
+                print(f"Successfully loaded data from '{sheet_name}'. Rows: {len(all_data[sheet_name])}")
+            elif isinstance(fetched.errors.get(sheet_name), gspread.exceptions.WorksheetNotFound):
                 print(f"Error: Worksheet '{sheet_name}' not found in the spreadsheet. Please check the name for typos and case-sensitivity.")
-            except Exception as e:
-                print(f"An error occurred while reading worksheet '{sheet_name}': {e}")
-                print(f"Error details for {sheet_name}: {e}") # More detailed error
+            elif sheet_name in fetched.errors:
+                print(f"An error occurred while reading worksheet '{sheet_name}': {fetched.errors[sheet_name]}")
+            else:
+                print(f"Worksheet '{sheet_name}' is empty or has no recognizable headers/data.")
         return all_data
 
     except FileNotFoundError:
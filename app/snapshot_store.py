@@ -0,0 +1,177 @@
+import argparse
+import json
+import os
+import shutil
+import time
+
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from sheet_cache import fingerprint_frames
+
+# --- Configuration ---
+# Directory holding the versioned on-disk snapshots. Each version is a sub-folder with
+# one uncompressed Arrow IPC (Feather v2) file per worksheet plus a manifest.json;
+# the CURRENT file names the version to boot from.
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots"))
+# How many snapshot versions to keep on disk; older ones are deleted after a save.
+SNAPSHOT_KEEP_VERSIONS = int(os.environ.get("SNAPSHOT_KEEP_VERSIONS", 3))
+
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "CURRENT"
+
+
+def _safe_file_name(sheet_name):
+    # Same sanitizing rule the chunker uses for sheet names in output files.
+    return "".join(c for c in sheet_name if c.isalnum() or c in (' ', '_')).rstrip().replace(" ", "_")
+
+
+def save_snapshot(frames, snapshot_dir=SNAPSHOT_DIR, keep_versions=SNAPSHOT_KEEP_VERSIONS):
+    """
+    Writes a set of worksheet DataFrames to disk as a new snapshot version and makes
+    it the current one.
+
+    The version is written to a temporary folder first and then renamed into place,
+    and the CURRENT pointer is replaced atomically, so a reader never sees a
+    half-written snapshot.
+
+    Expected Data:
+        - `frames`: Dictionary of worksheet name -> DataFrame.
+
+    Returns:
+        The new version name (e.g. '20250601T120000Z-3f2a9c1d').
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    fingerprint = fingerprint_frames(frames)
+    created_at = time.time()
+    version = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime(created_at)) + "-" + fingerprint[:8]
+
+    staging_dir = os.path.join(snapshot_dir, f".{version}.tmp")
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    os.makedirs(staging_dir)
+
+    manifest = {"version": version, "created_at": created_at, "fingerprint": fingerprint, "sheets": {}}
+    for i, (sheet_name, df) in enumerate(frames.items()):
+        file_name = f"{i:02d}_{_safe_file_name(sheet_name)}.arrow"
+        # Uncompressed so the file can be memory-mapped and read without decoding.
+        feather.write_feather(df.reset_index(drop=True), os.path.join(staging_dir, file_name),
+                              compression="uncompressed")
+        manifest["sheets"][sheet_name] = {"file": file_name, "rows": len(df),
+                                          "fingerprint": fingerprint_frames({sheet_name: df})}
+    with open(os.path.join(staging_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    version_dir = os.path.join(snapshot_dir, version)
+    shutil.rmtree(version_dir, ignore_errors=True)
+    os.replace(staging_dir, version_dir)
+
+    pointer_tmp = os.path.join(snapshot_dir, f".{CURRENT_FILE}.tmp")
+    with open(pointer_tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(pointer_tmp, os.path.join(snapshot_dir, CURRENT_FILE))
+
+    _prune_versions(snapshot_dir, keep_versions, version)
+    return version
+
+
+def _prune_versions(snapshot_dir, keep_versions, current_version):
+    versions = sorted(
+        name for name in os.listdir(snapshot_dir)
+        if os.path.isfile(os.path.join(snapshot_dir, name, MANIFEST_FILE))
+    )
+    for name in versions[:-keep_versions] if keep_versions > 0 else []:
+        if name != current_version:
+            shutil.rmtree(os.path.join(snapshot_dir, name), ignore_errors=True)
+
+
+def current_version(snapshot_dir=SNAPSHOT_DIR):
+    """
+    Returns the name of the current snapshot version, or None if there is none.
+    """
+    try:
+        with open(os.path.join(snapshot_dir, CURRENT_FILE), encoding="utf-8") as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    if not os.path.isfile(os.path.join(snapshot_dir, version, MANIFEST_FILE)):
+        return None
+    return version
+
+
+def read_manifest(version, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Returns the manifest dictionary of one snapshot version.
+    """
+    with open(os.path.join(snapshot_dir, version, MANIFEST_FILE), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_snapshot(version=None, snapshot_dir=SNAPSHOT_DIR, reuse=None):
+    """
+    Loads a snapshot version (the current one by default) from disk.
+
+    The Arrow files are memory-mapped, so the operating system pages the data in
+    straight from the file cache instead of the process reading and decoding it.
+    String columns stay backed by the mapped Arrow buffers (pandas' pyarrow string
+    dtype, the default from pandas 3 on, hence the pin in requirements.txt), so every
+    process that loads the same version shares one copy of them.
+    Categorical columns come back as 'category' dtype, as they were saved.
+
+    Expected Data:
+        - `reuse` (optional): Dictionary of worksheet name -> (fingerprint, DataFrame)
+          from an earlier load. A worksheet whose manifest fingerprint matches is not
+          read again; the given DataFrame is returned for it instead.
+
+    Returns:
+        A (frames, manifest) tuple, or None if there is no snapshot on disk.
+    """
+    version = version or current_version(snapshot_dir)
+    if version is None:
+        return None
+    manifest = read_manifest(version, snapshot_dir)
+    reuse = reuse or {}
+    frames = {}
+    for sheet_name, entry in manifest["sheets"].items():
+        previous = reuse.get(sheet_name)
+        if previous is not None and entry.get("fingerprint") and previous[0] == entry["fingerprint"]:
+            frames[sheet_name] = previous[1]
+            continue
+        path = os.path.join(snapshot_dir, version, entry["file"])
+        with pa.memory_map(path, "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+        frames[sheet_name] = table.to_pandas()
+    return frames, manifest
+
+
+def main():
+    """
+    Command-line entry point.
+
+        python snapshot_store.py build    Load the live Google Sheet and save a new snapshot.
+        python snapshot_store.py show     Print the current snapshot's manifest.
+    """
+    parser = argparse.ArgumentParser(description="Build or inspect local snapshots of the VISTA spreadsheet.")
+    parser.add_argument("command", choices=["build", "show"], help="'build' a snapshot from the live sheet, or 'show' the current one")
+    parser.add_argument("--dir", default=SNAPSHOT_DIR, help=f"Snapshot directory (default: {SNAPSHOT_DIR})")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        # Imported here so 'show' works without Google credentials or gspread.
+        from sheet_loader import load_worksheets, open_spreadsheet
+
+        frames, fetched = load_worksheets(open_spreadsheet())
+        if fetched.errors:
+            print(f"ERROR: Failed to load worksheets: {fetched.errors}")
+            raise SystemExit(1)
+        version = save_snapshot(frames, args.dir)
+        print(f"SUCCESS: Saved snapshot {version} to {args.dir}")
+    else:
+        version = current_version(args.dir)
+        if version is None:
+            print(f"No snapshot found in {args.dir}")
+            raise SystemExit(1)
+        print(json.dumps(read_manifest(version, args.dir), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,80 +1,315 @@
-import requests
-import zipfile
-import io
+import argparse
+import json
 import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # --- Configuration ---
-# The local folder where you want to save the extracted files.
-EXTRACT_TO_FOLDER = r"C:\Users\gillo\OneDrive\Documents\ChatGPT Instructions\VISTA API Backend\VISTA_Repository"
+# The local folder where you want to save the extracted files (override with --dest).
+EXTRACT_TO_FOLDER = os.environ.get("PAR_EXTRACT_TO_FOLDER", "VISTA_Repository")
+# Where the Performance & Accountability Report archives live; '{}' is the fiscal year.
+# Point it at a local HTTP server (--base-url) to test without va.gov.
+BASE_URL = os.environ.get(
+    "PAR_BASE_URL", "http://www.va.gov/budget/docs/archive/FY-{}_VA-PerformanceAccountabilityReport.zip"
+)
+FIRST_YEAR = int(os.environ.get("PAR_FIRST_YEAR", 2000))
+LAST_YEAR = int(os.environ.get("PAR_LAST_YEAR", 2014))
+# Archives downloaded at the same time, and threads extracting members of one archive.
+DOWNLOAD_WORKERS = int(os.environ.get("PAR_DOWNLOAD_WORKERS", 4))
+EXTRACT_WORKERS = int(os.environ.get("PAR_EXTRACT_WORKERS", 4))
+# Attempts per archive; each attempt resumes from what is already on disk.
+DOWNLOAD_ATTEMPTS = 3
+DOWNLOAD_TIMEOUT_SECONDS = 30
+STREAM_BLOCK_BYTES = 1 << 20
+
+# Bookkeeping folders inside the destination: partial/complete archive downloads, and
+# one JSON record per extracted archive (used to skip it on the next run).
+DOWNLOADS_SUBFOLDER = ".downloads"
+STATE_SUBFOLDER = ".unzip_state"
+
+
+def make_session(pool_size=DOWNLOAD_WORKERS):
+    """
+    Creates one HTTP session shared by all download threads, with a connection pool
+    large enough for every worker and retries (with backoff) for transient errors.
+    """
+    session = requests.Session()
+    retries = Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504],
+                    allowed_methods=["HEAD", "GET"])
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def archive_urls(first_year=FIRST_YEAR, last_year=LAST_YEAR, base_url=BASE_URL):
+    """Returns the archive URLs for the fiscal years, newest first."""
+    return [base_url.format(year) for year in range(last_year, first_year - 1, -1)]
+
+
+def _validator(response):
+    # What identifies this version of the remote file: its ETag, or failing that its
+    # Last-Modified date (plain static file servers often send no ETag).
+    return response.headers.get("ETag") or response.headers.get("Last-Modified")
+
+
+def _member_path(destination_folder, member_name):
+    # Where ZipFile.extract() puts a member (it drops empty, '.' and '..' parts).
+    parts = [part for part in member_name.split("/") if part not in ("", ".", "..")]
+    return os.path.join(destination_folder, *parts)
+
+
+def _state_path(destination_folder, archive_name):
+    return os.path.join(destination_folder, STATE_SUBFOLDER, f"{archive_name}.json")
 
-def download_and_unzip_in_memory(url, destination_folder):
+
+def _read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def is_already_extracted(state, validator, size, destination_folder):
+    """
+    Checks whether an archive was extracted before and is unchanged since.
+
+    Expected Data:
+        - `state`: The record written after the last extraction, or None.
+        - `validator`, `size`: The remote ETag/Last-Modified and Content-Length.
+
+    Returns:
+        True if the remote file matches the record and every extracted member is
+        still on disk with its recorded size.
     """
-    Downloads a ZIP file from a URL, unzips it in memory,
-    and saves the contents to a destination folder.
-    Returns True on success, False on failure.
+    if not state or not validator or state.get("validator") != validator:
+        return False
+    if size is not None and state.get("size") != size:
+        return False
+    for member_name, member_size in state.get("members", {}).items():
+        path = _member_path(destination_folder, member_name)
+        if not os.path.isfile(path) or os.path.getsize(path) != member_size:
+            return False
+    return True
+
+
+def download_archive(session, url, archive_path):
     """
+    Streams an archive to `archive_path` on disk, never holding it in memory.
+
+    The download goes to '<archive_path>.part' first. If that file is left over from an
+    interrupted attempt (or run), the download resumes from where it stopped with an
+    HTTP Range request, guarded by If-Range so a changed remote file is fetched from
+    scratch. Servers that ignore Range simply send the whole file again.
+
+    Returns:
+        The remote file's validator (ETag or Last-Modified), or None.
+
+    Raises:
+        requests.exceptions.RequestException: If every attempt fails.
+    """
+    part_path = f"{archive_path}.part"
+    part_info_path = f"{part_path}.json"
+    os.makedirs(os.path.dirname(archive_path), exist_ok=True)
+
+    for attempt in range(1, DOWNLOAD_ATTEMPTS + 1):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        part_info = _read_json(part_info_path) or {}
+        headers = {}
+        if offset and part_info.get("validator"):
+            headers = {"Range": f"bytes={offset}-", "If-Range": part_info["validator"]}
+        else:
+            offset = 0
+
+        try:
+            with session.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT_SECONDS, headers=headers) as response:
+                if response.status_code == 416:
+                    # Nothing left to fetch: the partial file is already complete.
+                    break
+                response.raise_for_status()
+                validator = _validator(response)
+                if response.status_code == 206:
+                    print(f"  -> Resuming {os.path.basename(archive_path)} at {offset} bytes")
+                    mode = "ab"
+                else:
+                    mode = "wb"
+                    _write_json(part_info_path, {"url": url, "validator": validator})
+                with open(part_path, mode) as f:
+                    for block in response.iter_content(chunk_size=STREAM_BLOCK_BYTES):
+                        f.write(block)
+            break
+        except requests.exceptions.HTTPError:
+            raise
+        except requests.exceptions.RequestException as e:
+            if attempt == DOWNLOAD_ATTEMPTS:
+                raise
+            print(f"  -> Download of {os.path.basename(archive_path)} interrupted ({e}); retrying ({attempt}/{DOWNLOAD_ATTEMPTS})")
+
+    validator = (_read_json(part_info_path) or {}).get("validator")
+    os.replace(part_path, archive_path)
+    if os.path.exists(part_info_path):
+        os.remove(part_info_path)
+    return validator
+
+
+def extract_archive(archive_path, destination_folder, workers=EXTRACT_WORKERS):
+    """
+    Extracts every member of a ZIP archive into `destination_folder`, spreading the
+    members over `workers` threads (each with its own ZipFile handle; decompression
+    releases the GIL).
+
+    Returns:
+        A dictionary of member name -> uncompressed size.
+
+    Raises:
+        zipfile.BadZipFile: If the file is not a valid ZIP archive.
+    """
+    with zipfile.ZipFile(archive_path, "r") as zip_ref:
+        members = [info for info in zip_ref.infolist() if not info.is_dir()]
+
+    # Create the folders first, so the threads never race to create the same one.
+    for info in members:
+        os.makedirs(os.path.dirname(_member_path(destination_folder, info.filename)), exist_ok=True)
+
+    def _extract(batch):
+        with zipfile.ZipFile(archive_path, "r") as zip_ref:
+            for info in batch:
+                zip_ref.extract(info, destination_folder)
+
+    # Largest members first, dealt round-robin, so the threads get similar amounts of work.
+    members_by_size = sorted(members, key=lambda info: info.file_size, reverse=True)
+    batches = [members_by_size[i::workers] for i in range(max(1, workers))]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        list(pool.map(_extract, [batch for batch in batches if batch]))
+
+    return {info.filename: info.file_size for info in members}
+
+
+def download_and_unzip(url, destination_folder, session=None, extract_workers=EXTRACT_WORKERS, keep_archive=False):
+    """
+    Downloads a ZIP file from a URL to disk (streamed and resumable), extracts its
+    contents into a destination folder in parallel, and records what was extracted.
+    Archives that are unchanged since their last extraction are skipped.
+
+    Returns:
+        "extracted", "skipped" (already up to date), "missing" (404) or "failed".
+    """
+    session = session or make_session(1)
+    archive_name = os.path.basename(url.split("?")[0])
+    state_path = _state_path(destination_folder, archive_name)
+    archive_path = os.path.join(destination_folder, DOWNLOADS_SUBFOLDER, archive_name)
+
     print(f"Attempting download from: {url}")
     try:
-        # Use a timeout to prevent the script from hanging indefinitely
-        response = requests.get(url, timeout=30)
-        # Raise an exception for bad status codes (like 404, 500)
-        response.raise_for_status()
-        print("Download successful. Unzipping contents...")
-
-        # Unzip from memory
-        with io.BytesIO(response.content) as zip_in_memory:
-            with zipfile.ZipFile(zip_in_memory, 'r') as zip_ref:
-                zip_ref.extractall(destination_folder)
-                print(f"Successfully extracted {len(zip_ref.namelist())} file(s).")
-        return True
+        # A HEAD request is enough to tell whether the archive changed since last time.
+        head = session.head(url, timeout=DOWNLOAD_TIMEOUT_SECONDS, allow_redirects=True)
+        if head.status_code == 404:
+            print(f"Warning: File not found at this URL (404 Error). Skipping. ({archive_name})")
+            return "missing"
+        if head.ok:
+            size = int(head.headers["Content-Length"]) if "Content-Length" in head.headers else None
+            if is_already_extracted(_read_json(state_path), _validator(head), size, destination_folder):
+                print(f"Already extracted and unchanged: {archive_name}. Skipping.")
+                return "skipped"
+
+        validator = download_archive(session, url, archive_path)
+        print(f"Download successful ({archive_name}). Unzipping contents...")
+
+        members = extract_archive(archive_path, destination_folder, extract_workers)
+        print(f"Successfully extracted {len(members)} file(s) from {archive_name}.")
+        _write_json(state_path, {
+            "url": url,
+            "validator": validator,
+            "size": os.path.getsize(archive_path),
+            "members": members,
+        })
+        if not keep_archive:
+            os.remove(archive_path)
+        return "extracted"
 
     except requests.exceptions.HTTPError as e:
         # Specifically handle the case where a file doesn't exist (404)
-        if e.response.status_code == 404:
-            print(f"Warning: File not found at this URL (404 Error). Skipping.")
-        else:
-            print(f"Error: A web error occurred. {e}")
-        return False
+        if e.response is not None and e.response.status_code == 404:
+            print(f"Warning: File not found at this URL (404 Error). Skipping. ({archive_name})")
+            return "missing"
+        print(f"Error: A web error occurred. {e}")
+        return "failed"
     except requests.exceptions.RequestException as e:
-        print(f"Error: Failed to download the file due to a network issue. {e}")
-        return False
+        print(f"Error: Failed to download {archive_name} due to a network issue. {e}")
+        return "failed"
     except zipfile.BadZipFile:
-        print("Error: The downloaded file is not a valid ZIP archive. Skipping.")
-        return False
+        print(f"Error: {archive_name} is not a valid ZIP archive. Skipping.")
+        if os.path.exists(archive_path):
+            os.remove(archive_path)
+        return "failed"
     except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-        return False
+        print(f"An unexpected error occurred with {archive_name}: {e}")
+        return "failed"
+
+
+def download_and_unzip_all(urls, destination_folder, download_workers=DOWNLOAD_WORKERS,
+                           extract_workers=EXTRACT_WORKERS, keep_archives=False):
+    """
+    Runs download_and_unzip for every URL, `download_workers` archives at a time, over
+    one pooled HTTP session.
+
+    Returns:
+        A dictionary of URL -> status (see download_and_unzip).
+    """
+    os.makedirs(destination_folder, exist_ok=True)
+    session = make_session(download_workers)
+    with ThreadPoolExecutor(max_workers=max(1, download_workers)) as pool:
+        statuses = pool.map(
+            lambda url: download_and_unzip(url, destination_folder, session, extract_workers, keep_archives),
+            urls,
+        )
+        return dict(zip(urls, statuses))
+
 
 # --- Main Execution Block ---
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download and extract the VA Performance & Accountability Report archives.")
+    parser.add_argument("--dest", default=EXTRACT_TO_FOLDER, help="Folder to extract into (default: %(default)s)")
+    parser.add_argument("--first-year", type=int, default=FIRST_YEAR, help="First fiscal year (default: %(default)s)")
+    parser.add_argument("--last-year", type=int, default=LAST_YEAR, help="Last fiscal year (default: %(default)s)")
+    parser.add_argument("--base-url", default=BASE_URL, help="Archive URL pattern, '{}' is the year")
+    parser.add_argument("--workers", type=int, default=DOWNLOAD_WORKERS, help="Archives downloaded in parallel")
+    parser.add_argument("--extract-workers", type=int, default=EXTRACT_WORKERS, help="Threads extracting each archive")
+    parser.add_argument("--keep-archives", action="store_true", help="Keep the downloaded .zip files")
+    args = parser.parse_args()
+
     print("Starting comprehensive download and unzip process...")
 
     # Step 1: Generate the list of URLs based on the provided pattern
-    base_url = "http://www.va.gov/budget/docs/archive/FY-{}_VA-PerformanceAccountabilityReport.zip"
-    years_to_process = range(2014, 1999, -1)  # Generates numbers from 2014 down to 2000
-    url_list = [base_url.format(year) for year in years_to_process]
+    url_list = archive_urls(args.first_year, args.last_year, args.base_url)
 
-    # Ensure the destination directory exists before we start
-    os.makedirs(EXTRACT_TO_FOLDER, exist_ok=True)
-    print(f"All extracted files will be saved to: {EXTRACT_TO_FOLDER}")
+    print(f"All extracted files will be saved to: {os.path.abspath(args.dest)}")
+    print(f"Processing {len(url_list)} archive(s), {args.workers} at a time")
     print("-" * 60)
 
-    # Step 2: Loop through the list and process each URL
-    total_urls = len(url_list)
-    success_count = 0
-    fail_count = 0
-    for i, url in enumerate(url_list):
-        print(f"\n--- Processing URL {i + 1} of {total_urls} ---")
-        if download_and_unzip_in_memory(url, EXTRACT_TO_FOLDER):
-            success_count += 1
-        else:
-            fail_count += 1
-    
+    # Step 2: Download and extract the archives concurrently
+    results = download_and_unzip_all(url_list, args.dest, args.workers, args.extract_workers, args.keep_archives)
+
     # Step 3: Print a final summary report
+    counts = {status: list(results.values()).count(status) for status in ("extracted", "skipped", "missing", "failed")}
     print("\n" + "=" * 60)
     print("                PROCESS COMPLETE")
     print("-" * 60)
-    print(f"Summary: {success_count} URLs processed successfully.")
-    print(f"         {fail_count} URLs failed or were skipped.")
-    print(f"All extracted files are now in your local repository.")
-    print("=" * 60)
\ No newline at end of file
+    print(f"Summary: {counts['extracted']} archive(s) downloaded and extracted.")
+    print(f"         {counts['skipped']} archive(s) already up to date.")
+    print(f"         {counts['missing'] + counts['failed']} URLs failed or were skipped.")
+    print(f"All extracted files are now in {os.path.abspath(args.dest)}.")
+    print("=" * 60)
@@ -0,0 +1,384 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import metrics
+
+# --- Configuration ---
+# Hosts '/proxy' may fetch from, as 'host' (default ports) or 'host:port' (e.g.
+# '127.0.0.1:8765' for a local stub server). Anything else is refused, so the proxy
+# cannot be used to reach arbitrary (or internal) addresses.
+PROXY_ALLOWED_HOSTS = [host.strip().lower() for host in
+                       os.environ.get("PROXY_ALLOWED_HOSTS", "api.census.gov,www.data.va.gov").split(",")
+                       if host.strip()]
+# On-disk response cache: its directory, how long a response is served before it is
+# fetched again, and the total size above which the least recently used responses are
+# deleted. Bodies are stored gzip-compressed.
+PROXY_CACHE_DIR = os.environ.get("PROXY_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "proxy_cache"))
+PROXY_CACHE_TTL_SECONDS = float(os.environ.get("PROXY_CACHE_TTL_SECONDS", 24 * 3600))
+PROXY_CACHE_MAX_BYTES = int(os.environ.get("PROXY_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+# Upstream requests: timeout (connect and read, in seconds), largest body accepted, and
+# connections kept open per host for reuse.
+PROXY_TIMEOUT_SECONDS = float(os.environ.get("PROXY_TIMEOUT_SECONDS", 30))
+PROXY_MAX_RESPONSE_BYTES = int(os.environ.get("PROXY_MAX_RESPONSE_BYTES", 32 * 1024 * 1024))
+PROXY_POOL_SIZE = int(os.environ.get("PROXY_POOL_SIZE", 16))
+# Redirects followed per request. Each target must pass the same checks as 'url'.
+PROXY_MAX_REDIRECTS = int(os.environ.get("PROXY_MAX_REDIRECTS", 3))
+# Query parameters that do not change the upstream response (the caller's Census API
+# key) and are left out of the cache key, so every caller shares the cached copy.
+PROXY_CACHE_KEY_IGNORED_PARAMS = ("key",)
+
+# After an eviction pass the cache is at most this fraction of PROXY_CACHE_MAX_BYTES,
+# so a full cache is not rescanned on every write.
+EVICTION_LOW_WATER = 0.9
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+
+class ProxyError(Exception):
+    """
+    Raised for a proxy request that cannot be answered.
+
+    Attributes:
+        status: HTTP status code to return (400/403 for bad input, 502/504 for upstream
+            failures).
+        payload: JSON-serializable error body.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.payload = {"error": message}
+
+
+def normalize_url(url, params=(), allowed_hosts=PROXY_ALLOWED_HOSTS):
+    """
+    Validates an upstream URL and puts it in a canonical form.
+
+    The scheme and host are lowercased and default ports dropped; the URL's own query
+    parameters and `params` are merged and sorted, so the same request spelled
+    differently ('?for=state:*&get=NAME' or '?get=NAME&for=state:*') is fetched and
+    cached once.
+
+    Expected Data:
+        - `url`: An absolute http(s) URL on one of `allowed_hosts`.
+        - `params` (optional): Extra (name, value) query parameters.
+
+    Returns:
+        A (fetch_url, cache_key) pair: the URL to request, and the same URL without
+        the PROXY_CACHE_KEY_IGNORED_PARAMS.
+
+    Raises:
+        ProxyError: 400 for a missing or malformed URL, 403 for a host that is not allowed.
+    """
+    if not url:
+        raise ProxyError(400, "Query parameter 'url' is required.")
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    if scheme not in _DEFAULT_PORTS or not parts.hostname or parts.username or parts.password:
+        raise ProxyError(400, "Query parameter 'url' must be an absolute http or https URL.")
+    try:
+        port = parts.port
+    except ValueError:
+        raise ProxyError(400, "Query parameter 'url' has an invalid port.")
+    host = parts.hostname.lower()
+    netloc = host if port in (None, _DEFAULT_PORTS[scheme]) else f"{host}:{port}"
+    if netloc not in allowed_hosts:
+        raise ProxyError(403, f"Host '{netloc}' is not allowed. Allowed hosts: {list(allowed_hosts)}")
+
+    query = sorted(parse_qsl(parts.query, keep_blank_values=True) + list(params))
+    path = parts.path or "/"
+    fetch_url = urlunsplit((scheme, netloc, path, urlencode(query, safe=":*,"), ""))
+    key_query = [(name, value) for name, value in query if name not in PROXY_CACHE_KEY_IGNORED_PARAMS]
+    cache_key = urlunsplit((scheme, netloc, path, urlencode(key_query, safe=":*,"), ""))
+    return fetch_url, cache_key
+
+
+class ProxyResponse:
+    """
+    An upstream response as the proxy serves it.
+
+    Attributes:
+        status: Upstream HTTP status.
+        content_type: Upstream Content-Type.
+        gzip_body: The body, gzip-compressed.
+        fetched_at: Unix timestamp of the upstream fetch.
+        cache_status: 'hit' (from the disk cache), 'miss' (fetched for this request) or
+            'coalesced' (fetched for a concurrent identical request).
+    """
+
+    def __init__(self, status, content_type, gzip_body, fetched_at, cache_status="miss"):
+        self.status = status
+        self.content_type = content_type
+        self.gzip_body = gzip_body
+        self.fetched_at = fetched_at
+        self.cache_status = cache_status
+
+    @property
+    def age(self):
+        """Seconds since the response was fetched from upstream."""
+        return max(0.0, time.time() - self.fetched_at)
+
+    def body(self):
+        """Returns the uncompressed body."""
+        return gzip.decompress(self.gzip_body)
+
+
+class DiskCache:
+    """
+    A size-bounded LRU cache of ProxyResponses in a directory, shared by every worker
+    process that points at it.
+
+    Each entry is one file, named by the hash of its cache key: a JSON header line
+    (status, content type, fetch time, key) followed by the gzip body. Files are written
+    to a temporary name and renamed into place, so readers never see a partial entry.
+    A file's modification time records its last use: hits touch it, and when the
+    directory grows past `max_bytes` the least recently used files are deleted until it
+    is back under EVICTION_LOW_WATER of the limit. Entries older than `ttl_seconds`
+    (by fetch time) are treated as missing and deleted when found.
+    """
+
+    def __init__(self, directory=PROXY_CACHE_DIR, max_bytes=PROXY_CACHE_MAX_BYTES,
+                 ttl_seconds=PROXY_CACHE_TTL_SECONDS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # Estimated size of the directory; None until the first write scans it. Other
+        # processes' writes are only seen by the next scan.
+        self._size = None
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".entry")
+
+    def get(self, key):
+        """
+        Returns the cached ProxyResponse for `key`, or None if there is none or it expired.
+        """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                header = json.loads(f.readline())
+                gzip_body = f.read()
+        except (OSError, ValueError):
+            return None
+        if header.get("key") != key:
+            return None
+        if time.time() - header["fetched_at"] > self.ttl_seconds:
+            self._remove(path)
+            return None
+        try:
+            os.utime(path) # Marks the entry as recently used.
+        except OSError:
+            pass
+        return ProxyResponse(header["status"], header["content_type"], gzip_body, header["fetched_at"], "hit")
+
+    def put(self, key, response):
+        """Stores a ProxyResponse under `key`, evicting old entries if the cache is full."""
+        os.makedirs(self.directory, exist_ok=True)
+        header = json.dumps({"key": key, "status": response.status, "content_type": response.content_type,
+                             "fetched_at": response.fetched_at}).encode("utf-8")
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(header + b"\n" + response.gzip_body)
+            os.replace(temp_path, self._path(key))
+        except BaseException:
+            self._remove(temp_path)
+            raise
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(header) + 1 + len(response.gzip_body)
+            if self._size > self.max_bytes:
+                self._size = self._evict()
+
+    def _scan(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".entry"):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue # Deleted by another process meanwhile.
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._scan())
+
+    def _evict(self):
+        # Deletes the least recently used entries; returns the remaining size.
+        entries = sorted(self._scan())
+        size = sum(size for _, size, _ in entries)
+        target = self.max_bytes * EVICTION_LOW_WATER
+        evicted = 0
+        for _, entry_size, path in entries:
+            if size <= target:
+                break
+            self._remove(path)
+            size -= entry_size
+            evicted += 1
+        metrics.PROXY_CACHE_EVICTIONS.inc(evicted)
+        print(f"--- Proxy cache over {self.max_bytes} bytes: evicted {evicted} entries. ---")
+        return size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class _Flight:
+    # One upstream fetch that concurrent identical requests wait on.
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+class UpstreamProxy:
+    """
+    Fetches allowed upstream URLs (Census and VA APIs) for '/proxy', through a disk
+    cache and a pooled HTTP client.
+
+    - Cache: successful (200) responses are kept in a DiskCache, keyed by the
+      normalized URL, and served from it until they expire.
+    - Coalescing: concurrent requests for the same uncached URL in one process share a
+      single upstream fetch; the others wait for its result (single-flight).
+    - Pooling: one requests.Session keeps up to PROXY_POOL_SIZE connections per host
+      open, so repeated fetches skip the TCP and TLS handshakes. Connection failures
+      are retried twice with backoff.
+
+    Non-200 upstream responses (e.g. the Census API's 400 for an unknown variable) are
+    passed through to the caller but never cached. Redirects are followed (at most
+    PROXY_MAX_REDIRECTS) only to allowed hosts; a redirect anywhere else is a 502.
+
+    Expected Data:
+        - `cache` (optional): The DiskCache to use.
+        - `session` (optional): A requests.Session, e.g. one with test adapters mounted.
+        - `allowed_hosts` (optional): Hosts that may be fetched (see PROXY_ALLOWED_HOSTS).
+    """
+
+    def __init__(self, cache=None, session=None, allowed_hosts=PROXY_ALLOWED_HOSTS):
+        self.cache = cache if cache is not None else DiskCache()
+        self.session = session if session is not None else self._new_session()
+        self.allowed_hosts = allowed_hosts
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    @staticmethod
+    def _new_session():
+        session = requests.Session()
+        retry = Retry(total=2, connect=2, read=False, status=0, backoff_factor=0.2, allowed_methods=["GET"])
+        adapter = HTTPAdapter(pool_connections=len(PROXY_ALLOWED_HOSTS) or 1,
+                              pool_maxsize=PROXY_POOL_SIZE, max_retries=retry)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def fetch(self, url, params=()):
+        """
+        Returns the response for an upstream URL, from the cache when possible.
+
+        Expected Data:
+            - `url`: Upstream URL (see normalize_url).
+            - `params` (optional): Extra (name, value) query parameters.
+
+        Returns:
+            A ProxyResponse.
+
+        Raises:
+            ProxyError: For a bad or disallowed URL (400/403), an upstream that cannot
+                be reached or answers with an oversized body (502), or a timeout (504).
+        """
+        fetch_url, key = normalize_url(url, params, self.allowed_hosts)
+        cached = self.cache.get(key)
+        if cached is not None:
+            metrics.PROXY_REQUESTS.labels("hit").inc()
+            return cached
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            metrics.PROXY_REQUESTS.labels("coalesced").inc()
+            if flight.error is not None:
+                raise flight.error
+            response = flight.response
+            return ProxyResponse(response.status, response.content_type, response.gzip_body,
+                                 response.fetched_at, "coalesced")
+
+        try:
+            flight.response = self._fetch_upstream(fetch_url)
+            if flight.response.status == 200:
+                try:
+                    self.cache.put(key, flight.response)
+                except OSError as e:
+                    print(f"--- WARNING: could not cache proxy response for {key}: {e} ---")
+            metrics.PROXY_REQUESTS.labels("miss").inc()
+            return flight.response
+        except ProxyError as e:
+            flight.error = e
+            metrics.PROXY_REQUESTS.labels("error").inc()
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def _fetch_upstream(self, fetch_url):
+        # Redirects are followed here rather than by requests, so every hop goes through
+        # normalize_url's scheme, userinfo and host checks: an allowed host must not be
+        # able to send the proxy anywhere else.
+        started = time.perf_counter()
+        try:
+            for _ in range(PROXY_MAX_REDIRECTS + 1):
+                status, content_type, body, location = self._get(fetch_url)
+                if status not in REDIRECT_STATUSES or not location:
+                    break
+                try:
+                    fetch_url, _ = normalize_url(urljoin(fetch_url, location), (), self.allowed_hosts)
+                except ProxyError as e:
+                    raise ProxyError(502, f"Upstream redirected to a URL that is not allowed: {e}")
+            else:
+                raise ProxyError(502, f"Upstream redirected more than {PROXY_MAX_REDIRECTS} times.")
+        finally:
+            metrics.PROXY_UPSTREAM_SECONDS.observe(time.perf_counter() - started)
+        gzip_body = gzip.compress(body, compresslevel=6, mtime=0)
+        return ProxyResponse(status, content_type, gzip_body, time.time())
+
+    def _get(self, fetch_url):
+        # One upstream request, without following redirects: (status, content type, body, Location).
+        try:
+            with self.session.get(fetch_url, timeout=PROXY_TIMEOUT_SECONDS, stream=True,
+                                  allow_redirects=False) as upstream:
+                chunks, size = [], 0
+                for chunk in upstream.iter_content(chunk_size=65536):
+                    size += len(chunk)
+                    if size > PROXY_MAX_RESPONSE_BYTES:
+                        raise ProxyError(502, f"Upstream response is larger than {PROXY_MAX_RESPONSE_BYTES} bytes.")
+                    chunks.append(chunk)
+                return (upstream.status_code, upstream.headers.get("Content-Type", "application/octet-stream"),
+                        b"".join(chunks), upstream.headers.get("Location"))
+        except requests.Timeout:
+            raise ProxyError(504, f"Upstream did not answer within {PROXY_TIMEOUT_SECONDS:g} seconds.")
+        except requests.RequestException as e:
+            raise ProxyError(502, f"Upstream request failed: {e.__class__.__name__}.")
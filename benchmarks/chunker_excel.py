@@ -0,0 +1,82 @@
+import argparse
+import sys
+import time
+
+import pandas as pd
+
+from synthetic import excel_sheet
+
+import definitive_chunker
+
+# --- Benchmark: Excel sheet chunking ---
+# Chunks a synthetic sheet the way process_excel_document does, with the current
+# column-wise sizing and with the original row-by-row loop, checks that both produce
+# the same markdown, and prints the timings.
+#
+#     python benchmarks/chunker_excel.py --rows 100000
+
+
+def row_by_row_chunks(df, max_bytes):
+    """
+    The original chunking loop: renders every row as its own markdown table to size
+    it, and rebuilds each chunk from the rows' dictionaries.
+
+    Returns:
+        A list of chunk DataFrames.
+    """
+    chunks, rows_for_chunk, current_chunk_size_bytes = [], [], 0
+    for _, row in df.iterrows():
+        row_markdown = pd.DataFrame([row.values], columns=df.columns).to_markdown(index=False)
+        row_size_bytes = len(row_markdown.encode('utf-8'))
+        if current_chunk_size_bytes > 0 and (current_chunk_size_bytes + row_size_bytes) > max_bytes:
+            chunks.append(pd.DataFrame(rows_for_chunk, columns=df.columns))
+            rows_for_chunk, current_chunk_size_bytes = [], 0
+        rows_for_chunk.append(row.to_dict())
+        current_chunk_size_bytes += row_size_bytes
+    if rows_for_chunk:
+        chunks.append(pd.DataFrame(rows_for_chunk, columns=df.columns))
+    return chunks
+
+
+def timed(label, build):
+    """
+    Builds the chunks and renders them to markdown, printing the split of the time.
+
+    Returns:
+        The list of markdown strings.
+    """
+    started = time.perf_counter()
+    chunks = build()
+    sized = time.perf_counter()
+    markdown = [chunk.to_markdown(index=False) for chunk in chunks]
+    rendered = time.perf_counter()
+    print(f"{label:<12} {sized - started:>9.2f}s sizing {rendered - sized:>9.2f}s rendering "
+          f"{len(markdown):>5} chunks")
+    return markdown
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark byte-size chunking of a synthetic Excel sheet.")
+    parser.add_argument("--rows", type=int, default=100000, help="Rows in the synthetic sheet")
+    parser.add_argument("--max-bytes", type=int, default=definitive_chunker.MAX_BYTES, help="Chunk size limit")
+    parser.add_argument("--skip-row-by-row", action="store_true",
+                        help="Only time the current implementation (the original loop takes minutes)")
+    args = parser.parse_args()
+
+    print(f"--- Building synthetic sheet ({args.rows} rows) ---")
+    df = excel_sheet(args.rows)
+
+    current = timed("column-wise", lambda: list(definitive_chunker.iter_sheet_chunks(df, args.max_bytes)))
+    if args.skip_row_by_row:
+        return 0
+
+    original = timed("row-by-row", lambda: row_by_row_chunks(df, args.max_bytes))
+    if current != original:
+        print("ERROR: The chunkers produced different markdown.")
+        return 1
+    print("Both chunkers produced identical markdown.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
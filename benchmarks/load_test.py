@@ -0,0 +1,142 @@
+import argparse
+import http.client
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import quote
+
+from synthetic import APP_DIR, write_snapshot
+
+# --- Load test: threaded WSGI (gunicorn) vs ASGI (uvicorn) ---
+# Starts the API in each serving mode against the same synthetic offline snapshot,
+# drives it with concurrent keep-alive clients for a fixed duration, and prints
+# throughput and latency percentiles side by side.
+#
+#     python benchmarks/load_test.py --rows 100000 --concurrency 32 --duration 15
+
+SERVER_COMMANDS = {
+    # The production Dockerfile configuration.
+    "wsgi": ["gunicorn", "--bind", "127.0.0.1:{port}", "--workers", "1", "--threads", "8",
+             "--timeout", "0", "app:app"],
+    "asgi": ["uvicorn", "asgi:app", "--host", "127.0.0.1", "--port", "{port}", "--workers", "1",
+             "--no-access-log"],
+}
+
+# A request mix resembling the GPT action's traffic: mostly filtered lookups, some
+# paged whole-sheet reads, and a few uncached one-off queries (the {n} suffix).
+REQUEST_MIX = [
+    "/query_api_paths?category=Demographics",
+    "/query_api_paths?api_name=VetPop&limit=20",
+    "/query_census_apis_full_list?dataset_name=acs&limit=50",
+    "/query_census_apis_full_list?year=2019&fields=Dataset Name,API Base URL&limit=100",
+    "/query_census_apis_full_list?limit=100&offset={n}",
+    "/query_census_apis_full_list?dataset_name=cbp&year=20{n2}",
+]
+
+
+def _wait_until_ready(port, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/")
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def _client(port, deadline, latencies, statuses, lock, seed):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    local_latencies, local_statuses, i = [], {}, seed
+    while time.time() < deadline:
+        path = REQUEST_MIX[i % len(REQUEST_MIX)].format(n=i % 1000, n2=10 + i % 14)
+        i += 1
+        started = time.perf_counter()
+        try:
+            conn.request("GET", quote(path, safe="/?=&,"))
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            status = "error"
+        local_latencies.append(time.perf_counter() - started)
+        local_statuses[status] = local_statuses.get(status, 0) + 1
+    conn.close()
+    with lock:
+        latencies.extend(local_latencies)
+        for status, count in local_statuses.items():
+            statuses[status] = statuses.get(status, 0) + count
+
+
+def run_mode(mode, port, snapshot_dir, concurrency, duration):
+    """
+    Starts one server mode, loads it, stops it.
+
+    Returns:
+        A dictionary of results (requests, rps, p50/p99 latency in ms, status counts).
+    """
+    env = dict(os.environ, SHEETS_OFFLINE="1", SNAPSHOT_DIR=snapshot_dir, SNAPSHOT_AUTOSAVE="0")
+    command = [part.format(port=port) for part in SERVER_COMMANDS[mode]]
+    server = subprocess.Popen(command, cwd=APP_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not _wait_until_ready(port, timeout=120):
+            raise RuntimeError(f"{mode} server did not become ready on port {port}")
+
+        latencies, statuses, lock = [], {}, threading.Lock()
+        deadline = time.time() + duration
+        threads = [threading.Thread(target=_client, args=(port, deadline, latencies, statuses, lock, n))
+                   for n in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "requests": len(latencies),
+        "rps": len(latencies) / duration,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else 0.0,
+        "statuses": statuses,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the WSGI and ASGI serving modes under load.")
+    parser.add_argument("--rows", type=int, default=100000, help="Rows in the synthetic Census sheet")
+    parser.add_argument("--concurrency", type=int, default=32, help="Number of concurrent client connections")
+    parser.add_argument("--duration", type=float, default=15, help="Seconds to run each mode")
+    parser.add_argument("--modes", nargs="+", default=["wsgi", "asgi"], choices=sorted(SERVER_COMMANDS))
+    parser.add_argument("--port", type=int, default=8765, help="Port for the server under test")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        print(f"--- Writing synthetic snapshot ({args.rows} rows) ---")
+        write_snapshot(args.rows, snapshot_dir)
+
+        results = []
+        for mode in args.modes:
+            print(f"--- Loading {mode} for {args.duration:.0f}s with {args.concurrency} clients ---")
+            results.append(run_mode(mode, args.port, snapshot_dir, args.concurrency, args.duration))
+
+    print(f"\n{'mode':<6} {'requests':>9} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9}  statuses")
+    for r in results:
+        print(f"{r['mode']:<6} {r['requests']:>9} {r['rps']:>9.1f} {r['p50_ms']:>9.2f} {r['p99_ms']:>9.2f}  {r['statuses']}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,385 @@
+import argparse
+import contextlib
+import datetime
+import functools
+import json
+import math
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from synthetic import make_frames, write_pdf, write_workbook
+
+# --- Benchmark suite: API queries and chunker documents ---
+# Runs every benchmark case in its own fresh process, so each case's peak RSS is its own:
+#
+# - api: synthetic 'API Name and Path' / 'Census Bureau APIs - Full List' worksheets at
+#   each --rows size are published into the API's sheet cache, and every query pattern
+#   in QUERY_PATTERNS is driven through the Flask test client, once with the response
+#   cache in place ('cached') and once with every response rebuilt ('uncached').
+# - proxy: '/proxy' is driven through the Flask test client against a local upstream
+#   stub (upstream_stub.py) answering after UPSTREAM_DELAY_SECONDS: uncached URLs
+#   ('miss'), repeated ones ('hit') and PROXY_CONCURRENCY simultaneous requests for one
+#   uncached URL ('coalesced', which should reach the stub once).
+# - excel / pdf: process_excel_document / process_pdf_document chunk a synthetic
+#   workbook or PDF into a local output folder (chunk_storage.LocalBucket).
+# - pdf-tables: process_pdf_document with table extraction, on PDFs with a ruled
+#   budget table on every page.
+#
+# Results are compared against a stored baseline, and the run fails if any metric got
+# worse by more than --tolerance:
+#
+#     python benchmarks/suite.py                        # compare with benchmarks/baseline.json
+#     python benchmarks/suite.py --save-baseline        # record a new baseline
+#     python benchmarks/suite.py --rows 1000 100000 --output results.json
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Query patterns the API is benchmarked with: one per combination of query parameters
+# the GPT actions send. 'revalidate' repeats a request with the ETag of its first response.
+# Patterns listed in PATTERN_HEADERS are sent with those request headers.
+QUERY_PATTERNS = {
+    "paths_all": "/query_api_paths",
+    "paths_category": "/query_api_paths?category=Demographics",
+    "paths_api_name": "/query_api_paths?api_name=VetPop",
+    "paths_category_api_name": "/query_api_paths?category=Health&api_name=COVID",
+    "paths_page": "/query_api_paths?limit=50&offset=100",
+    "paths_fuzzy": "/query_api_paths?category=benifits&api_name=disabilty&match=fuzzy",
+    "census_all": "/query_census_apis_full_list",
+    "census_dataset_name": "/query_census_apis_full_list?dataset_name=cbp",
+    "census_year": "/query_census_apis_full_list?year=2019",
+    "census_dataset_name_year": "/query_census_apis_full_list?dataset_name=acs&year=2015",
+    "census_fuzzy": "/query_census_apis_full_list?dataset_name=acs5 housng&match=fuzzy",
+    "census_all_gzip": "/query_census_apis_full_list",
+    "census_all_br": "/query_census_apis_full_list",
+    "census_all_ndjson": "/query_census_apis_full_list?format=ndjson",
+    "census_fields_page": "/query_census_apis_full_list?fields=Dataset Name,API Base URL&limit=100&offset=100",
+    "census_not_found": "/query_census_apis_full_list?dataset_name=no-such-dataset",
+    "census_bad_param": "/query_census_apis_full_list?limit=many",
+    "revalidate": "/query_census_apis_full_list?dataset_name=cbp&limit=100",
+    "sheets_census_sorted": "/sheets/census-apis/query?dataset_name=acs&sort=-API Base URL&limit=100",
+    "sheets_census_prefix_exact": "/sheets/census-apis/query?dataset_name=acs&match=prefix&dataset_type=Annual&limit=100",
+    "sheets_census_year_sorted": "/sheets/census-apis/query?year=2019&sort=Dataset Name",
+    "sheets_utilities": "/sheets/utilities/query?notes=veteran",
+    "search_rare": "/search?q=VetPop",
+    "search_words": "/search?q=acs population 2019",
+    "search_common": "/search?q=census api data&limit=50",
+    "batch": "/batch",
+}
+PATTERN_HEADERS = {
+    "census_all_gzip": {"Accept-Encoding": "gzip"},
+    "census_all_br": {"Accept-Encoding": "br"},
+}
+# Patterns listed in PATTERN_BODIES are POSTed with that JSON body.
+PATTERN_BODIES = {
+    "batch": {"queries": [
+        {"endpoint": "/query_census_apis_full_list", "params": {"dataset_name": "acs", "year": "2015", "limit": 100}},
+        {"endpoint": "/query_census_apis_full_list", "params": {"year": "2015", "limit": 100}},
+        {"endpoint": "/query_api_paths", "params": {"category": "Health", "api_name": "COVID", "limit": 100}},
+        {"endpoint": "/search", "params": {"q": "acs population 2015"}},
+    ]},
+}
+
+# Upstream latency of the stub behind '/proxy', and how many identical requests the
+# 'coalesced' proxy pattern sends at once.
+UPSTREAM_DELAY_SECONDS = 0.05
+PROXY_CONCURRENCY = 16
+
+# Whether a larger or smaller value of each metric is better, for the baseline comparison.
+HIGHER_IS_BETTER = {"rps", "rows_per_s", "pages_per_s"}
+LOWER_IS_BETTER = {"p50_ms", "p99_ms", "seconds", "peak_rss_mb"}
+# Latency increases smaller than these (in milliseconds) are never reported: cached
+# responses take well under a millisecond, and a single scheduler hiccup in a few hundred
+# requests moves the p99 by more than the tolerance.
+MIN_LATENCY_DELTA_MS = {"p50_ms": 1.0, "p99_ms": 5.0}
+# Metrics whose regressions are listed but do not fail the run: the p99 of a few hundred
+# requests is the second-slowest one, and doubles between identical runs on a busy host.
+ADVISORY_METRICS = {"p99_ms"}
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux (bytes on macOS); children covers the PDF page pool.
+    scale = 1 if sys.platform == "darwin" else 1024
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return peak * scale / (1024 * 1024)
+
+
+def _percentiles(latencies):
+    latencies = sorted(latencies)
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        # Nearest-rank percentile, so a pattern with few requests reports its slowest one.
+        "p99_ms": latencies[math.ceil(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def _drive_pattern(client, name, requests, max_seconds):
+    path = QUERY_PATTERNS[name]
+    headers = dict(PATTERN_HEADERS.get(name, {}))
+    if name == "revalidate":
+        headers["If-None-Match"] = client.get(path).headers["ETag"]
+    latencies, statuses = [], set()
+    started = time.perf_counter()
+    # At least one request; stop early once the time budget is spent (whole-sheet
+    # responses of the largest sizes take seconds each when they are rebuilt).
+    while len(latencies) < requests and (not latencies or time.perf_counter() - started < max_seconds):
+        request_started = time.perf_counter()
+        if name in PATTERN_BODIES:
+            response = client.post(path, json=PATTERN_BODIES[name], headers=headers)
+        else:
+            response = client.get(path, headers=headers)
+        response.get_data()
+        latencies.append(time.perf_counter() - request_started)
+        statuses.add(response.status_code)
+    elapsed = time.perf_counter() - started
+    return dict(requests=len(latencies), rps=len(latencies) / elapsed, statuses=sorted(statuses),
+                **_percentiles(latencies))
+
+
+def api_case(rows, requests, max_seconds):
+    """
+    Benchmarks every query pattern against synthetic worksheets of `rows` rows.
+    Runs in a fresh worker process (see run_case).
+
+    Returns:
+        A dictionary with the setup time, peak RSS and per-pattern results for the
+        'cached' and 'uncached' modes.
+    """
+    # Never contact Google Sheets; the synthetic frames are published directly.
+    os.environ.update(SHEETS_OFFLINE="1", SHEET_CACHE_PRELOAD="0", SNAPSHOT_AUTOSAVE="0")
+    import app as api
+    from response_cache import ResponseCache
+
+    frames = make_frames(rows)
+    started = time.perf_counter()
+    snapshot = api.data_cache.publish(frames)
+    setup_seconds = time.perf_counter() - started
+    client = api.app.test_client()
+
+    patterns = {}
+    for mode in ("cached", "uncached"):
+        if mode == "uncached":
+            # A zero-entry cache stores nothing, so every request builds its response.
+            snapshot.responses = ResponseCache(max_entries=0)
+        for name in QUERY_PATTERNS:
+            patterns[f"{mode}/{name}"] = _drive_pattern(client, name, requests, max_seconds)
+    return {"setup_seconds": setup_seconds, "patterns": patterns}
+
+
+def proxy_case(requests, cache_dir):
+    """
+    Benchmarks '/proxy' against a local upstream stub, with the disk cache in `cache_dir`.
+    Runs in a fresh worker process (see run_case).
+
+    Returns:
+        A dictionary with per-pattern results; 'coalesced' also reports how many
+        requests reached the stub.
+    """
+    from upstream_stub import UpstreamStub
+
+    with UpstreamStub(delay=UPSTREAM_DELAY_SECONDS) as stub:
+        os.environ.update(SHEETS_OFFLINE="1", SHEET_CACHE_PRELOAD="0", SNAPSHOT_AUTOSAVE="0",
+                          PROXY_ALLOWED_HOSTS=stub.host, PROXY_CACHE_DIR=cache_dir)
+        import app as api
+        client = api.app.test_client()
+        url = f"http://{stub.host}/data/2019/acs/acs5"
+
+        def timed(params):
+            started = time.perf_counter()
+            response = client.get("/proxy", query_string=dict(params, url=url))
+            response.get_data()
+            return time.perf_counter() - started, response.status_code
+
+        patterns = {}
+        for name in ("miss", "hit"):
+            started = time.perf_counter()
+            # 'miss' asks for a new variable every time; 'hit' repeats the last one.
+            runs = [timed({"get": f"B{n:05d}_001E" if name == "miss" else f"B{requests - 1:05d}_001E",
+                           "for": "state:*"}) for n in range(requests)]
+            elapsed = time.perf_counter() - started
+            patterns[name] = dict(requests=len(runs), rps=len(runs) / elapsed,
+                                  statuses=sorted({status for _, status in runs}),
+                                  **_percentiles([seconds for seconds, _ in runs]))
+
+        upstream_before = stub.requests
+        with ThreadPoolExecutor(max_workers=PROXY_CONCURRENCY) as pool:
+            started = time.perf_counter()
+            runs = list(pool.map(lambda _: timed({"get": "NAME", "for": "county:*"}), range(PROXY_CONCURRENCY)))
+            elapsed = time.perf_counter() - started
+        patterns["coalesced"] = dict(requests=len(runs), rps=len(runs) / elapsed,
+                                     statuses=sorted({status for _, status in runs}),
+                                     upstream_requests=stub.requests - upstream_before,
+                                     **_percentiles([seconds for seconds, _ in runs]))
+    return {"patterns": patterns}
+
+
+def document_case(kind, size, output_dir):
+    """
+    Chunks a synthetic workbook (`size` rows) or PDF (`size` pages) into `output_dir`;
+    'pdf-tables' PDFs have a budget table on every page and are chunked with table
+    extraction.
+    Runs in a fresh worker process (see run_case).
+
+    Returns:
+        A dictionary with the time taken, throughput and number of chunks written.
+
+    Raises:
+        RuntimeError: If the chunker reports that the document could not be processed.
+    """
+    import definitive_chunker
+    from chunk_storage import LocalBucket
+
+    input_dir = os.path.join(output_dir, "input")
+    os.makedirs(input_dir, exist_ok=True)
+    if kind == "excel":
+        filename, process = "synthetic.xlsx", definitive_chunker.process_excel_document
+        write_workbook(os.path.join(input_dir, filename), size)
+    elif kind == "pdf-tables":
+        filename = "synthetic.pdf"
+        process = functools.partial(definitive_chunker.process_pdf_document, extract_tables=True)
+        write_pdf(os.path.join(input_dir, filename), size, tables=True)
+    else:
+        filename, process = "synthetic.pdf", definitive_chunker.process_pdf_document
+        write_pdf(os.path.join(input_dir, filename), size)
+
+    bucket = LocalBucket(os.path.join(output_dir, "output"))
+    started = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        outputs = process(os.path.join(input_dir, filename), bucket, "", filename)
+    seconds = time.perf_counter() - started
+    if outputs is None:
+        raise RuntimeError(f"The chunker could not process the synthetic {kind} document.")
+    unit = "rows_per_s" if kind == "excel" else "pages_per_s"
+    return {"seconds": seconds, unit: size / seconds, "chunks": len(outputs)}
+
+
+def _run_and_measure(func, args):
+    result = func(*args)
+    result["peak_rss_mb"] = _peak_rss_mb()
+    return result
+
+
+def run_case(func, *args):
+    """
+    Runs one benchmark case in a new process (spawned, so no memory is inherited from
+    this one) and adds the process's peak RSS to its result.
+
+    Returns:
+        The case's result dictionary.
+    """
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(_run_and_measure, func, args).result()
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compares every metric in `results` with the same metric in `baseline`.
+
+    Returns:
+        A list of (case, metric, value, baseline value, relative change, regressed) tuples.
+    """
+    rows = []
+
+    def walk(current, previous, path):
+        for key, value in current.items():
+            if key not in previous:
+                continue
+            if isinstance(value, dict):
+                walk(value, previous[key], path + [key])
+            elif key in HIGHER_IS_BETTER or key in LOWER_IS_BETTER:
+                old = previous[key]
+                change = (value - old) / old if old else 0.0
+                worse = -change if key in HIGHER_IS_BETTER else change
+                regressed = worse > tolerance
+                if value - old < MIN_LATENCY_DELTA_MS.get(key, 0.0):
+                    regressed = False
+                rows.append(("/".join(path), key, value, old, change, regressed))
+
+    walk(results["cases"], baseline.get("cases", {}), [])
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API and chunker benchmark suite.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 100000, 1000000],
+                        help="Sizes of the synthetic Census sheet ('API Name and Path' gets a tenth)")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per query pattern and mode")
+    parser.add_argument("--max-seconds", type=float, default=3.0, help="Time budget per query pattern and mode")
+    parser.add_argument("--excel-rows", type=int, nargs="+", default=[1000, 20000], help="Rows in the synthetic workbooks")
+    parser.add_argument("--pdf-pages", type=int, nargs="+", default=[10, 300], help="Pages in the synthetic PDFs")
+    parser.add_argument("--pdf-table-pages", type=int, nargs="+", default=[10, 100],
+                        help="Pages in the synthetic PDFs chunked with table extraction")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results to --baseline instead of comparing")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="Relative slowdown (or memory growth) reported as a regression")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    cases = {}
+    for rows in args.rows:
+        print(f"--- api rows={rows} ---", flush=True)
+        cases[f"api/rows={rows}"] = run_case(api_case, rows, args.requests, args.max_seconds)
+    print("--- proxy ---", flush=True)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cases["proxy"] = run_case(proxy_case, args.requests, cache_dir)
+    for kind, sizes in (("excel", args.excel_rows), ("pdf", args.pdf_pages), ("pdf-tables", args.pdf_table_pages)):
+        for size in sizes:
+            label = f"{kind}/{'rows' if kind == 'excel' else 'pages'}={size}"
+            print(f"--- {label} ---", flush=True)
+            with tempfile.TemporaryDirectory() as work_dir:
+                cases[label] = run_case(document_case, kind, size, work_dir)
+
+    results = {
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count()},
+        "cases": cases,
+    }
+
+    print(f"\n{'case':<48} {'p50 ms':>9} {'p99 ms':>9} {'req/s':>9} {'rss MB':>8}")
+    for label, case in cases.items():
+        if "patterns" in case:
+            for name, r in case["patterns"].items():
+                print(f"{label + ' ' + name:<48} {r['p50_ms']:>9.2f} {r['p99_ms']:>9.2f} {r['rps']:>9.1f} {case['peak_rss_mb']:>8.0f}")
+        else:
+            rate = case.get("rows_per_s", case.get("pages_per_s"))
+            print(f"{label:<48} {case['seconds']:>8.2f}s {rate:>9.0f}/s {case['chunks']:>7} chunks {case['peak_rss_mb']:>8.0f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n--- Saved baseline to {args.baseline} ---")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\n--- No baseline at {args.baseline}; run with --save-baseline to record one. ---")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    comparison = compare(results, baseline, args.tolerance)
+    regressions = [row for row in comparison if row[5]]
+    print(f"\n--- Compared {len(comparison)} metrics with the baseline from {baseline.get('created_at')} "
+          f"(tolerance {args.tolerance:.0%}) ---")
+    for case, metric, value, old, change, _ in regressions:
+        label = "slower" if metric in ADVISORY_METRICS else "REGRESSION"
+        print(f"  -> {label} {case} {metric}: {old:.2f} -> {value:.2f} ({change:+.0%})")
+    if any(row[1] not in ADVISORY_METRICS for row in regressions):
+        return 1
+    print("  -> No regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
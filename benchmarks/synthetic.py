@@ -0,0 +1,169 @@
+import os
+import random
+import sys
+
+import pandas as pd
+
+# Make the API modules in app/ importable from the benchmark scripts.
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+# ...and the chunker in scripts/.
+SCRIPTS_DIR = os.path.join(os.path.dirname(APP_DIR), "scripts")
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
+
+# --- Synthetic data shaped like the 'Open VA Data APIs' spreadsheet ---
+CATEGORIES = ["Demographics", "Benefits & Claims", "Health", "Facilities", "Education",
+              "Employment", "Housing", "Expenditures", "Population", "War-Era Data"]
+SOURCES = ["VA", "Census Bureau", "BLS", "HUD"]
+DATASET_PREFIXES = ["acs/acs1", "acs/acs5", "cbp", "dec/pl", "pep/population", "ecnbasic",
+                    "timeseries/eits", "abscs", "nonemp", "zbp"]
+DATASET_TYPES = ["Annual", "Survey", "Monthly", "Decennial", "Timeseries"]
+WORDS = ["veteran", "population", "county", "state", "income", "poverty", "employment",
+         "payroll", "business", "housing", "disability", "claims", "education", "health"]
+
+
+def api_name_and_path(rows, seed=0):
+    """
+    Returns a DataFrame with the columns of the 'API Name and Path' sheet.
+    """
+    rng = random.Random(seed)
+    return pd.DataFrame({
+        "Categorization": [rng.choice(CATEGORIES) for _ in range(rows)],
+        "Source": [rng.choice(SOURCES) for _ in range(rows)],
+        "Dataset / Table Name": [f"{rng.choice(['VetPop', 'COVID-19', 'Disability Claims', 'GI Bill'])} {i}" for i in range(rows)],
+        "API Path": [f"/dataset_{i}" for i in range(rows)],
+        "operationId": [f"getDataset{i}" for i in range(rows)],
+        "Description / Summary": [" ".join(rng.choices(WORDS, k=8)) for _ in range(rows)],
+    }).astype({"Categorization": "category", "Source": "category"})
+
+
+def census_full_list(rows, seed=0):
+    """
+    Returns a DataFrame with the columns of the 'Census Bureau APIs - Full List' sheet.
+    """
+    rng = random.Random(seed)
+    years = [rng.randint(1986, 2023) for _ in range(rows)]
+    datasets = [rng.choice(DATASET_PREFIXES) for _ in range(rows)]
+    return pd.DataFrame({
+        "Dataset Name": [f"{d.split('/')[-1]} {' '.join(rng.choices(WORDS, k=3))}" for d in datasets],
+        "Dataset Type": [rng.choice(DATASET_TYPES) for _ in range(rows)],
+        "Geography List": [f"https://api.census.gov/data/{y}/{d}/geography.html" for y, d in zip(years, datasets)],
+        "Variable List": [f"https://api.census.gov/data/{y}/{d}/variables.html" for y, d in zip(years, datasets)],
+        "Group List": [f"https://api.census.gov/data/{y}/{d}/groups.html" for y, d in zip(years, datasets)],
+        "SortList": ["" for _ in range(rows)],
+        "Examples": [f"https://api.census.gov/data/{y}/{d}/examples.html" for y, d in zip(years, datasets)],
+        "Developer Documentation": [f"https://www.census.gov/data/developers/data-sets/{d.split('/')[0]}.html" for d in datasets],
+        "API Base URL": [f"https://api.census.gov/data/{y}/{d}" for y, d in zip(years, datasets)],
+    }).astype({"Dataset Type": "category"})
+
+
+def small_sheet(rows, seed=0):
+    """
+    Returns a generic two-column DataFrame for the smaller, unindexed worksheets.
+    """
+    rng = random.Random(seed)
+    return pd.DataFrame({
+        "Name": [f"Item {i}" for i in range(rows)],
+        "Notes": [" ".join(rng.choices(WORDS, k=6)) for _ in range(rows)],
+    })
+
+
+def excel_sheet(rows, seed=0):
+    """
+    Returns a DataFrame shaped like a sheet of one of the chunker's Excel inputs, as
+    `pd.read_excel` returns it: ints, floats with blanks (NaN), dates, and text columns
+    with repeated and unique values.
+    """
+    rng = random.Random(seed)
+    return pd.DataFrame({
+        "ID": range(1, rows + 1),
+        "Fiscal Year": [rng.randint(2000, 2024) for _ in range(rows)],
+        "Station": [f"VAMC {rng.randint(1, 170):03d}" for _ in range(rows)],
+        "Category": [rng.choice(CATEGORIES) for _ in range(rows)],
+        "Amount": [round(rng.uniform(0, 10 ** rng.randint(2, 8)), 2) if rng.random() > 0.05 else float("nan")
+                   for _ in range(rows)],
+        "Report Date": pd.to_datetime([f"20{rng.randint(10, 24)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+                                       for _ in range(rows)]),
+        "Notes": [" ".join(rng.choices(WORDS, k=rng.randint(0, 12))) or float("nan") for _ in range(rows)],
+    })
+
+
+def make_frames(rows, seed=0):
+    """
+    Builds all five worksheets. `rows` sizes the two large sheets; the 'API Name and Path'
+    sheet gets a tenth of that (it is much smaller in the real spreadsheet).
+
+    Returns:
+        A dictionary of worksheet name -> DataFrame, like the API's loader returns.
+    """
+    return {
+        "API Name and Path": api_name_and_path(max(1, rows // 10), seed),
+        "VA Data Census Bureau APIs": small_sheet(50, seed),
+        "Census Bureau APIs - Full List": census_full_list(rows, seed),
+        "VISTA Custom GPT Actions": small_sheet(20, seed),
+        "Utilities": small_sheet(10, seed),
+    }
+
+
+def write_snapshot(rows, snapshot_dir, seed=0):
+    """
+    Saves a synthetic snapshot with `snapshot_store`, so the API can be started with
+    SHEETS_OFFLINE=1 SNAPSHOT_DIR=<snapshot_dir> and no Google credentials.
+
+    Returns:
+        The snapshot version name.
+    """
+    import snapshot_store
+
+    return snapshot_store.save_snapshot(make_frames(rows, seed), snapshot_dir)
+
+
+def write_workbook(path, rows, seed=0):
+    """
+    Writes a synthetic Excel workbook for the chunker: one large sheet of `excel_sheet`
+    rows and a small notes sheet.
+    """
+    with pd.ExcelWriter(path) as writer:
+        excel_sheet(rows, seed).to_excel(writer, sheet_name="Data", index=False)
+        small_sheet(20, seed).to_excel(writer, sheet_name="Notes", index=False)
+
+
+def write_pdf(path, pages, seed=0, tables=False):
+    """
+    Writes a synthetic text PDF for the chunker, with a few paragraphs of report-like
+    text on every page and, with `tables`, a ruled budget table under them.
+    """
+    import fitz
+
+    rng = random.Random(seed)
+    with fitz.open() as doc:
+        for page_num in range(pages):
+            page = doc.new_page()
+            paragraphs = []
+            for _ in range(4):
+                lines = [" ".join(rng.choices(WORDS, k=10)) for _ in range(8)]
+                paragraphs.append("\n".join(lines))
+            page.insert_text((50, 60), f"Page {page_num + 1}\n\n" + "\n\n".join(paragraphs), fontsize=9)
+            if tables:
+                _draw_budget_table(page, rng, top=540)
+        doc.save(path)
+
+
+def _draw_budget_table(page, rng, top, rows=18):
+    # A grid of program names and dollar amounts, like the PAR reports' budget tables.
+    import fitz
+
+    widths = [170, 90, 90, 90, 70]
+    cells = [["Program", "FY 2022 Actual", "FY 2023 Enacted", "FY 2024 Request", "Change"]]
+    for _ in range(rows):
+        amounts = [rng.randint(1000, 900000) for _ in range(3)]
+        cells.append([f"{rng.choice(CATEGORIES)} {rng.choice(WORDS)}"] + [f"{a:,}" for a in amounts]
+                     + [f"{(amounts[2] - amounts[1]) / amounts[1]:+.1%}"])
+    for r, row in enumerate(cells):
+        x = 40
+        for width, text in zip(widths, row):
+            page.draw_rect(fitz.Rect(x, top + 14 * r, x + width, top + 14 * (r + 1)), color=(0, 0, 0), width=0.5)
+            page.insert_text((x + 2, top + 14 * r + 10), text, fontsize=7)
+            x += width
@@ -0,0 +1,117 @@
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+# --- Local stand-in for the Census / VA APIs ---
+# Answers every GET with a Census-style JSON table (a header row followed by data rows)
+# after a fixed delay, and counts the requests it received, so the '/proxy' route's
+# caching and request coalescing can be exercised without network access:
+#
+#     python benchmarks/upstream_stub.py --port 8765 --delay 0.2
+#     PROXY_ALLOWED_HOSTS=127.0.0.1:8765 python app/app.py
+#     curl 'localhost:8080/proxy?url=http://127.0.0.1:8765/data/2019/acs/acs5&get=NAME&for=state:*'
+#
+# Paths under /status/<code> answer with that status (e.g. /status/400),
+# /slow/<seconds> waits that long before answering, and /redirect?to=<url> answers
+# with a 302 to that URL.
+
+
+class UpstreamStub:
+    """
+    A threaded HTTP server on 127.0.0.1, run in the background.
+
+    Expected Data:
+        - `port` (optional): Port to listen on; 0 picks a free one.
+        - `delay` (optional): Seconds to wait before each answer (upstream latency).
+        - `rows` (optional): Data rows in each JSON table.
+
+    Attributes:
+        host: 'host:port' of the running server, for PROXY_ALLOWED_HOSTS.
+        requests: Number of requests answered so far.
+    """
+
+    def __init__(self, port=0, delay=0.05, rows=52):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub._count()
+                parts = urlsplit(self.path)
+                segments = parts.path.strip("/").split("/")
+                status, wait = 200, stub.delay
+                if segments[0] == "status" and len(segments) > 1:
+                    status = int(segments[1])
+                elif segments[0] == "slow" and len(segments) > 1:
+                    wait = float(segments[1])
+                time.sleep(wait)
+                params = dict(parse_qsl(parts.query))
+                if segments[0] == "redirect":
+                    self.send_response(302)
+                    self.send_header("Location", params.get("to", "/"))
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                columns = params.get("get", "NAME").split(",") + ["state"]
+                table = [columns] + [[f"{column} {row}" for column in columns[:-1]] + [f"{row:02d}"]
+                                     for row in range(stub.rows)]
+                body = json.dumps(table if status == 200 else {"error": f"stub status {status}"}).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json;charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass # The client gave up (e.g. a proxy timeout).
+
+            def log_message(self, format, *args):
+                pass
+
+        self.delay = delay
+        self.rows = rows
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._server.daemon_threads = True
+        self.host = f"127.0.0.1:{self._server.server_address[1]}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def _count(self):
+        with self._lock:
+            self.requests += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve Census-style JSON tables for testing '/proxy'.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.2, help="Seconds before each answer")
+    parser.add_argument("--rows", type=int, default=52, help="Data rows per table")
+    args = parser.parse_args()
+    with UpstreamStub(args.port, args.delay, args.rows) as stub:
+        print(f"--- Upstream stub listening on {stub.host} (PROXY_ALLOWED_HOSTS={stub.host}) ---")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            print(f"  -> Answered {stub.requests} requests.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import json
+from datetime import datetime, timezone
+
+# --- Incremental chunker runs ---
+# The manifest records, for every input file the chunker has processed, which version
+# of that file it saw (GCS generation and MD5 hash), which chunker version processed it,
+# and which output parts it produced. It is stored next to the outputs, so a later run
+# against the same output folder can skip unchanged inputs, reprocess changed ones and
+# delete the parts of inputs that no longer exist.
+
+MANIFEST_NAME = "chunker_manifest.json"
+
+
+def _manifest_blob(bucket, prefix):
+    name = f"{prefix.rstrip('/')}/{MANIFEST_NAME}" if prefix else MANIFEST_NAME
+    return bucket.blob(name)
+
+
+def load_manifest(bucket, prefix):
+    """
+    Reads the manifest stored under `prefix` in the output bucket.
+
+    Returns:
+        A dictionary of input blob name -> entry. Empty if there is no manifest yet
+        or it cannot be read (everything is then treated as new).
+    """
+    blob = _manifest_blob(bucket, prefix)
+    try:
+        if not blob.exists():
+            return {}
+        data = json.loads(blob.download_as_bytes())
+    except Exception as e:
+        print(f"  -> WARNING: Could not read chunker manifest, processing all files: {e}")
+        return {}
+    return data.get("inputs", {})
+
+
+def save_manifest(bucket, prefix, entries, chunker_version):
+    """Writes the manifest (input blob name -> entry) under `prefix` in the output bucket."""
+    data = {
+        "chunker_version": chunker_version,
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+        "inputs": dict(sorted(entries.items())),
+    }
+    _manifest_blob(bucket, prefix).upload_from_string(json.dumps(data, indent=2), content_type="application/json")
+
+
+def delete_manifest(bucket, prefix):
+    """Removes the manifest, e.g. after the outputs it describes were deleted."""
+    blob = _manifest_blob(bucket, prefix)
+    if blob.exists():
+        blob.delete()
+
+
+def is_up_to_date(entry, blob, chunker_version):
+    """
+    Checks whether an input blob still matches its manifest entry.
+
+    The generation changes on every upload; the MD5 hash only when the content does,
+    so a re-upload of an identical file is still up to date.
+
+    Returns:
+        True if the blob was processed successfully by this chunker version and has not
+        changed since.
+    """
+    if not entry or entry.get("chunker_version") != chunker_version:
+        return False
+    if entry.get("generation") == str(blob.generation):
+        return True
+    md5_hash = blob.md5_hash
+    return bool(md5_hash) and md5_hash == entry.get("md5_hash")
+
+
+def make_entry(blob, outputs, chunker_version):
+    """
+    Builds the manifest entry for an input blob that was just processed.
+
+    Expected Data:
+        - `outputs`: The output blob names the file produced.
+        - `chunker_version`: The version that processed it, or None if processing
+          failed; such an entry never counts as up to date, so the file is retried
+          on the next run.
+
+    Returns:
+        The entry dictionary.
+    """
+    return {
+        "generation": str(blob.generation),
+        "md5_hash": blob.md5_hash,
+        "size": blob.size,
+        "chunker_version": chunker_version,
+        "outputs": sorted(outputs),
+        "processed_at": datetime.now(timezone.utc).isoformat(),
+    }
@@ -0,0 +1,140 @@
+import base64
+import hashlib
+import os
+import shutil
+
+# --- Storage backends for the chunker ---
+# The chunker only needs a small part of the google.cloud.storage API: a bucket with
+# `name`, `blob(name)` and `list_blobs(prefix=...)`, and blobs with `name`, `generation`,
+# `md5_hash`, `download_to_filename()`, `upload_from_string()` and `delete()`. `open_bucket()` returns
+# either a real GCS bucket (for gs:// URIs) or a LocalBucket that implements the same
+# subset on top of a local directory, so the whole pipeline can run without GCS.
+
+_gcs_client = None
+
+
+def _get_gcs_client():
+    # Created on first use, so local runs never need Google credentials.
+    global _gcs_client
+    if _gcs_client is None:
+        from google.cloud import storage
+        _gcs_client = storage.Client()
+    return _gcs_client
+
+
+class LocalBlob:
+    """
+    A file inside a LocalBucket, with the subset of `google.cloud.storage.Blob`
+    methods the chunker uses.
+    """
+
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+
+    @property
+    def path(self):
+        return os.path.join(self.bucket.root, *self.name.split("/"))
+
+    @property
+    def size(self):
+        return os.path.getsize(self.path) if os.path.exists(self.path) else None
+
+    @property
+    def generation(self):
+        # GCS bumps a blob's generation on every write; the file's mtime plays that role here.
+        return os.stat(self.path).st_mtime_ns if os.path.exists(self.path) else None
+
+    @property
+    def md5_hash(self):
+        # Base64-encoded MD5 of the content, in the same format GCS reports.
+        if not os.path.exists(self.path):
+            return None
+        digest = hashlib.md5()
+        with open(self.path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return base64.b64encode(digest.digest()).decode("ascii")
+
+    def exists(self):
+        return os.path.isfile(self.path)
+
+    def download_to_filename(self, filename):
+        shutil.copyfile(self.path, filename)
+
+    def download_as_bytes(self):
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def upload_from_string(self, data, content_type=None):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Write to a temporary file and rename, so readers never see partial files.
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+    def upload_from_filename(self, filename, content_type=None):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        shutil.copyfile(filename, self.path)
+
+    def delete(self):
+        os.remove(self.path)
+
+
+class LocalBucket:
+    """
+    A local directory that behaves like a `google.cloud.storage.Bucket` for the chunker.
+    Blob names are '/'-separated paths relative to `root`.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.name = self.root
+
+    def blob(self, name):
+        return LocalBlob(self, name)
+
+    def list_blobs(self, prefix=""):
+        blobs = []
+        if not os.path.isdir(self.root):
+            return blobs
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith(".tmp"):
+                    continue
+                rel = os.path.relpath(os.path.join(dirpath, filename), self.root).replace(os.sep, "/")
+                if rel.startswith(prefix):
+                    blobs.append(LocalBlob(self, rel))
+        return sorted(blobs, key=lambda blob: blob.name)
+
+
+def split_uri(uri):
+    """
+    Splits a storage URI into (scheme, bucket or root, prefix).
+
+    - 'gs://bucket/some/prefix' -> ('gs', 'bucket', 'some/prefix')
+    - 'file:///data/in' or '/data/in' -> ('file', '/data/in', '')
+    """
+    if uri.startswith("gs://"):
+        parts = uri[len("gs://"):].split("/")
+        return "gs", parts[0], "/".join(parts[1:])
+    if uri.startswith("file://"):
+        uri = uri[len("file://"):]
+    return "file", uri, ""
+
+
+def open_bucket(uri):
+    """
+    Opens the bucket behind a storage URI.
+
+    Returns:
+        A (bucket, prefix) tuple. For gs:// URIs the bucket is a real
+        `google.cloud.storage.Bucket`; for local paths it is a LocalBucket.
+    """
+    scheme, location, prefix = split_uri(uri)
+    if scheme == "gs":
+        return _get_gcs_client().bucket(location), prefix
+    return LocalBucket(location), prefix
@@ -1,32 +1,83 @@
 import os
 import argparse
+import datetime
+import io
+import queue
 import shutil
+import tempfile
+import threading
+import zipfile
+from collections import deque, namedtuple
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from dotenv import load_dotenv
-from google.cloud import storage
+import numpy as np
 import pandas as pd
+import tabulate
 import fitz # PyMuPDF for PDF processing
+import requests
+
+from chunk_manifest import delete_manifest, is_up_to_date, load_manifest, make_entry, save_manifest
+from chunk_storage import open_bucket
 
 # Load .env variables from the environment where the script is run
 load_dotenv()
 
-# Get GCS paths from environment variables, with defaults
+# Get GCS paths from environment variables, with defaults.
+# Local directories (or file:// URIs) also work, which is handy for testing without GCS.
 XLS_INPUT_FOLDER = os.getenv("XLS_INPUT_FOLDER", "gs://vista-api-backend-rag-files")
 TXT_OUTPUT_FOLDER = os.getenv("TXT_OUTPUT_FOLDER", "gs://vista-processed-markdowns")
 
-# Initialize GCS client
-storage_client = storage.Client()
+# Number of parallel parse/chunk worker processes (override with --workers).
+CHUNKER_WORKERS = int(os.getenv("CHUNKER_WORKERS", os.cpu_count() or 1))
 
 # This is a hard limit in bytes. 2MB to be safe for Vertex AI.
 MAX_BYTES = 2000000
 
+# Recorded in the run manifest for every processed file. Bump it whenever the chunk
+# output changes, so the next run reprocesses every input.
+CHUNKER_VERSION = "4"
+
+# PDF chunking: bytes of the previous chunk repeated at the start of the next one (0 = no
+# overlap), and when/how a single large PDF is extracted across worker processes. Page
+# workers are only used when files are processed one at a time (--workers 1); pipeline
+# workers extract their PDFs' pages themselves.
+PDF_CHUNK_OVERLAP_BYTES = int(os.getenv("PDF_CHUNK_OVERLAP_BYTES", 0))
+PDF_PAGE_WORKERS = int(os.getenv("PDF_PAGE_WORKERS", CHUNKER_WORKERS))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", 200))
+PDF_PAGES_PER_TASK = 25
+
+# PDF_EXTRACT_TABLES=1 extracts PDFs with PyMuPDF's table detection instead of as plain
+# text: tables (such as the budget tables in the Performance & Accountability Reports)
+# become markdown tables, split into row ranges with the Excel path's sizing, and the
+# text around them is kept in reading order. Table detection takes around 100 ms
+# per table page, so such PDFs are spread over the page workers from a much lower page count.
+PDF_EXTRACT_TABLES = os.getenv("PDF_EXTRACT_TABLES", "0") == "1"
+PDF_TABLES_PARALLEL_MIN_PAGES = int(os.getenv("PDF_TABLES_PARALLEL_MIN_PAGES", 16))
+PDF_TABLE_PAGES_PER_TASK = 4
+# Bytes reserved in each table piece for its caption line.
+TABLE_CAPTION_BYTES = 64
+if PDF_EXTRACT_TABLES:
+    # The PDF chunks differ between the modes, so switching reprocesses every input.
+    CHUNKER_VERSION += "+tables"
+
+# ZIP pipeline mode (--zip): downloaded archives stay in memory up to this size, and
+# spill over to a temporary file beyond it.
+ZIP_SPOOL_MAX_BYTES = int(os.getenv("ZIP_SPOOL_MAX_BYTES", 256 * 1024 * 1024))
+SUPPORTED_EXTENSIONS = (".xlsx", ".xls", ".pdf")
+
 # --- Helper function to write a DataFrame chunk to a GCS text file ---
 def write_gcs_chunk_to_file(df_chunk, original_filename_base, sheet_name, part_num, output_bucket, output_prefix):
     """
     Helper function to write a DataFrame chunk to a GCS text file.
     It sanitizes sheet names and constructs the GCS blob path.
+
+    Returns:
+        The name of the uploaded blob, or None if the chunk was empty.
     """
     if df_chunk.empty:
-        return
+        return None
 
     # Sanitize sheet name to be a valid filename part for GCS blob name
     # Removes non-alphanumeric characters except spaces and underscores, then strips trailing whitespace.
@@ -44,49 +95,510 @@ def write_gcs_chunk_to_file(df_chunk, original_filename_base, sheet_name, part_n
     output_blob = output_bucket.blob(output_blob_name)
     output_blob.upload_from_string(markdown_content)
     print(f"  -> Uploaded Excel chunk part {part_num} for sheet '{sheet_name}' to {output_blob_name} ({len(markdown_content.encode('utf-8'))} bytes) in {output_bucket.name}")
+    return output_blob_name
 
-# --- PDF Processing Function ---
-def process_pdf_document(temp_pdf_path, output_bucket, output_prefix, original_filename):
+# --- PDF Text Chunking ---
+def _page_text(page):
+    """The plain text of one PDF page."""
+    return page.get_text()
+
+def _page_blocks(page):
     """
-    Processes PDF documents by extracting all text and uploading it to GCS.
-    Note: For very large PDFs, this function currently uploads the entire text as one chunk.
-    More sophisticated NLP-based chunking would be required for optimal results with extremely large PDFs.
+    Extracts one PDF page as a list of blocks in reading order: text (str) outside any
+    table, and (header, rows) tuples for the tables PyMuPDF detects on the page.
     """
-    print(f"  -> Processing PDF: {original_filename}")
-    try:
-        doc = fitz.open(temp_pdf_path)
-        full_text = ""
-        for page_num in range(doc.page_count):
-            page = doc.load_page(page_num)
-            full_text += page.get_text() + "\n" # Extract text from each page
+    # Tables are found from the page's ruling lines and cell borders, so a page without
+    # vector graphics has none, and detection only needs the area they cover. Reading
+    # every character of the page dominates its cost otherwise.
+    drawn = [drawing["rect"] for drawing in page.get_cdrawings()]
+    tables = []
+    if drawn:
+        area = fitz.Rect(min(r[0] for r in drawn), min(r[1] for r in drawn),
+                         max(r[2] for r in drawn), max(r[3] for r in drawn)) + (-1, -1, 1, 1)
+        tables = page.find_tables(clip=area).tables
+    items = []
+    for table in tables:
+        rows = [[" ".join((cell or "").split()) for cell in row] for row in table.extract()]
+        # Unless the header sits above the table's cells, it is the first extracted row.
+        if not table.header.external and rows:
+            rows = rows[1:]
+        header = [" ".join((name or "").split()) or f"Column {i + 1}" for i, name in enumerate(table.header.names)]
+        x0, y0, _, _ = table.bbox
+        items.append((y0, x0, (header, rows)))
 
-        if not full_text.strip():
-            print(f"  -> WARNING: No readable text found in PDF: {original_filename}")
+    table_rects = [fitz.Rect(table.bbox) for table in tables]
+    for x0, y0, x1, y1, text, _, block_type in page.get_text("blocks"):
+        if block_type != 0: # Image blocks
+            continue
+        center = fitz.Point((x0 + x1) / 2, (y0 + y1) / 2)
+        if any(center in rect for rect in table_rects):
+            continue # Already part of a table
+        items.append((y0, x0, text))
+
+    items.sort(key=lambda item: (item[0], item[1]))
+    return [block for _, _, block in items]
+
+def _extract_page_range(pdf_path, start, stop, read_page=_page_text):
+    """Reads pages [start, stop) of a PDF with `read_page`. Runs in a worker process for large PDFs."""
+    with fitz.open(pdf_path) as doc:
+        return [read_page(doc.load_page(page_num)) for page_num in range(start, stop)]
+
+def iter_pdf_pages(pdf_path, read_page, page_workers=None, parallel_min_pages=PDF_PARALLEL_MIN_PAGES,
+                   pages_per_task=PDF_PAGES_PER_TASK):
+    """
+    Yields `read_page(page)` for each page of a PDF, in page order, one page at a time.
+
+    PDFs with at least `parallel_min_pages` pages are read in ranges of `pages_per_task`
+    pages across a pool of `page_workers` processes (`read_page` must then be a
+    module-level function). Only a few ranges are read ahead of the consumer, so memory
+    stays bounded however long the document is.
+
+    `pdf_path` may also be a binary file object (e.g. a ZIP archive member); such
+    in-memory documents are always read in this process.
+    """
+    if page_workers is None:
+        page_workers = PDF_PAGE_WORKERS
+
+    if not isinstance(pdf_path, (str, os.PathLike)):
+        with fitz.open(stream=pdf_path.read(), filetype="pdf") as doc:
+            for page_num in range(doc.page_count):
+                yield read_page(doc.load_page(page_num))
+        return
+
+    with fitz.open(pdf_path) as doc:
+        page_count = doc.page_count
+        if page_workers <= 1 or page_count < parallel_min_pages:
+            for page_num in range(page_count):
+                yield read_page(doc.load_page(page_num))
             return
 
+    print(f"  -> Extracting {page_count} pages with {page_workers} worker processes")
+    with ProcessPoolExecutor(max_workers=page_workers) as pool:
+        pending = deque()
+        for start in range(0, page_count, pages_per_task):
+            stop = min(start + pages_per_task, page_count)
+            pending.append(pool.submit(_extract_page_range, pdf_path, start, stop, read_page))
+            # Keep at most two ranges per worker in flight.
+            if len(pending) >= 2 * page_workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+def iter_pdf_page_texts(pdf_path, page_workers=None):
+    """
+    Yields the text of each page of a PDF, in page order, one page at a time.
+
+    PDFs with at least PDF_PARALLEL_MIN_PAGES pages (the Performance & Accountability
+    Reports, for example) are extracted in ranges of PDF_PAGES_PER_TASK pages across a
+    pool of `page_workers` processes (see iter_pdf_pages).
+    """
+    return iter_pdf_pages(pdf_path, _page_text, page_workers)
+
+def iter_pdf_markdown(pdf_path, max_bytes=MAX_BYTES, page_workers=None):
+    """
+    Yields a PDF as markdown pieces, in reading order: the text between tables, and
+    each table as a pipe table under a '**Table <n> (page <p>)**' caption.
+
+    Tables are split into row ranges with iter_sheet_chunks, exactly like Excel sheets,
+    so every piece stays within `max_bytes` and iter_text_chunks keeps it whole; each
+    part of a split table repeats the header row. Pages are extracted across the page
+    workers from PDF_TABLES_PARALLEL_MIN_PAGES pages on.
+    """
+    table_num = 0
+    pages = iter_pdf_pages(pdf_path, _page_blocks, page_workers,
+                           PDF_TABLES_PARALLEL_MIN_PAGES, PDF_TABLE_PAGES_PER_TASK)
+    for page_num, blocks in enumerate(pages, start=1):
+        for block in blocks:
+            if isinstance(block, str):
+                yield block
+                continue
+            table_num += 1
+            header, rows = block
+            df = pd.DataFrame(rows, columns=header)
+            # Leave room for the caption and the newlines around each part.
+            parts = list(iter_sheet_chunks(df, max(1, max_bytes - TABLE_CAPTION_BYTES))) if rows else [df]
+            for part_num, part_df in enumerate(parts, start=1):
+                part = f", part {part_num}" if len(parts) > 1 else ""
+                yield f"\n**Table {table_num} (page {page_num}{part})**\n\n" + part_df.to_markdown(index=False) + "\n\n"
+        # Page break, as in the plain text output.
+        yield "\n"
+
+def _split_text(text, limit, separators=("\n\n", "\n")):
+    """
+    Yields consecutive pieces of `text` that are each at most `limit` bytes (UTF-8),
+    splitting on paragraph breaks first, then on line breaks, and only as a last resort
+    in the middle of a line (on a character boundary).
+    """
+    data = text.encode('utf-8')
+    if len(data) <= limit:
+        yield text
+        return
+
+    if not separators:
+        start = 0
+        while start < len(data):
+            end = min(start + limit, len(data))
+            # Never cut inside a multi-byte character.
+            while end < len(data) and (data[end] & 0xC0) == 0x80:
+                end -= 1
+            yield data[start:end].decode('utf-8')
+            start = end
+        return
+
+    separator = separators[0]
+    units = text.split(separator)
+    for i, unit in enumerate(units):
+        if i < len(units) - 1:
+            unit += separator
+        if unit:
+            yield from _split_text(unit, limit, separators[1:])
+
+def _overlap_tail(chunk, overlap_bytes):
+    """Returns the last `overlap_bytes` (at most) of a chunk, starting at a line boundary if there is one."""
+    if overlap_bytes <= 0:
+        return ""
+    tail = chunk.encode('utf-8')[-overlap_bytes:].decode('utf-8', errors='ignore')
+    line_start = tail.find("\n")
+    if 0 <= line_start < len(tail) - 1:
+        tail = tail[line_start + 1:]
+    return tail
+
+def iter_text_chunks(pieces, max_bytes=MAX_BYTES, overlap_bytes=None):
+    """
+    Packs a stream of text pieces (e.g. page texts) into chunks of at most `max_bytes`
+    (UTF-8), yielding each chunk as soon as it is full.
+
+    - Pieces are kept whole when they fit, so chunks end on page boundaries.
+    - A piece that is too large on its own is split on paragraph, then line boundaries.
+    - With `overlap_bytes`, each chunk starts with the last lines (up to that many
+      bytes) of the previous chunk, so text cut at a boundary keeps some context.
+
+    Only the chunk being built is held in memory.
+    """
+    if overlap_bytes is None:
+        overlap_bytes = PDF_CHUNK_OVERLAP_BYTES
+    # The overlap must leave room for new text in every chunk.
+    overlap_bytes = max(0, min(overlap_bytes, max_bytes // 2))
+    piece_limit = max_bytes - overlap_bytes
+
+    parts = []
+    size = 0
+    has_new_text = False # Whether `parts` holds more than the previous chunk's overlap
+    for piece in pieces:
+        for part in _split_text(piece, piece_limit):
+            part_size = len(part.encode('utf-8'))
+            if has_new_text and size + part_size > max_bytes:
+                chunk = "".join(parts)
+                yield chunk
+                tail = _overlap_tail(chunk, overlap_bytes)
+                parts = [tail] if tail else []
+                size = len(tail.encode('utf-8'))
+                has_new_text = False
+            parts.append(part)
+            size += part_size
+            has_new_text = True
+    if has_new_text:
+        yield "".join(parts)
+
+# --- PDF Processing Function ---
+def process_pdf_document(temp_pdf_path, output_bucket, output_prefix, original_filename, extract_tables=None,
+                         page_workers=None):
+    """
+    Processes PDF documents page by page, streaming the extracted text into chunks of at
+    most MAX_BYTES (see iter_text_chunks) and uploading each chunk as soon as it is
+    complete. Chunks are written as `<name>_full_text_chunk_<n>.txt`; a PDF that fits in
+    one chunk produces the same single `_full_text_chunk_1.txt` file as before.
+
+    With `extract_tables` (PDF_EXTRACT_TABLES by default), tables are detected locally
+    and written as markdown tables instead of flattened text (see iter_pdf_markdown).
+    `page_workers` (PDF_PAGE_WORKERS by default) sizes the page pool for large PDFs;
+    pipeline workers pass 1, since they already run one per CPU.
+
+    Returns:
+        The names of the uploaded blobs, or None if the PDF could not be processed.
+    """
+    print(f"  -> Processing PDF: {original_filename}")
+    outputs = []
+    try:
         # Derive base name for output files
         original_filename_base = os.path.splitext(original_filename)[0]
 
-        # Upload the entire PDF text as a single chunk (if it fits within Vertex AI limits)
-        chunk_content = full_text
-        output_filename = f"{original_filename_base}_full_text_chunk_1.txt" # Add chunk indicator
-        output_blob_name = os.path.join(output_prefix, output_filename)
+        if extract_tables is None:
+            extract_tables = PDF_EXTRACT_TABLES
+        if extract_tables:
+            # Table pieces must fit next to the overlap iter_text_chunks carries over.
+            overlap_bytes = max(0, min(PDF_CHUNK_OVERLAP_BYTES, MAX_BYTES // 2))
+            pieces = iter_pdf_markdown(temp_pdf_path, MAX_BYTES - overlap_bytes, page_workers)
+        else:
+            # Each page's text is followed by a newline, as in the original single-chunk output.
+            pieces = (text + "\n" for text in iter_pdf_page_texts(temp_pdf_path, page_workers))
+
+        chunk_num = 0
+        for chunk_content in iter_text_chunks(pieces):
+            if not chunk_content.strip():
+                continue
+            chunk_num += 1
+            output_filename = f"{original_filename_base}_full_text_chunk_{chunk_num}.txt" # Add chunk indicator
+            output_blob_name = os.path.join(output_prefix, output_filename)
+
+            output_blob = output_bucket.blob(output_blob_name)
+            output_blob.upload_from_string(chunk_content)
+            outputs.append(output_blob_name)
+            print(f"  -> Uploaded PDF chunk {chunk_num} to {output_blob_name} in {output_bucket.name} ({len(chunk_content.encode('utf-8'))} bytes)")
 
-        output_blob = output_bucket.blob(output_blob_name)
-        output_blob.upload_from_string(chunk_content)
-        print(f"  -> Uploaded PDF chunk to {output_blob_name} in {output_bucket.name} ({len(chunk_content.encode('utf-8'))} bytes)")
+        if chunk_num == 0:
+            print(f"  -> WARNING: No readable text found in PDF: {original_filename}")
 
     except Exception as e:
         print(f"  -> ERROR processing PDF {original_filename}: {e}")
+        return None
+    return outputs
+
+# --- EXCEL Chunk Sizing ---
+# Each row is budgeted at the size it would have as a one-row markdown table (header,
+# separator and row line), and rows are added to a chunk until the next one would push
+# the running total over MAX_BYTES. Rendering every row through pandas/tabulate made
+# this the slowest part of the chunker, so the sizes are computed column by column:
+# every distinct cell value is formatted once with tabulate's own type detection and
+# formatting rules, and the row sizes follow from the column widths with numpy.
+
+# Kinds of cell values in object columns. df.iterrows() turns every row into its own
+# Series, and the one-row table is its own DataFrame, so pandas re-infers dtypes per
+# row: a row of only strings and missing values becomes a string row (None turns into
+# NaN), a row of only dates and missing values becomes a datetime row, and a row of
+# only numbers is upcast to one numeric type (ints print as floats next to a float).
+# Such rows render differently from their individual cells, so they are sized (and
+# rebuilt) the slow, exact way; see _retyped_rows.
+(CELL_OTHER, CELL_STR, CELL_INT, CELL_FLOAT, CELL_BOOL,
+ CELL_DATETIME, CELL_MISSING, CELL_NAN) = range(8)
+
+def _cell_kind(value):
+    if isinstance(value, str):
+        return CELL_STR
+    if value is None or value is pd.NA:
+        return CELL_MISSING
+    if isinstance(value, (bool, np.bool_)):
+        return CELL_BOOL
+    if isinstance(value, (int, np.integer)):
+        return CELL_INT
+    if isinstance(value, (float, np.floating)):
+        return CELL_NAN if value != value else CELL_FLOAT
+    if value is pd.NaT or isinstance(value, (datetime.date, datetime.timedelta, np.datetime64, np.timedelta64)):
+        return CELL_DATETIME
+    return CELL_OTHER
+
+def _measure_cell(value):
+    """
+    Measures one cell as tabulate renders it on its own in a pipe table.
+
+    Returns:
+        A (width, simple, kind) tuple: the width tabulate pads the cell to, whether that
+        width can be used as-is, and the cell's kind (see _cell_kind). Cells that are not
+        plain printable ASCII (newlines switch tabulate into multiline mode, escape codes
+        and wide characters change how widths are measured) are not simple.
+    """
+    kind = _cell_kind(value)
+    if kind == CELL_STR and not (value.isascii() and value.isprintable()):
+        return 0, False, kind
+    column_type = tabulate._column_type([value])
+    text = tabulate._format(value, column_type, tabulate._DEFAULT_FLOATFMT, tabulate._DEFAULT_INTFMT, "", False)
+    # Numbers are decimal-aligned as they are; everything else is stripped first.
+    if column_type not in (int, float):
+        text = text.strip()
+    return len(text), text.isascii() and text.isprintable(), kind
+
+def _measure_column(column):
+    """
+    Measures every cell of one column of `DataFrame.values`, formatting each distinct
+    value only once.
+
+    Returns:
+        (widths, simple, kinds) arrays with one entry per row.
+    """
+    if column.dtype.kind == "f":
+        # Compare floats by their bits, so -0.0 and 0.0 are formatted separately.
+        codes, uniques = pd.factorize(column.view(np.int64))
+        measured = [_measure_cell(value) for value in uniques.view(np.float64)]
+    elif column.dtype != object or pd.api.types.infer_dtype(column, skipna=False) == "string":
+        codes, uniques = pd.factorize(column)
+        measured = [_measure_cell(value) for value in uniques]
+    else:
+        # Mixed object columns: 1, 1.0 and True compare equal but are formatted
+        # differently, so key on the type and repr as well.
+        positions = {}
+        measured = []
+        codes = np.empty(len(column), dtype=np.int64)
+        for i, value in enumerate(column):
+            key = value if type(value) is str else (type(value), repr(value))
+            code = positions.get(key)
+            if code is None:
+                code = positions[key] = len(measured)
+                measured.append(_measure_cell(value))
+            codes[i] = code
+
+    widths = np.array([width for width, _, _ in measured], dtype=np.int64)
+    simple = np.array([ok for _, ok, _ in measured], dtype=bool)
+    kinds = np.array([kind for _, _, kind in measured], dtype=np.int8)
+    return widths[codes], simple[codes], kinds[codes]
+
+def _retyped_rows(kinds_by_column):
+    """
+    Flags the rows pandas would re-type when handling them one at a time (see
+    CELL_OTHER and friends), given one kinds array per column of an object sheet.
+    Errs on the side of flagging: a flagged row is only handled more slowly.
+    """
+    present = {kind: np.logical_or.reduce([kinds == kind for kinds in kinds_by_column])
+               for kind in range(CELL_NAN + 1)}
+    numbers = present[CELL_INT] | present[CELL_FLOAT] | present[CELL_BOOL]
+
+    # Only strings, dates and missing values: string rows and datetime rows.
+    no_numbers = ~numbers & ~present[CELL_OTHER]
+    text_or_dates = no_numbers & (
+        (present[CELL_DATETIME] & ~present[CELL_STR]) |
+        (present[CELL_MISSING] & ~present[CELL_DATETIME]))
+
+    # Only numbers and NaN: one numeric dtype, unless they are all ints or all floats.
+    only_numbers = ~present[CELL_STR] & ~present[CELL_OTHER] & ~present[CELL_DATETIME] & ~present[CELL_MISSING]
+    all_ints = present[CELL_INT] & ~present[CELL_FLOAT] & ~present[CELL_NAN] & ~present[CELL_BOOL]
+    all_floats = ~present[CELL_INT] & ~present[CELL_BOOL]
+    upcast = only_numbers & ~all_ints & ~all_floats
+
+    return text_or_dates | upcast
+
+def _iterrows_row(values, columns):
+    """The row Series df.iterrows() yields for one row of `df.values`."""
+    return pd.Series(values, index=columns)
+
+def _render_row_size(values, columns):
+    """The size in bytes of one row rendered as its own markdown table (the slow, exact way)."""
+    row = _iterrows_row(values, columns)
+    return len(pd.DataFrame([row.values], columns=columns).to_markdown(index=False).encode('utf-8'))
+
+def _render_all_rows(values, columns):
+    # Sizes every row the slow, exact way; see _measure_sheet.
+    sizes = np.array([_render_row_size(row, columns) for row in values], dtype=np.int64)
+    return sizes, np.arange(len(values))
+
+def _measure_sheet(df):
+    """
+    Computes the markdown size of every row of `df` (see markdown_row_sizes).
+
+    The fast path measures cells with tabulate's own (private) column typing and cell
+    formatting helpers. If those are missing or have a different signature (tabulate
+    outside the range pinned in requirements.txt), every row is rendered instead, so
+    the workbook is still chunked, only more slowly.
+
+    Returns:
+        A (sizes, exact_rows) tuple: the int64 sizes, and the positions of the rows that
+        were sized by rendering them (including every row pandas re-types, which
+        iter_sheet_chunks must rebuild the same way).
+    """
+    values = df.values # The same (upcast) values df.iterrows() builds its rows from
+    columns = df.columns
+    headers = [str(column) for column in columns]
+
+    if values.dtype.kind in "mM" or not all(h.isascii() and h.isprintable() for h in headers):
+        # All-datetime sheets and unusual headers are rare enough to size the slow way.
+        return _render_all_rows(values, columns)
+
+    total_widths = np.zeros(len(values), dtype=np.int64)
+    simple_rows = np.ones(len(values), dtype=bool)
+    kinds_by_column = []
+    try:
+        for position, header in enumerate(headers):
+            widths, simple, kinds = _measure_column(values[:, position])
+            total_widths += np.maximum(widths, len(header) + 2)
+            simple_rows &= simple
+            kinds_by_column.append(kinds)
+    except (AttributeError, TypeError) as e:
+        print(f"    -> WARNING: Fast row sizing is not supported by this tabulate version ({e}); sizing rows one by one.")
+        return _render_all_rows(values, columns)
+    if values.dtype == object:
+        simple_rows &= ~_retyped_rows(kinds_by_column)
+
+    # Three lines of '|' + ' cell ' per column (joined by '|') + '|', and two newlines.
+    line_length = total_widths + 3 * len(headers) + 1
+    sizes = 3 * line_length + 2
+
+    exact_rows = np.flatnonzero(~simple_rows)
+    for row_index in exact_rows:
+        sizes[row_index] = _render_row_size(values[row_index], columns)
+
+    # Cross-check a few rows against the real renderer; if tabulate ever formats cells
+    # differently from the rules above, fall back to rendering every row.
+    for row_index in {0, len(values) - 1, int(np.argmax(sizes))}:
+        if sizes[row_index] != _render_row_size(values[row_index], columns):
+            print("    -> WARNING: Fast row sizing disagrees with tabulate; sizing rows one by one.")
+            return _render_all_rows(values, columns)
+    return sizes, exact_rows
+
+def markdown_row_sizes(df):
+    """
+    Computes the size in bytes of every row of `df` rendered as a one-row markdown
+    table, i.e. `len(pd.DataFrame([row.values], columns=df.columns).to_markdown(index=False).encode('utf-8'))`
+    for each row of `df.iterrows()`, without rendering the rows one by one.
+
+    A row rendered on its own is a header line, a separator line and the row line, all
+    with the same column widths (each column is as wide as its header plus two, or its
+    cell, whichever is wider), so its size only depends on the width of every cell.
+    Rows whose cells pandas or tabulate would treat specially are rendered for real.
+
+    Returns:
+        A numpy int64 array with one size per row.
+    """
+    sizes, _ = _measure_sheet(df)
+    return sizes
+
+def chunk_row_ranges(row_sizes, max_bytes=MAX_BYTES):
+    """
+    Splits rows into consecutive (start, end) ranges whose summed sizes stay within
+    `max_bytes`. A row that is larger than `max_bytes` on its own still forms its own
+    range instead of being skipped.
+
+    Returns:
+        A list of (start, end) row ranges, end exclusive.
+    """
+    cumulative = np.concatenate(([0], np.cumsum(row_sizes)))
+    ranges = []
+    start = 0
+    while start < len(row_sizes):
+        # The furthest end whose rows still fit, but always at least one row.
+        end = int(np.searchsorted(cumulative, cumulative[start] + max_bytes, side="right")) - 1
+        end = max(end, start + 1)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+def iter_sheet_chunks(df, max_bytes=MAX_BYTES):
+    """
+    Yields the DataFrame chunks of one sheet, in order, each sized to stay under
+    `max_bytes` as markdown (see markdown_row_sizes and chunk_row_ranges).
+
+    The chunks are rebuilt from the rows' values the same way the row-by-row chunker
+    rebuilt them from `row.to_dict()`, so pandas infers the same column types and the
+    markdown is byte-for-byte unchanged.
+    """
+    row_sizes, exact_rows = _measure_sheet(df)
+    values = df.values
+    records = values.astype(object)
+    for row_index in exact_rows:
+        # Boxed like row.to_dict() boxes them (Timestamps, NaN for missing strings, ...).
+        records[row_index] = _iterrows_row(values[row_index], df.columns).tolist()
+    for start, end in chunk_row_ranges(row_sizes, max_bytes):
+        yield pd.DataFrame(records[start:end].tolist(), columns=df.columns)
 
 # --- EXCEL Processing Function with Advanced Chunking ---
 def process_excel_document(temp_excel_path, output_bucket, output_prefix, original_filename):
     """
     Processes Excel documents sheet by sheet, implementing a row-by-row,
     byte-size-aware chunking strategy to keep output markdown files under MAX_BYTES.
+
+    Returns:
+        The names of the uploaded blobs, or None if the workbook could not be processed.
     """
     print(f"  -> Processing Excel: {original_filename}")
     original_filename_base = os.path.splitext(original_filename)[0] # Base name without extension
+    outputs = []
 
     try:
         xls = pd.ExcelFile(temp_excel_path)
@@ -97,56 +609,211 @@ def process_excel_document(temp_excel_path, output_bucket, output_prefix, origin
                 print(f"    -> Sheet '{sheet_name}' is empty. Skipping.")
                 continue
 
-            rows_for_chunk = []
-            current_chunk_size_bytes = 0
-            part_num = 1
-
-            # Iterate through rows and build chunks based on byte size
-            for index, row in df.iterrows():
-                # Convert the current row to markdown to estimate its size
-                temp_df_row = pd.DataFrame([row.values], columns=df.columns)
-                row_markdown = temp_df_row.to_markdown(index=False)
-                row_size_bytes = len(row_markdown.encode('utf-8'))
-
-                # If adding this row exceeds MAX_BYTES, write the current chunk
-                # and start a new one with the current row.
-                # 'current_chunk_size_bytes > 0' ensures that if the first row alone is
-                # larger than MAX_BYTES, it still forms its own chunk instead of being skipped.
-                if current_chunk_size_bytes > 0 and (current_chunk_size_bytes + row_size_bytes) > MAX_BYTES:
-                    chunk_df = pd.DataFrame(rows_for_chunk, columns=df.columns)
-                    write_gcs_chunk_to_file(chunk_df, original_filename_base, sheet_name, part_num, output_bucket, output_prefix)
-                    
-                    rows_for_chunk = [] # Reset for new chunk
-                    current_chunk_size_bytes = 0
-                    part_num += 1
-                
-                rows_for_chunk.append(row.to_dict()) # Convert row to dictionary for DataFrame reconstruction
-                current_chunk_size_bytes += row_size_bytes
-
-            # After the loop, write any remaining rows to a final part
-            if rows_for_chunk:
-                final_chunk_df = pd.DataFrame(rows_for_chunk, columns=df.columns)
-                write_gcs_chunk_to_file(final_chunk_df, original_filename_base, sheet_name, part_num, output_bucket, output_prefix)
+            # Row sizes are computed for the whole sheet at once, then each chunk is
+            # rendered to markdown once.
+            for part_num, chunk_df in enumerate(iter_sheet_chunks(df), start=1):
+                output_blob_name = write_gcs_chunk_to_file(chunk_df, original_filename_base, sheet_name, part_num, output_bucket, output_prefix)
+                if output_blob_name:
+                    outputs.append(output_blob_name)
 
     except Exception as e:
         print(f"  -> ERROR processing Excel {original_filename}: {e}")
+        return None
+    return outputs
 
 # --- Main File Dispatcher Function ---
-def process_files_from_gcs(input_uri, output_uri):
+def process_local_file(temp_input_path, output_bucket, output_prefix, original_filename, page_workers=None):
+    """
+    Dispatches one downloaded file to the appropriate processing function based on its type.
+    `temp_input_path` may also be a binary file object holding the file's content, and
+    `page_workers` is passed on to process_pdf_document.
+
+    Returns:
+        The names of the output blobs the file produced, or None if it failed.
+    """
+    if original_filename.lower().endswith((".xlsx", ".xls")):
+        return process_excel_document(temp_input_path, output_bucket, output_prefix, original_filename)
+    elif original_filename.lower().endswith(".pdf"):
+        return process_pdf_document(temp_input_path, output_bucket, output_prefix, original_filename,
+                                    page_workers=page_workers)
+    else:
+        # This case should ideally not be reached due to prior filtering
+        print(f"  -> INFO: Skipping unsupported file type after download: {original_filename}")
+        return []
+
+# Output buckets opened by each worker process, keyed by output URI.
+_worker_output_buckets = {}
+
+def _process_in_worker(temp_input_path, original_filename, output_uri):
+    """
+    Parse/chunk/upload stage, run inside a worker process. Each process opens its own
+    output bucket once, streams chunks to it, and removes the temporary input file.
+
+    Returns:
+        The output blob names (see process_local_file).
+    """
+    if output_uri not in _worker_output_buckets:
+        _worker_output_buckets[output_uri] = open_bucket(output_uri)
+    output_bucket, output_prefix = _worker_output_buckets[output_uri]
+    try:
+        # One page worker: the pipeline already runs a process per CPU, and a page pool
+        # in each of them would start up to CHUNKER_WORKERS squared processes.
+        return process_local_file(temp_input_path, output_bucket, output_prefix, original_filename, page_workers=1)
+    finally:
+        if os.path.exists(temp_input_path):
+            os.remove(temp_input_path)
+            print(f"  -> Cleaned up temporary file {temp_input_path}")
+
+def output_source_name(*paths):
+    """
+    Returns the name a file's output blobs are derived from: the path segments of
+    `paths` (e.g. an input's path below the input folder, or an archive and a member
+    path) joined by '__', so 'sub/big.pdf' becomes 'sub__big.pdf'. Same-named files in
+    different folders or archives therefore never write (or delete) each other's parts;
+    a file at the top of the input folder keeps its own name.
+    """
+    segments = [segment for path in paths for segment in path.replace("\\", "/").split("/") if segment]
+    return "__".join(segments)
+
+def _relative_input_name(blob_name, input_prefix):
+    """The output source name of an input blob (see output_source_name)."""
+    if input_prefix and blob_name.startswith(input_prefix):
+        blob_name = blob_name[len(input_prefix):]
+    return output_source_name(blob_name)
+
+def _download_stage(blob_queue, ready_queue, temp_dir, input_prefix=""):
+    """
+    Download stage, run in threads. Takes (index, blob) pairs from `blob_queue` and puts
+    (local path, original filename, blob name) tuples on `ready_queue`. The ready queue is bounded,
+    so downloads pause while the parse workers are behind (backpressure).
+    """
+    while True:
+        try:
+            index, blob = blob_queue.get_nowait()
+        except queue.Empty:
+            return
+        original_filename = _relative_input_name(blob.name, input_prefix)
+        # Prefix with the blob's position so files with the same name in different
+        # folders do not overwrite each other.
+        temp_input_path = os.path.join(temp_dir, f"{index}_{original_filename}")
+        try:
+            blob.download_to_filename(temp_input_path)
+            print(f"  -> Downloaded {original_filename} to {temp_input_path}")
+            ready_queue.put((temp_input_path, original_filename, blob.name))
+        except Exception as e:
+            print(f"  -> ERROR downloading file {original_filename}: {e}")
+            if os.path.exists(temp_input_path):
+                os.remove(temp_input_path)
+
+def run_pipeline(files_to_process, output_uri, workers, temp_dir, input_prefix=""):
+    """
+    Runs download -> parse/chunk -> upload as overlapping stages.
+
+    - `workers` download threads fetch blobs into `temp_dir`.
+    - At most `workers` downloaded files wait on a bounded queue; when it is full the
+      downloaders block, so temporary disk use stays bounded.
+    - `workers` processes parse, chunk and upload files; a semaphore keeps at most
+      `workers` files in flight, so the main thread only takes a new file when a
+      process is free.
+
+    Returns:
+        A dictionary of input blob name -> output blob names (None for files that
+        failed to download or process).
+    """
+    results = {blob.name: None for blob in files_to_process}
+    blob_queue = queue.Queue()
+    for item in enumerate(files_to_process):
+        blob_queue.put(item)
+    ready_queue = queue.Queue(maxsize=workers)
+
+    downloaders = [
+        threading.Thread(target=_download_stage, args=(blob_queue, ready_queue, temp_dir, input_prefix), daemon=True)
+        for _ in range(min(workers, len(files_to_process)))
+    ]
+    for thread in downloaders:
+        thread.start()
+
+    def _all_downloads_done():
+        for thread in downloaders:
+            thread.join()
+        ready_queue.put(None) # Sentinel: nothing more to process.
+    threading.Thread(target=_all_downloads_done, daemon=True).start()
+
+    in_flight = threading.BoundedSemaphore(workers)
+
+    def _on_done(future, original_filename, blob_name):
+        in_flight.release()
+        error = future.exception()
+        if error is not None:
+            print(f"  -> ERROR processing file {original_filename}: {error}")
+        else:
+            results[blob_name] = future.result()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            item = ready_queue.get()
+            if item is None:
+                break
+            temp_input_path, original_filename, blob_name = item
+            in_flight.acquire()
+            try:
+                future = pool.submit(_process_in_worker, temp_input_path, original_filename, output_uri)
+            except BrokenProcessPool as e:
+                # A worker process died (e.g. killed for running out of memory); the
+                # pool takes no more work. This file and every one not yet processed
+                # keep their None result, so the caller still records the finished
+                # ones and the rest are retried on the next run.
+                in_flight.release()
+                print(f"  -> ERROR: A worker process died, skipping the remaining files: {e}")
+                _abandon_downloads(blob_queue, ready_queue, item)
+                break
+            future.add_done_callback(lambda f, name=original_filename, key=blob_name: _on_done(f, name, key))
+    return results
+
+def _abandon_downloads(blob_queue, ready_queue, item):
+    """
+    Stops run_pipeline's download stage: drops the blobs not downloaded yet, then takes
+    the downloaded files (starting with `item`) off the ready queue and deletes them
+    until the stage's sentinel arrives.
+    """
+    while True:
+        try:
+            blob_queue.get_nowait()
+        except queue.Empty:
+            break
+    while item is not None:
+        if os.path.exists(item[0]):
+            os.remove(item[0])
+        item = ready_queue.get()
+
+def _delete_outputs(output_bucket, blob_names):
+    """Deletes output blobs that are no longer produced by any input (orphaned parts)."""
+    for blob_name in sorted(blob_names):
+        try:
+            output_bucket.blob(blob_name).delete()
+            print(f"  -> Deleted orphaned output {blob_name} from {output_bucket.name}")
+        except Exception as e:
+            print(f"  -> WARNING: Could not delete orphaned output {blob_name}: {e}")
+
+def process_files_from_gcs(input_uri, output_uri, workers=CHUNKER_WORKERS, full=False):
     """
     Downloads supported files (Excel, PDF) from a GCS input URI, processes them,
     and uploads the resulting markdown chunks to a GCS output URI.
-    """
-    # Parse bucket name and prefix from URIs
-    input_bucket_name = input_uri.replace("gs://", "").split("/")[0]
-    input_prefix = "/".join(input_uri.replace("gs://", "").split("/")[1:])
-    output_bucket_name = output_uri.replace("gs://", "").split("/")[0]
-    output_prefix = "/".join(output_uri.replace("gs://", "").split("/")[1:])
+    Either URI may also be a local directory (see chunk_storage.open_bucket).
+
+    Runs are incremental: a manifest stored with the outputs (see chunk_manifest)
+    records each input's generation/MD5 and the parts it produced, so only new or
+    changed inputs are processed, parts a changed input no longer produces are
+    deleted, and so are the parts of inputs that were removed. With `full`, every
+    input is processed again.
 
-    input_bucket = storage_client.bucket(input_bucket_name)
-    output_bucket = storage_client.bucket(output_bucket_name)
+    With `workers` > 1 the files go through a bounded parallel pipeline (see
+    run_pipeline); with 1 they are processed one at a time in this process.
+    """
+    input_bucket, input_prefix = open_bucket(input_uri)
+    output_bucket, output_prefix = open_bucket(output_uri)
 
-    print(f"--- Initiating file processing from {input_uri} to {output_uri} ---")
+    print(f"--- Initiating file processing from {input_uri} to {output_uri} ({workers} worker(s)) ---")
 
     # List blobs in the input bucket with the specified prefix
     blobs = input_bucket.list_blobs(prefix=input_prefix)
@@ -154,52 +821,268 @@ def process_files_from_gcs(input_uri, output_uri):
     # Filter for relevant file types (.xlsx, .xls, .pdf)
     files_to_process = [
         blob for blob in blobs 
-        if blob.name.lower().endswith((".xlsx", ".xls", ".pdf"))
+        if blob.name.lower().endswith(SUPPORTED_EXTENSIONS)
     ]
 
-    if not files_to_process:
+    manifest = load_manifest(output_bucket, output_prefix)
+    if not files_to_process and not manifest:
         print(f"WARNING: No supported Excel or PDF files found in {input_uri}")
         return
 
-    # Process each supported file
-    for blob in files_to_process:
-        original_filename = os.path.basename(blob.name)
-        # Use /tmp for temporary files in Cloud Run environments as it's a writeable directory
-        temp_input_path = f"/tmp/{original_filename}" 
-        
-        try:
-            # Download blob to a temporary local file
-            blob.download_to_filename(temp_input_path)
-            print(f"  -> Downloaded {original_filename} to {temp_input_path}")
+    # Compare the inputs with the manifest of the previous run
+    input_names = {blob.name for blob in files_to_process}
+    changed_files = [
+        blob for blob in files_to_process
+        if full or not is_up_to_date(manifest.get(blob.name), blob, CHUNKER_VERSION)
+    ]
+    # Archive members (see process_zip_archives) are not inputs of this folder.
+    removed_names = sorted(name for name, entry in manifest.items()
+                           if name not in input_names and not entry.get("archive"))
+    print(f"  -> {len(changed_files)} new or changed file(s), "
+          f"{len(files_to_process) - len(changed_files)} unchanged, {len(removed_names)} removed")
 
-            # Dispatch to appropriate processing function based on file type
-            if original_filename.lower().endswith((".xlsx", ".xls")):
-                process_excel_document(temp_input_path, output_bucket, output_prefix, original_filename)
-            elif original_filename.lower().endswith(".pdf"):
-                process_pdf_document(temp_input_path, output_bucket, output_prefix, original_filename)
+    results = {}
+    if changed_files:
+        # Use the system temp dir (/tmp on Cloud Run, where it is writeable) for downloads
+        temp_dir = tempfile.mkdtemp(prefix="chunker_")
+        try:
+            if workers > 1:
+                results = run_pipeline(changed_files, output_uri, workers, temp_dir, input_prefix)
             else:
-                # This case should ideally not be reached due to prior filtering
-                print(f"  -> INFO: Skipping unsupported file type after download: {original_filename}")
-
-        except Exception as e:
-            print(f"  -> ERROR processing file {original_filename}: {e}")
+                # Process each supported file in turn
+                for index, blob in enumerate(changed_files):
+                    original_filename = _relative_input_name(blob.name, input_prefix)
+                    temp_input_path = os.path.join(temp_dir, f"{index}_{original_filename}")
+                    results[blob.name] = None
+                    try:
+                        # Download blob to a temporary local file
+                        blob.download_to_filename(temp_input_path)
+                        print(f"  -> Downloaded {original_filename} to {temp_input_path}")
+                        results[blob.name] = process_local_file(temp_input_path, output_bucket, output_prefix, original_filename)
+                    except Exception as e:
+                        print(f"  -> ERROR processing file {original_filename}: {e}")
+                    finally:
+                        # Ensure temporary local file is cleaned up, even if processing fails
+                        if os.path.exists(temp_input_path):
+                            os.remove(temp_input_path)
+                            print(f"  -> Cleaned up temporary file {temp_input_path}")
         finally:
-            # Ensure temporary local file is cleaned up, even if processing fails
-            if os.path.exists(temp_input_path):
-                os.remove(temp_input_path)
-                print(f"  -> Cleaned up temporary file {temp_input_path}")
-    
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    # Record what each processed file produced, and remove parts nothing produces anymore
+    orphans = set()
+    for blob in changed_files:
+        outputs = results.get(blob.name)
+        previous_outputs = set(manifest.get(blob.name, {}).get("outputs", []))
+        if outputs is None:
+            # Keep the previous parts on record (and on disk) and retry the file next run.
+            manifest[blob.name] = make_entry(blob, previous_outputs, None)
+            continue
+        orphans |= previous_outputs - set(outputs)
+        manifest[blob.name] = make_entry(blob, outputs, CHUNKER_VERSION)
+
+    for name in removed_names:
+        print(f"  -> Input {name} was removed")
+        orphans |= set(manifest.pop(name).get("outputs", []))
+
+    # A part another input still claims (e.g. one recorded before output names included
+    # the input's folder) is kept.
+    claimed = {output for entry in manifest.values() for output in entry.get("outputs", [])}
+    _delete_outputs(output_bucket, orphans - claimed)
+
+    if changed_files or removed_names:
+        save_manifest(output_bucket, output_prefix, manifest, CHUNKER_VERSION)
+
+    failed = sum(1 for blob in changed_files if results.get(blob.name) is None)
+    if failed:
+        print(f"WARNING: {failed} file(s) failed and will be retried on the next run")
     print(f"SUCCESS: Finished processing files from {input_uri} to {output_uri}")
 
+# --- ZIP Pipeline Mode ---
+# Reads Excel/PDF members straight out of ZIP archives (e.g. the Performance &
+# Accountability Report archives) and chunks them, instead of extracting the archives,
+# uploading the files to the input bucket and downloading them again.
+
+@contextmanager
+def open_archive(source):
+    """
+    Opens a ZIP archive for reading, from a local path (or file:// URI), a gs:// URI or
+    an http(s) URL. Remote archives are streamed into a spooled temporary file (in
+    memory up to ZIP_SPOOL_MAX_BYTES), since ZIP needs random access to its directory.
+
+    Yields:
+        A seekable binary file object.
+    """
+    if source.startswith(("http://", "https://")):
+        with tempfile.SpooledTemporaryFile(max_size=ZIP_SPOOL_MAX_BYTES) as spool:
+            with requests.get(source, stream=True, timeout=60) as response:
+                response.raise_for_status()
+                for block in response.iter_content(chunk_size=1 << 20):
+                    spool.write(block)
+            spool.seek(0)
+            yield spool
+    elif source.startswith("gs://"):
+        bucket, blob_name = open_bucket(source)
+        with tempfile.SpooledTemporaryFile(max_size=ZIP_SPOOL_MAX_BYTES) as spool:
+            bucket.blob(blob_name).download_to_file(spool)
+            spool.seek(0)
+            yield spool
+    else:
+        path = source[len("file://"):] if source.startswith("file://") else source
+        with open(path, "rb") as f:
+            yield f
+
+# A supported archive member, in the shape chunk_manifest expects of an input blob:
+# `name` is its manifest key ('<archive>!<member path>'), `generation` its CRC-32 and
+# size (which change whenever its content does), `archive` the archive it was read
+# from and `filename` its path in there.
+ArchiveMember = namedtuple("ArchiveMember", ["name", "archive", "filename", "generation", "md5_hash", "size"])
+
+def archive_stem(source):
+    """Returns an archive's file name without '.zip' (e.g. 'PAR_2020' for 'https://.../PAR_2020.zip?dl=1')."""
+    name = os.path.basename(source.split("?", 1)[0].rstrip("/"))
+    return name[:-len(".zip")] if name.lower().endswith(".zip") else name
+
+def list_archive_members(zip_ref, source):
+    """Returns an ArchiveMember for every supported member of an open ZIP archive."""
+    return [
+        ArchiveMember(f"{source}!{info.filename}", source, info.filename,
+                      f"{info.CRC:08x}-{info.file_size}", None, info.file_size)
+        for info in zip_ref.infolist()
+        if not info.is_dir() and info.filename.lower().endswith(SUPPORTED_EXTENSIONS)
+    ]
+
+def _process_member_in_worker(content, original_filename, output_uri):
+    """
+    Parse/chunk/upload stage for one archive member, run inside a worker process.
+
+    Returns:
+        The output blob names (see process_local_file).
+    """
+    if output_uri not in _worker_output_buckets:
+        _worker_output_buckets[output_uri] = open_bucket(output_uri)
+    output_bucket, output_prefix = _worker_output_buckets[output_uri]
+    return process_local_file(io.BytesIO(content), output_bucket, output_prefix, original_filename, page_workers=1)
+
+def process_zip_archives(sources, output_uri, workers=CHUNKER_WORKERS, full=False):
+    """
+    Chunks the Excel and PDF members of ZIP archives directly into the output URI,
+    without extracting anything to disk or staging the files in the input bucket.
+
+    The main process reads members one at a time; with `workers` > 1 they are parsed,
+    chunked and uploaded by a process pool, with at most `workers` members in flight so
+    memory stays bounded.
+
+    Outputs are named after the archive and the member's path (see output_source_name),
+    so same-named members of different archives or folders keep their own parts. Each
+    member is recorded in the output folder's manifest like a bucket input, under
+    '<archive>!<member>': unchanged members are skipped on the next run (unless `full`),
+    and the parts of changed or removed members are deleted as in
+    process_files_from_gcs.
+
+    Returns:
+        A dictionary of '<archive>!<member>' -> output blob names for the members that
+        were processed (None if one failed).
+    """
+    print(f"--- Initiating ZIP processing of {len(sources)} archive(s) to {output_uri} ({workers} worker(s)) ---")
+    results = {}
+    processed = {} # manifest key -> ArchiveMember, for every member sent for processing
+    removed_names = []
+    unchanged = 0
+    output_bucket, output_prefix = open_bucket(output_uri)
+    manifest = load_manifest(output_bucket, output_prefix)
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    pool_broken = False
+    in_flight = threading.BoundedSemaphore(workers)
+
+    def _on_done(future, key):
+        in_flight.release()
+        error = future.exception()
+        if error is not None:
+            print(f"  -> ERROR processing file {key}: {error}")
+        else:
+            results[key] = future.result()
+
+    try:
+        for source in sources:
+            if pool_broken:
+                break
+            print(f"--- Reading archive {source} ---")
+            try:
+                with open_archive(source) as archive_file, zipfile.ZipFile(archive_file) as zip_ref:
+                    members = list_archive_members(zip_ref, source)
+                    for member in members:
+                        if not full and is_up_to_date(manifest.get(member.name), member, CHUNKER_VERSION):
+                            unchanged += 1
+                            continue
+                        content = zip_ref.read(member.filename)
+                        original_filename = output_source_name(archive_stem(source), member.filename)
+                        key = member.name
+                        results[key] = None
+                        processed[key] = member
+                        print(f"  -> Read {member.filename} ({len(content)} bytes) from archive")
+                        if pool is None:
+                            results[key] = process_local_file(io.BytesIO(content), output_bucket, output_prefix, original_filename)
+                            continue
+                        in_flight.acquire()
+                        try:
+                            future = pool.submit(_process_member_in_worker, content, original_filename, output_uri)
+                        except BrokenProcessPool as e:
+                            # A worker process died; this member stays failed and the
+                            # ones not read yet are left for the next run.
+                            in_flight.release()
+                            print(f"  -> ERROR: A worker process died, skipping the remaining members: {e}")
+                            pool_broken = True
+                            break
+                        future.add_done_callback(lambda f, k=key: _on_done(f, k))
+                # Only an archive that was read completely tells which members are gone.
+                member_names = {member.name for member in members}
+                removed_names += sorted(
+                    name for name, entry in manifest.items()
+                    if entry.get("archive") == source and name not in member_names)
+            except (OSError, zipfile.BadZipFile, requests.exceptions.RequestException) as e:
+                print(f"  -> ERROR reading archive {source}: {e}")
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    # Record what each member produced and remove the parts nothing produces anymore
+    orphans = set()
+    for key, member in processed.items():
+        outputs = results.get(key)
+        previous_outputs = set(manifest.get(key, {}).get("outputs", []))
+        if outputs is None:
+            manifest[key] = make_entry(member, previous_outputs, None)
+        else:
+            orphans |= previous_outputs - set(outputs)
+            manifest[key] = make_entry(member, outputs, CHUNKER_VERSION)
+        # Marks the entry as an archive member, which bucket runs leave alone.
+        manifest[key]["archive"] = member.archive
+
+    for name in removed_names:
+        print(f"  -> Archive member {name} was removed")
+        orphans |= set(manifest.pop(name).get("outputs", []))
+
+    claimed = {output for entry in manifest.values() for output in entry.get("outputs", [])}
+    _delete_outputs(output_bucket, orphans - claimed)
+
+    if processed or removed_names:
+        save_manifest(output_bucket, output_prefix, manifest, CHUNKER_VERSION)
+
+    failed = sum(1 for outputs in results.values() if outputs is None)
+    if failed:
+        print(f"WARNING: {failed} archive member(s) failed and will be retried on the next run")
+    print(f"SUCCESS: Finished processing {len(results)} archive member(s) to {output_uri} ({unchanged} unchanged)")
+    return results
+
 def clean_output_folder(output_uri):
     """
     Cleans up all .txt files from a specified GCS output URI.
     This is useful for clearing previous processing results before a new run.
+    The run manifest goes with them, so the next run processes every input again.
     """
-    output_bucket_name = output_uri.replace("gs://", "").split("/")[0]
-    output_prefix = "/".join(output_uri.replace("gs://", "").split("/")[1:])
-    
-    output_bucket = storage_client.bucket(output_bucket_name)
+    output_bucket, output_prefix = open_bucket(output_uri)
+    output_bucket_name = output_bucket.name
     
     print(f"--- Cleaning up .txt files from {output_uri} ---")
     
@@ -207,6 +1090,8 @@ def clean_output_folder(output_uri):
     blobs_to_delete = output_bucket.list_blobs(prefix=output_prefix)
     txt_blobs = [blob for blob in blobs_to_delete if blob.name.endswith(".txt")]
 
+    delete_manifest(output_bucket, output_prefix)
+
     if not txt_blobs:
         print(f"WARNING: No .txt files found in {output_uri} to clean.")
         return
@@ -225,10 +1110,17 @@ def main():
     """
     parser = argparse.ArgumentParser(description="Process files from GCS and optionally clean output.")
     parser.add_argument("--clean", action="store_true", help="Remove all .txt files from output folder after processing")
+    parser.add_argument("--workers", type=int, default=CHUNKER_WORKERS, help=f"Number of parallel worker processes (default: {CHUNKER_WORKERS})")
+    parser.add_argument("--full", action="store_true", help="Reprocess every input, even if the manifest says it is unchanged")
+    parser.add_argument("--zip", nargs="+", metavar="ARCHIVE",
+                        help="Chunk the Excel/PDF files inside these ZIP archives (paths, gs:// URIs or URLs) instead of XLS_INPUT_FOLDER")
     args = parser.parse_args()
 
     # Process files
-    process_files_from_gcs(XLS_INPUT_FOLDER, TXT_OUTPUT_FOLDER)
+    if args.zip:
+        process_zip_archives(args.zip, TXT_OUTPUT_FOLDER, workers=max(1, args.workers), full=args.full)
+    else:
+        process_files_from_gcs(XLS_INPUT_FOLDER, TXT_OUTPUT_FOLDER, workers=max(1, args.workers), full=args.full)
 
     # Conditionally clean output folder if --clean argument is provided
     if args.clean:
@@ -0,0 +1,34 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The app, the chunker scripts and the benchmark helpers are flat modules run from their
+# own folders, so the tests import them the same way.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder in ("app", "scripts", "benchmarks"):
+    sys.path.insert(0, os.path.join(ROOT, folder))
+
+# Importing app.py must not reach Google Sheets, read or write the local snapshot, start
+# the watcher thread or use the real proxy cache.
+os.environ.update(
+    SHEETS_OFFLINE="1",
+    SHEET_CACHE_PRELOAD="0",
+    SNAPSHOT_AUTOSAVE="0",
+    SHEET_WATCH_INTERVAL_SECONDS="0",
+    PROXY_CACHE_DIR=tempfile.mkdtemp(prefix="proxy_cache_test_"),
+)
+
+
+@pytest.fixture
+def api_client():
+    """
+    A Flask test client whose cache serves a snapshot of synthetic worksheets (see
+    benchmarks/synthetic.py), so the query endpoints run without Google Sheets.
+    """
+    import app as api
+    import synthetic
+
+    api.data_cache.publish(synthetic.make_frames(1000))
+    return api.app.test_client()
@@ -0,0 +1,47 @@
+import gspread
+
+from sheet_loader import quote_sheet_range
+
+
+class FakeWorksheet:
+    def __init__(self, spreadsheet, name):
+        self._spreadsheet = spreadsheet
+        self._name = name
+
+    def get_all_values(self):
+        self._spreadsheet.calls.append(("worksheet", self._name))
+        return [list(row) for row in self._spreadsheet.values[self._name]]
+
+
+class FakeSpreadsheet:
+    """
+    Stands in for a gspread Spreadsheet: the read methods sheet_loader and SheetWatcher
+    use, served from `values` (worksheet name -> rows). Like the Sheets API, a batch read
+    naming a missing worksheet fails as a whole. Every call is recorded in `calls`.
+    """
+
+    def __init__(self, values, revision="2024-01-01T00:00:00Z"):
+        self.values = values
+        self.revision = revision
+        self.batch_fails = False
+        self.calls = []
+
+    def get_lastUpdateTime(self):
+        self.calls.append(("revision",))
+        return self.revision
+
+    def values_batch_get(self, ranges):
+        self.calls.append(("batch", tuple(ranges)))
+        if self.batch_fails:
+            raise RuntimeError("batch read unavailable")
+        names = {quote_sheet_range(name): name for name in self.values}
+        missing = [value_range for value_range in ranges if value_range not in names]
+        if missing:
+            raise RuntimeError(f"Unable to parse range: {missing[0]}")
+        return {"valueRanges": [{"range": value_range, "values": [list(row) for row in self.values[names[value_range]]]}
+                                for value_range in ranges]}
+
+    def worksheet(self, name):
+        if name not in self.values:
+            raise gspread.exceptions.WorksheetNotFound(name)
+        return FakeWorksheet(self, name)
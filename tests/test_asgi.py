@@ -0,0 +1,53 @@
+import pytest
+from starlette.testclient import TestClient
+
+import asgi
+
+
+@pytest.fixture
+def asgi_client(api_client):
+    # api_client publishes the synthetic snapshot both serving modes read.
+    return TestClient(asgi.app)
+
+
+def test_asgi_health_check(asgi_client):
+    response = asgi_client.get("/")
+
+    assert response.status_code == 200
+    assert response.text == "VA Data Backend API is running."
+
+
+@pytest.mark.parametrize("url", [
+    "/query_api_paths?category=health&limit=5",
+    "/query_census_apis_full_list?year=2019&fields=Dataset Name,API Base URL",
+    "/sheets/utilities/query?notes=veteran&sort=-Name",
+    "/query_api_paths?category=no such category",
+    "/query_api_paths?limit=-1",
+])
+def test_asgi_queries_match_the_flask_app(asgi_client, api_client, url):
+    expected = api_client.get(url, headers={"Accept-Encoding": "identity"})
+    response = asgi_client.get(url, headers={"Accept-Encoding": "identity"})
+
+    assert response.status_code == expected.status_code
+    assert response.content == expected.data
+    assert response.headers.get("ETag") == expected.headers.get("ETag")
+    assert response.headers.get("X-Total-Count") == expected.headers.get("X-Total-Count")
+
+
+def test_asgi_revalidates_and_compresses(asgi_client):
+    url = "/query_census_apis_full_list?dataset_name=acs"
+    response = asgi_client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+
+    cached = asgi_client.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["ETag"]})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+
+def test_asgi_falls_through_to_the_flask_routes(asgi_client, api_client):
+    response = asgi_client.get("/sheets")
+
+    assert response.status_code == 200
+    assert response.json() == api_client.get("/sheets").get_json()
+    assert asgi_client.get("/metrics").status_code == 200
@@ -0,0 +1,117 @@
+from urllib.parse import urlencode
+
+import pytest
+
+import sheet_batch
+
+
+QUERIES = [
+    {"endpoint": "/query_api_paths", "params": {"category": "health"}},
+    {"endpoint": "/query_api_paths?category=health", "params": {"limit": 5, "offset": 2}},
+    {"endpoint": "/query_api_paths", "params": {"api_name": "covid", "fields": "API Path"}},
+    {"sheet": "api-paths", "params": {"source": "va", "fields": "Categorization"}},
+    {"endpoint": "/search", "params": {"q": "veteran health", "limit": 5}},
+    {"endpoint": "/query_census_apis_full_list", "params": {"year": "2019", "sort": "-Dataset Name"}},
+    {"endpoint": "/query_api_paths", "params": {"limit": -1}},
+    {"endpoint": "/query_api_paths", "params": {"category": "no such category"}},
+]
+
+
+def get_url(spec):
+    endpoint = spec.get("endpoint") or f"/sheets/{spec['sheet']}/query"
+    params = {name: str(value) for name, value in spec.get("params", {}).items()}
+    return endpoint + ("&" if "?" in endpoint else "?") + urlencode(params)
+
+
+def run_batch(api_client, queries):
+    response = api_client.post("/batch", json={"queries": queries})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_batch_results_match_their_get_endpoints(api_client):
+    batch = run_batch(api_client, QUERIES)
+    rows = batch["rows"]
+    assert len(batch["results"]) == len(QUERIES)
+
+    for spec, result in zip(QUERIES, batch["results"]):
+        expected = api_client.get(get_url(spec))
+        assert result["status"] == expected.status_code, spec
+        if result["status"] != 200:
+            assert {k: v for k, v in result.items() if k != "status"} == expected.get_json()
+            continue
+        body = expected.get_json()
+        if spec.get("endpoint") == "/search":
+            assert [(rows[i]["sheet"], rows[i]["row"]) for i in result["rows"]] == \
+                [(hit["sheet"], hit["row"]) for hit in body]
+            assert result["scores"] == [hit["score"] for hit in body]
+            continue
+        assert result["total"] == int(expected.headers["X-Total-Count"])
+        # Rows can carry extra columns other queries asked for; project them back.
+        records = [rows[i]["record"] for i in result["rows"]]
+        assert [{name: record[name] for name in row} for record, row in zip(records, body)] == body
+
+
+def test_overlapping_queries_share_rows(api_client):
+    batch = run_batch(api_client, QUERIES)
+    rows, results = batch["rows"], batch["results"]
+
+    keys = [(row["sheet"], row["row"]) for row in rows]
+    assert len(set(keys)) == len(keys)
+    referenced = sorted({i for result in results for i in result.get("rows", [])})
+    assert referenced == list(range(len(rows)))
+
+    # The paged health query points into the full one's rows.
+    assert results[1]["rows"] == results[0]["rows"][2:7]
+    assert len(rows) < sum(len(result.get("rows", [])) for result in results)
+
+
+def test_rows_carry_the_union_of_the_requested_fields(api_client):
+    batch = run_batch(api_client, [
+        {"endpoint": "/query_api_paths", "params": {"category": "health", "fields": "API Path"}},
+        {"endpoint": "/query_api_paths", "params": {"category": "health", "fields": "Categorization"}},
+    ])
+
+    assert batch["results"][0]["rows"] == batch["results"][1]["rows"]
+    assert all(set(row["record"]) == {"Categorization", "API Path"} for row in batch["rows"])
+
+
+def test_repeated_batches_are_served_from_the_cache(api_client):
+    first = api_client.post("/batch", json={"queries": QUERIES})
+    second = api_client.post("/batch", json=QUERIES)  # A bare list works too.
+
+    assert second.data == first.data
+    assert second.headers["ETag"] == first.headers["ETag"]
+
+
+@pytest.mark.parametrize("payload", [
+    None,
+    {},
+    {"queries": []},
+    {"queries": [{"params": {"q": "acs"}}]},
+    {"queries": [{"endpoint": ["/search"]}]},
+    {"queries": [{"endpoint": "/search", "params": ["q"]}]},
+])
+def test_malformed_batches_are_a_400(api_client, payload):
+    response = api_client.post("/batch", json=payload)
+
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+
+
+def test_single_query_errors_stay_in_their_result(api_client):
+    batch = run_batch(api_client, [
+        {"endpoint": "/query_api_paths", "params": {"format": "ndjson"}},
+        {"endpoint": "/metrics"},
+        {"sheet": "nope"},
+        {"endpoint": "/search", "params": {"q": "acs", "limit": 1}},
+    ])
+
+    assert [result["status"] for result in batch["results"]] == [400, 400, 404, 200]
+    assert len(batch["rows"]) == 1
+
+
+def test_too_many_queries_are_a_400(api_client):
+    queries = [{"endpoint": "/search", "params": {"q": "acs"}}] * (sheet_batch.BATCH_MAX_QUERIES + 1)
+
+    assert api_client.post("/batch", json={"queries": queries}).status_code == 400
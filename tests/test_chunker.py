@@ -0,0 +1,189 @@
+import json
+import os
+import zipfile
+
+import pytest
+
+import definitive_chunker as chunker
+import synthetic
+from chunk_manifest import MANIFEST_NAME
+
+
+def outputs(folder):
+    return sorted(name for name in os.listdir(folder) if name.endswith(".txt"))
+
+
+def read_outputs(folder):
+    contents = {}
+    for name in outputs(folder):
+        with open(os.path.join(folder, name), encoding="utf-8") as f:
+            contents[name] = f.read()
+    return contents
+
+
+def manifest_inputs(folder):
+    with open(os.path.join(folder, MANIFEST_NAME), encoding="utf-8") as f:
+        return json.load(f)["inputs"]
+
+
+@pytest.fixture
+def folders(tmp_path):
+    input_folder, output_folder = tmp_path / "in", tmp_path / "out"
+    (input_folder / "sub").mkdir(parents=True)
+    output_folder.mkdir()
+    synthetic.write_pdf(str(input_folder / "report.pdf"), 3)
+    synthetic.write_pdf(str(input_folder / "sub" / "report.pdf"), 2, seed=1)
+    synthetic.write_workbook(str(input_folder / "budget.xlsx"), 40)
+    return str(input_folder), str(output_folder)
+
+
+def test_parallel_pipeline_writes_the_same_chunks_as_a_serial_run(folders, tmp_path):
+    input_folder, serial_folder = folders
+    parallel_folder = str(tmp_path / "parallel")
+    os.mkdir(parallel_folder)
+
+    chunker.process_files_from_gcs(input_folder, serial_folder, workers=1)
+    chunker.process_files_from_gcs(input_folder, parallel_folder, workers=3)
+
+    assert read_outputs(parallel_folder) == read_outputs(serial_folder)
+    serial, parallel = manifest_inputs(serial_folder), manifest_inputs(parallel_folder)
+    assert {name: entry["outputs"] for name, entry in parallel.items()} == \
+        {name: entry["outputs"] for name, entry in serial.items()}
+
+
+def test_a_dead_worker_process_does_not_abort_the_run(folders, monkeypatch, capsys):
+    input_folder, output_folder = folders
+    synthetic.write_pdf(os.path.join(input_folder, "crash.pdf"), 1)
+    process_local_file = chunker.process_local_file
+
+    def crashing(temp_input_path, output_bucket, output_prefix, original_filename, **kwargs):
+        if original_filename == "crash.pdf":
+            os._exit(1) # Like a worker killed for running out of memory.
+        return process_local_file(temp_input_path, output_bucket, output_prefix, original_filename, **kwargs)
+
+    # Worker processes are forked, so they run the patched function.
+    monkeypatch.setattr(chunker, "process_local_file", crashing)
+    chunker.process_files_from_gcs(input_folder, output_folder, workers=2)
+
+    out = capsys.readouterr().out
+    assert "SUCCESS" in out
+    assert "will be retried on the next run" in out
+    entries = manifest_inputs(output_folder)
+    assert entries["crash.pdf"]["chunker_version"] is None
+
+    # The next run retries what failed and finishes everything.
+    monkeypatch.setattr(chunker, "process_local_file", process_local_file)
+    chunker.process_files_from_gcs(input_folder, output_folder, workers=2)
+    entries = manifest_inputs(output_folder)
+    assert set(entries) == {"report.pdf", "sub/report.pdf", "budget.xlsx", "crash.pdf"}
+    assert all(entry["chunker_version"] == chunker.CHUNKER_VERSION for entry in entries.values())
+    assert "crash_full_text_chunk_1.txt" in outputs(output_folder)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_same_named_inputs_in_different_folders_keep_their_own_outputs(folders, workers):
+    input_folder, output_folder = folders
+    chunker.process_files_from_gcs(input_folder, output_folder, workers=workers)
+
+    names = outputs(output_folder)
+    assert "report_full_text_chunk_1.txt" in names
+    assert "sub__report_full_text_chunk_1.txt" in names
+    assert any(name.startswith("budget_") for name in names)
+
+    entries = manifest_inputs(output_folder)
+    assert set(entries) == {"report.pdf", "sub/report.pdf", "budget.xlsx"}
+    assert entries["sub/report.pdf"]["outputs"] == ["sub__report_full_text_chunk_1.txt"]
+    assert all(entry["chunker_version"] == chunker.CHUNKER_VERSION for entry in entries.values())
+
+
+def test_unchanged_inputs_are_skipped(folders, capsys):
+    input_folder, output_folder = folders
+    chunker.process_files_from_gcs(input_folder, output_folder, workers=1)
+    before = {name: os.path.getmtime(os.path.join(output_folder, name)) for name in outputs(output_folder)}
+    capsys.readouterr()
+
+    chunker.process_files_from_gcs(input_folder, output_folder, workers=1)
+    assert "0 new or changed file(s), 3 unchanged, 0 removed" in capsys.readouterr().out
+    assert {name: os.path.getmtime(os.path.join(output_folder, name)) for name in outputs(output_folder)} == before
+
+
+def test_removed_input_loses_its_outputs(folders):
+    input_folder, output_folder = folders
+    chunker.process_files_from_gcs(input_folder, output_folder, workers=1)
+
+    os.remove(os.path.join(input_folder, "sub", "report.pdf"))
+    chunker.process_files_from_gcs(input_folder, output_folder, workers=1)
+
+    assert "sub__report_full_text_chunk_1.txt" not in outputs(output_folder)
+    assert "report_full_text_chunk_1.txt" in outputs(output_folder)
+    assert "sub/report.pdf" not in manifest_inputs(output_folder)
+
+
+def test_outputs_another_input_still_claims_are_kept(folders):
+    input_folder, output_folder = folders
+    chunker.process_files_from_gcs(input_folder, output_folder, workers=1)
+
+    # An entry for an input that no longer exists, recorded with a part that
+    # 'report.pdf' also produces.
+    with open(os.path.join(output_folder, MANIFEST_NAME), encoding="utf-8") as f:
+        manifest = json.load(f)
+    manifest["inputs"]["old/report.pdf"] = dict(manifest["inputs"]["report.pdf"])
+    with open(os.path.join(output_folder, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+    chunker.process_files_from_gcs(input_folder, output_folder, workers=1)
+    assert "old/report.pdf" not in manifest_inputs(output_folder)
+    assert "report_full_text_chunk_1.txt" in outputs(output_folder)
+
+
+def test_full_run_reprocesses_everything(folders, capsys):
+    input_folder, output_folder = folders
+    chunker.process_files_from_gcs(input_folder, output_folder, workers=1)
+    capsys.readouterr()
+
+    chunker.process_files_from_gcs(input_folder, output_folder, workers=1, full=True)
+    assert "3 new or changed file(s), 0 unchanged, 0 removed" in capsys.readouterr().out
+
+
+def test_changed_input_is_reprocessed(folders, capsys):
+    input_folder, output_folder = folders
+    chunker.process_files_from_gcs(input_folder, output_folder, workers=1)
+    md5 = manifest_inputs(output_folder)["report.pdf"]["md5_hash"]
+    capsys.readouterr()
+
+    synthetic.write_pdf(os.path.join(input_folder, "report.pdf"), 3, seed=7)
+    chunker.process_files_from_gcs(input_folder, output_folder, workers=1)
+    assert "1 new or changed file(s), 2 unchanged, 0 removed" in capsys.readouterr().out
+    assert manifest_inputs(output_folder)["report.pdf"]["md5_hash"] != md5
+
+
+def test_zip_members_are_named_after_their_archive_and_recorded(folders, tmp_path):
+    input_folder, output_folder = folders
+    archives = []
+    for name in ("fy2019.zip", "fy2020.zip"):
+        path = str(tmp_path / name)
+        with zipfile.ZipFile(path, "w") as archive:
+            archive.write(os.path.join(input_folder, "report.pdf"), "report.pdf")
+            archive.write(os.path.join(input_folder, "sub", "report.pdf"), "sub/report.pdf")
+        archives.append(path)
+
+    results = chunker.process_zip_archives(archives, output_folder, workers=1)
+    assert all(result for result in results.values())
+    assert outputs(output_folder) == [
+        "fy2019__report_full_text_chunk_1.txt", "fy2019__sub__report_full_text_chunk_1.txt",
+        "fy2020__report_full_text_chunk_1.txt", "fy2020__sub__report_full_text_chunk_1.txt",
+    ]
+    entries = manifest_inputs(output_folder)
+    assert entries[f"{archives[0]}!sub/report.pdf"]["archive"] == archives[0]
+
+    # Unchanged members are skipped; a member removed from its archive loses its parts.
+    assert chunker.process_zip_archives(archives, output_folder, workers=1) == {}
+    with zipfile.ZipFile(archives[1], "w") as archive:
+        archive.write(os.path.join(input_folder, "report.pdf"), "report.pdf")
+    chunker.process_zip_archives(archives[1:], output_folder, workers=1)
+    assert "fy2020__sub__report_full_text_chunk_1.txt" not in outputs(output_folder)
+    assert "fy2019__sub__report_full_text_chunk_1.txt" in outputs(output_folder)
+
+    # A bucket run against the same output folder leaves the archive members alone.
+    chunker.process_files_from_gcs(input_folder, output_folder, workers=1)
+    assert f"{archives[0]}!report.pdf" in manifest_inputs(output_folder)
@@ -0,0 +1,115 @@
+import gzip
+import json
+import zlib
+
+import brotli
+import pytest
+
+import compression
+import sheet_query
+from compression import choose_encoding
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("", None),
+    ("identity", None),
+    ("gzip", "gzip"),
+    ("GZIP, deflate", "gzip"),
+    ("gzip, br", "br"),
+    ("gzip;q=1.0, br;q=0.5", "gzip"),
+    ("br;q=0, gzip", "gzip"),
+    ("br;q=0, gzip;q=0", None),
+    ("gzip;q=nonsense", None),
+    ("*", "br"),
+    ("*;q=0, gzip", "gzip"),
+    ("deflate, *;q=0.1", "br"),
+])
+def test_choose_encoding(header, expected):
+    assert choose_encoding(header) == expected
+
+
+URL = "/query_census_apis_full_list?dataset_name=acs"
+
+
+def test_compressed_bodies_decode_to_the_identity_body(api_client):
+    identity = api_client.get(URL)
+    assert "Content-Encoding" not in identity.headers
+    assert len(identity.data) >= compression.COMPRESSION_MIN_BYTES
+
+    for header, encoding, decode in (("gzip", "gzip", gzip.decompress),
+                                     ("br, gzip", "br", brotli.decompress),
+                                     ("br;q=0, gzip", "gzip", gzip.decompress)):
+        response = api_client.get(URL, headers={"Accept-Encoding": header})
+        assert response.headers["Content-Encoding"] == encoding
+        assert "Accept-Encoding" in response.headers["Vary"]
+        assert response.headers["X-Total-Count"] == identity.headers["X-Total-Count"]
+        assert len(response.data) < len(identity.data)
+        assert decode(response.data) == identity.data
+
+
+def test_small_and_error_bodies_are_not_compressed(api_client):
+    small = api_client.get("/query_api_paths?limit=1&fields=API Path", headers={"Accept-Encoding": "gzip"})
+    assert len(small.data) < compression.COMPRESSION_MIN_BYTES
+    assert "Content-Encoding" not in small.headers
+    # Uncompressed, so the identity ETag is the one sent.
+    assert small.headers["ETag"] == api_client.get("/query_api_paths?limit=1&fields=API Path").headers["ETag"]
+
+    for url in ("/query_api_paths?category=nothing at all", "/query_api_paths?limit=x"):
+        response = api_client.get(url, headers={"Accept-Encoding": "gzip"})
+        assert response.status_code in (400, 404)
+        assert "Content-Encoding" not in response.headers
+        assert json.loads(response.data)
+
+
+def test_compression_min_bytes_is_the_threshold(api_client, monkeypatch):
+    url = "/query_api_paths?limit=1&fields=API Path"
+    monkeypatch.setattr(compression, "COMPRESSION_MIN_BYTES", 1)
+
+    response = api_client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(response.data) == api_client.get(url).data
+
+
+def ndjson_records(data):
+    return [json.loads(line) for line in data.decode("utf-8").splitlines()]
+
+
+def test_ndjson_streams_the_same_records(api_client, monkeypatch):
+    monkeypatch.setattr(sheet_query, "NDJSON_BLOCK_ROWS", 7)
+    expected = api_client.get(URL)
+
+    response = api_client.get(URL + "&format=ndjson")
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == "application/x-ndjson"
+    assert response.headers["X-Total-Count"] == expected.headers["X-Total-Count"]
+    assert ndjson_records(response.data) == expected.get_json()
+    assert response.headers["ETag"] != expected.headers["ETag"]
+
+    paged = api_client.get(URL + "&format=ndjson&limit=10&offset=5&fields=Dataset Name")
+    assert ndjson_records(paged.data) == [{"Dataset Name": row["Dataset Name"]} for row in expected.get_json()[5:15]]
+
+
+def test_compressed_ndjson_is_flushed_per_block(api_client, monkeypatch):
+    monkeypatch.setattr(sheet_query, "NDJSON_BLOCK_ROWS", 7)
+    expected = api_client.get(URL).get_json()
+
+    response = api_client.get(URL + "&format=ndjson", headers={"Accept-Encoding": "gzip"}, buffered=False)
+    assert response.headers["Content-Encoding"] == "gzip"
+    chunks = list(response.response)
+    response.close()
+    assert len(chunks) > len(expected) // 7
+    # Every chunk decodes on its own into whole lines (a sync flush per block).
+    decoder = zlib.decompressobj(31)
+    first = decoder.decompress(chunks[0])
+    assert first.endswith(b"\n") and len(first.splitlines()) == 7
+    assert ndjson_records(gzip.decompress(b"".join(chunks))) == expected
+
+
+def test_ndjson_without_matches_is_a_json_404(api_client):
+    response = api_client.get("/query_api_paths?category=nothing at all&format=ndjson")
+
+    assert response.status_code == 404
+    assert response.mimetype == "application/json"
+    assert response.get_json() == {"message": "No matching API paths found for the given criteria."}
@@ -0,0 +1,64 @@
+import app as api
+import synthetic
+
+
+def test_query_responses_carry_a_strong_etag(api_client):
+    response = api_client.get("/query_api_paths?category=health")
+
+    assert response.status_code == 200
+    etag, weak = response.get_etag()
+    assert etag and not weak
+    assert response.headers["ETag"] == f'"{etag}"'
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert api_client.get("/query_api_paths?category=health").headers["ETag"] == response.headers["ETag"]
+
+
+def test_matching_if_none_match_returns_304(api_client):
+    etag = api_client.get("/query_api_paths?category=health").headers["ETag"]
+
+    response = api_client.get("/query_api_paths?category=health", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+    assert response.headers["ETag"] == etag
+    assert "Accept-Encoding" in response.headers["Vary"]
+
+    response = api_client.get("/query_api_paths?category=health", headers={"If-None-Match": f'"other", {etag}'})
+    assert response.status_code == 304
+    assert api_client.get("/query_api_paths?category=health", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_identity_and_compressed_etags_both_revalidate(api_client):
+    url = "/query_census_apis_full_list?dataset_name=acs"
+    identity = api_client.get(url).headers["ETag"]
+    gzipped = api_client.get(url, headers={"Accept-Encoding": "gzip"}).headers["ETag"]
+    assert gzipped != identity
+
+    for etag in (identity, gzipped):
+        response = api_client.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+    # An identity client cannot reuse a gzip body.
+    assert api_client.get(url, headers={"If-None-Match": gzipped}).status_code == 200
+
+
+def test_etag_depends_on_the_query_and_the_data(api_client):
+    first = api_client.get("/query_api_paths?category=health").headers["ETag"]
+    assert api_client.get("/query_api_paths?category=health&limit=5").headers["ETag"] != first
+    assert api_client.get("/query_api_paths?category=HEALTH").headers["ETag"] == first
+    # The alias and the generic route serve the same resource.
+    assert api_client.get("/sheets/api-paths/query?category=health").headers["ETag"] == first
+
+    api.data_cache.publish(synthetic.make_frames(1000, seed=1))
+    response = api_client.get("/query_api_paths?category=health", headers={"If-None-Match": first})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != first
+
+    # Reloading identical data keeps the ETags (they derive from the content, not the version).
+    api.data_cache.publish(synthetic.make_frames(1000, seed=1))
+    assert api_client.get("/query_api_paths?category=health").headers["ETag"] == response.headers["ETag"]
+
+
+def test_errors_have_no_etag(api_client):
+    response = api_client.get("/query_api_paths?limit=-1")
+    assert response.status_code == 400
+    assert "ETag" not in response.headers
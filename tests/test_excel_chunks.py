@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+import tabulate
+
+import definitive_chunker as chunker
+import synthetic
+
+
+def row_by_row_chunks(df, max_bytes):
+    """The chunker's original algorithm: render each row to size it, rebuild chunks from row.to_dict()."""
+    chunks, rows_for_chunk, current_chunk_size_bytes = [], [], 0
+    for _, row in df.iterrows():
+        row_size_bytes = len(pd.DataFrame([row.values], columns=df.columns).to_markdown(index=False).encode('utf-8'))
+        if current_chunk_size_bytes > 0 and (current_chunk_size_bytes + row_size_bytes) > max_bytes:
+            chunks.append(pd.DataFrame(rows_for_chunk, columns=df.columns))
+            rows_for_chunk, current_chunk_size_bytes = [], 0
+        rows_for_chunk.append(row.to_dict())
+        current_chunk_size_bytes += row_size_bytes
+    if rows_for_chunk:
+        chunks.append(pd.DataFrame(rows_for_chunk, columns=df.columns))
+    return [chunk.to_markdown(index=False) for chunk in chunks]
+
+
+def vectorized_chunks(df, max_bytes):
+    return [chunk.to_markdown(index=False) for chunk in chunker.iter_sheet_chunks(df, max_bytes)]
+
+
+def sheets():
+    rows = 120
+    return {
+        "excel": synthetic.excel_sheet(rows),
+        "mixed": pd.DataFrame({
+            "Value": [[1, "two", 3.5, None, True, -0.0, 10 ** 12, "x" * 40][i % 8] for i in range(rows)],
+            "Label": [f"row {i}" for i in range(rows)],
+        }),
+        "nan": pd.DataFrame({
+            "Amount": [float("nan") if i % 3 == 0 else i * 1.25 for i in range(rows)],
+            "Text": [None if i % 4 == 0 else f"t{i}" for i in range(rows)],
+        }),
+        "bool": pd.DataFrame({
+            "Flag": [i % 2 == 0 for i in range(rows)],
+            "Maybe": [[True, False, None][i % 3] for i in range(rows)],
+        }),
+        "float": pd.DataFrame({
+            "Small": np.linspace(-1, 1, rows),
+            "Large": np.geomspace(1, 1e15, rows),
+            "Whole": [float(i) for i in range(rows)],
+        }),
+        "multiline": pd.DataFrame({
+            "Notes": [f"line one\nline {i}" if i % 5 == 0 else f"note {i}" for i in range(rows)],
+            "Name": [f"Démographie {i}" if i % 7 == 0 else f"name {i}" for i in range(rows)],
+        }),
+    }
+
+
+@pytest.mark.parametrize("name", list(sheets()))
+@pytest.mark.parametrize("max_bytes", [400, 2000, chunker.MAX_BYTES])
+def test_vectorized_chunks_match_the_row_by_row_algorithm(name, max_bytes):
+    df = sheets()[name]
+
+    assert vectorized_chunks(df, max_bytes) == row_by_row_chunks(df, max_bytes)
+
+
+def test_unsupported_tabulate_falls_back_to_rendering_rows(monkeypatch, capsys):
+    df = sheets()["excel"]
+    expected = row_by_row_chunks(df, 2000)
+
+    # tabulate 0.8 has no integer format (and its _format takes no intfmt argument).
+    monkeypatch.delattr(tabulate, "_DEFAULT_INTFMT")
+
+    assert vectorized_chunks(df, 2000) == expected
+    assert "sizing rows one by one" in capsys.readouterr().out
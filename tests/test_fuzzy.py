@@ -0,0 +1,59 @@
+import pandas as pd
+
+from sheet_index import FUZZY_MIN_SCORE, ColumnIndex, filter_rows, word_similarity
+
+
+DATASETS = pd.Series([
+    "American Community Survey 5-Year", "American Community Survey 1-Year", "County Business Patterns",
+    "Veteran Benefits 2019", "Veteran Benefits 2018", "Benefits & Claims", None, "Decennial Census",
+], dtype=object)
+
+
+def fuzzy_rows(values, needle):
+    index = ColumnIndex(values, modes=("contains", "fuzzy"))
+    return filter_rows({"Name": index}, [("Name", "fuzzy", needle)]).tolist()
+
+
+def test_misspelled_words_match():
+    assert fuzzy_rows(DATASETS, "benifits") == [3, 4, 5]
+    assert fuzzy_rows(DATASETS, "amer community survey") == [0, 1]
+    assert fuzzy_rows(DATASETS, "comunity survy") == [0, 1]
+    assert fuzzy_rows(DATASETS, "decenial") == [7]
+    assert fuzzy_rows(DATASETS, "zzzzzz") == []
+
+
+def test_literal_matches_rank_first_and_are_never_lost():
+    index = ColumnIndex(DATASETS, modes=("contains", "fuzzy"))
+    for needle in ("benefits", "survey", "ben", "census", "5-year"):
+        rows, scores = index.fuzzy.lookup(needle)
+        literal = index.lookup(needle).tolist()
+        assert set(literal) <= set(rows.tolist()), needle
+        assert all(score == 1.0 for row, score in zip(rows, scores) if row in literal)
+        assert all(score >= FUZZY_MIN_SCORE for score in scores)
+
+
+def test_numbers_are_matched_exactly():
+    # Words made of digits match only exactly, so 'Veteran Benefits 2018' matches two
+    # of the three words, which is below FUZZY_MIN_SCORE.
+    assert fuzzy_rows(DATASETS, "veteran benefits 2019") == [3]
+    assert fuzzy_rows(DATASETS, "veteran benefits") == [3, 4]
+
+
+def test_word_similarity():
+    assert word_similarity("benefits", "benefits") == 1.0
+    assert word_similarity("amer", "american") == 0.9
+    assert 0.7 <= word_similarity("benifits", "benefits") < 1
+    assert word_similarity("cat", "dog") == 0.0
+
+
+def test_fuzzy_endpoint_ranks_typo_matches(api_client):
+    assert api_client.get("/query_api_paths?category=benifits").status_code == 404
+
+    response = api_client.get("/query_api_paths?category=benifits&match=fuzzy")
+    assert response.status_code == 200
+    rows = response.get_json()
+    assert rows and all(row["Categorization"] == "Benefits & Claims" for row in rows)
+    assert response.headers["X-Total-Count"] == str(len(rows))
+
+    ranked = api_client.get("/query_census_apis_full_list?dataset_name=populaton&match=fuzzy").get_json()
+    assert ranked and all("population" in row["Dataset Name"] for row in ranked)
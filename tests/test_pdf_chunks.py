@@ -0,0 +1,175 @@
+import os
+
+import fitz
+import pytest
+
+import definitive_chunker as chunker
+import synthetic
+from chunk_storage import open_bucket
+
+
+@pytest.fixture(scope="module")
+def report_pdf(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("pdf") / "report.pdf")
+    synthetic.write_pdf(path, 12)
+    return path
+
+
+def page_texts(path):
+    with fitz.open(path) as doc:
+        return [page.get_text() + "\n" for page in doc]
+
+
+def split_overlap(chunks, overlap_bytes):
+    """Splits each chunk into (carried-over tail, new text), checking the tail on the way."""
+    pieces = []
+    previous = None
+    for chunk in chunks:
+        tail = chunker._overlap_tail(previous, overlap_bytes) if previous is not None else ""
+        assert chunk.startswith(tail)
+        pieces.append((tail, chunk[len(tail):]))
+        previous = chunk
+    return pieces
+
+
+@pytest.mark.parametrize("max_bytes", [900, 2500, 10000])
+def test_pdf_chunks_stay_within_max_bytes_and_keep_every_page(report_pdf, max_bytes):
+    texts = page_texts(report_pdf)
+    chunks = list(chunker.iter_text_chunks(texts, max_bytes, overlap_bytes=0))
+
+    assert len(chunks) > 1
+    assert all(len(chunk.encode("utf-8")) <= max_bytes for chunk in chunks)
+    assert "".join(chunks) == "".join(texts)
+
+
+def test_pages_that_fit_are_kept_whole(report_pdf):
+    texts = page_texts(report_pdf)
+    largest_page = max(len(text.encode("utf-8")) for text in texts)
+    chunks = list(chunker.iter_text_chunks(texts, largest_page * 2, overlap_bytes=0))
+
+    # Every chunk is a run of whole pages.
+    position = 0
+    for chunk in chunks:
+        count = next(n for n in range(1, len(texts) - position + 1) if "".join(texts[position:position + n]) == chunk)
+        position += count
+    assert position == len(texts)
+
+
+@pytest.mark.parametrize("overlap_bytes", [100, 400])
+def test_each_chunk_starts_with_the_end_of_the_previous_one(report_pdf, overlap_bytes):
+    texts = page_texts(report_pdf)
+    max_bytes = 1500
+    chunks = list(chunker.iter_text_chunks(texts, max_bytes, overlap_bytes=overlap_bytes))
+
+    assert all(len(chunk.encode("utf-8")) <= max_bytes for chunk in chunks)
+    pieces = split_overlap(chunks, overlap_bytes)
+    for (tail, new_text), previous in zip(pieces[1:], chunks):
+        assert tail and len(tail.encode("utf-8")) <= overlap_bytes
+        assert previous.endswith(tail)
+        # The overlap starts at a line boundary of the previous chunk.
+        assert previous[:-len(tail)].endswith("\n")
+        assert new_text
+    # Without the repeated tails, the chunks are exactly the document.
+    assert "".join(new_text for _, new_text in pieces) == "".join(texts)
+
+
+def test_oversized_pieces_are_split_without_breaking_characters():
+    text = "\n\n".join("é" * 300 + "\n" + "word " * 200 for _ in range(5))
+    chunks = list(chunker.iter_text_chunks([text], 700, overlap_bytes=50))
+
+    assert all(len(chunk.encode("utf-8")) <= 700 for chunk in chunks)
+    assert "".join(new_text for _, new_text in split_overlap(chunks, 50)) == text
+
+
+def test_chunks_are_yielded_before_every_page_is_read(report_pdf):
+    read = []
+
+    def pages():
+        for text in page_texts(report_pdf):
+            read.append(text)
+            yield text
+
+    chunks = chunker.iter_text_chunks(pages(), 2500, overlap_bytes=0)
+    next(chunks)
+    assert len(read) < len(page_texts(report_pdf))
+
+
+def test_a_small_pdf_is_written_as_one_full_text_chunk(report_pdf, tmp_path):
+    bucket, prefix = open_bucket(str(tmp_path))
+    outputs = chunker.process_pdf_document(report_pdf, bucket, prefix, "report.pdf", extract_tables=False,
+                                           page_workers=1)
+
+    assert [os.path.basename(name) for name in outputs] == ["report_full_text_chunk_1.txt"]
+    with open(tmp_path / "report_full_text_chunk_1.txt", encoding="utf-8") as f:
+        assert f.read() == "".join(page_texts(report_pdf))
+
+
+BUDGET_HEADER = "| Program | FY 2022 Actual | FY 2023 Enacted | FY 2024 Request | Change |"
+
+
+@pytest.fixture(scope="module")
+def table_pdf(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("pdf") / "budget.pdf")
+    synthetic.write_pdf(path, 3, tables=True)
+    return path
+
+
+def table_lines(piece):
+    """Returns the caption and the pipe-table lines of a table piece, spacing collapsed."""
+    lines = [" ".join(line.split()) for line in piece.strip().splitlines() if line.strip()]
+    return lines[0], lines[1:]
+
+
+def test_tables_are_written_as_markdown_tables(table_pdf):
+    pieces = list(chunker.iter_pdf_markdown(table_pdf, page_workers=1))
+    tables = [piece for piece in pieces if piece.startswith("\n**Table ")]
+
+    assert len(tables) == 3
+    for page_num, piece in enumerate(tables, start=1):
+        caption, lines = table_lines(piece)
+        assert caption == f"**Table {page_num} (page {page_num})**"
+        assert lines[0] == BUDGET_HEADER
+        assert lines[1].startswith("|:--")
+        assert len(lines) == 2 + 18
+        assert all(line.count("|") == 6 for line in lines)
+    # The table cells are not repeated as flattened text.
+    assert not any("FY 2023 Enacted" in piece for piece in pieces if piece not in tables)
+
+
+def test_split_tables_repeat_the_header_and_stay_within_max_bytes(table_pdf):
+    whole = [table_lines(piece)[1] for piece in chunker.iter_pdf_markdown(table_pdf, page_workers=1)
+             if piece.startswith("\n**Table ")]
+    pieces = list(chunker.iter_pdf_markdown(table_pdf, 800, page_workers=1))
+    parts = [piece for piece in pieces if piece.startswith("\n**Table 1 ")]
+
+    assert len(parts) > 1
+    assert all(len(piece.encode("utf-8")) <= 800 for piece in parts)
+    rows = []
+    for part_num, piece in enumerate(parts, start=1):
+        caption, lines = table_lines(piece)
+        assert caption == f"**Table 1 (page 1, part {part_num})**"
+        assert lines[0] == BUDGET_HEADER
+        rows.extend(lines[2:])
+    assert rows == whole[0][2:]
+
+
+def test_table_pages_are_read_the_same_across_page_workers(table_pdf, monkeypatch):
+    monkeypatch.setattr(chunker, "PDF_TABLES_PARALLEL_MIN_PAGES", 1)
+    monkeypatch.setattr(chunker, "PDF_TABLE_PAGES_PER_TASK", 1)
+
+    assert list(chunker.iter_pdf_markdown(table_pdf, page_workers=2)) == \
+        list(chunker.iter_pdf_markdown(table_pdf, page_workers=1))
+
+
+def test_process_pdf_document_writes_the_tables(table_pdf, tmp_path):
+    bucket, prefix = open_bucket(str(tmp_path))
+    outputs = chunker.process_pdf_document(table_pdf, bucket, prefix, "budget.pdf", extract_tables=True,
+                                           page_workers=1)
+
+    content = ""
+    for name in outputs:
+        with open(tmp_path / os.path.basename(name), encoding="utf-8") as f:
+            content += f.read()
+    collapsed = [" ".join(line.split()) for line in content.splitlines()]
+    assert collapsed.count(BUDGET_HEADER) == 3
+    assert "**Table 3 (page 3)**" in collapsed
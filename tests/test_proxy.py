@@ -0,0 +1,140 @@
+import gzip
+import json
+import os
+import threading
+import time
+from urllib.parse import quote
+
+import pytest
+
+import app as api
+import upstream_proxy
+from upstream_proxy import DiskCache, UpstreamProxy
+from upstream_stub import UpstreamStub
+
+
+@pytest.fixture
+def stub():
+    with UpstreamStub(delay=0.05, rows=5) as upstream:
+        yield upstream
+
+
+@pytest.fixture
+def client(stub, tmp_path, monkeypatch):
+    proxy = UpstreamProxy(cache=DiskCache(str(tmp_path / "proxy_cache")), allowed_hosts=[stub.host])
+    monkeypatch.setattr(api, "upstream_proxy", proxy)
+    return api.app.test_client()
+
+
+def get(client, url, headers=None, **params):
+    return client.get("/proxy", query_string={"url": url, **params}, headers=headers or {})
+
+
+def test_first_request_is_fetched_and_the_next_one_cached(client, stub):
+    url = f"http://{stub.host}/data/2019/acs/acs5"
+
+    first = get(client, url + "?for=state:*", get="NAME", key="abc")
+    assert first.status_code == 200
+    assert first.headers["X-Cache"] == "MISS"
+    assert json.loads(first.data)[0] == ["NAME", "state"]
+
+    # Same request with the parameters in another order and a different API key.
+    second = get(client, url + "?get=NAME&key=xyz", **{"for": "state:*"})
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.data == first.data
+    assert stub.requests == 1
+
+
+def test_gzip_body_is_served_as_is_when_accepted(client, stub):
+    url = f"http://{stub.host}/data/2019/acs/acs5"
+    plain = get(client, url, get="NAME")
+    compressed = get(client, url, headers={"Accept-Encoding": "gzip"}, get="NAME")
+
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(compressed.data) == plain.data
+    assert "Content-Encoding" not in plain.headers
+    assert "Accept-Encoding" in compressed.headers["Vary"]
+
+
+def test_concurrent_requests_share_one_upstream_fetch(client, stub):
+    stub.delay = 0.3
+    url = f"http://{stub.host}/data/2020/dec/pl"
+    statuses = []
+
+    def request():
+        statuses.append(get(client, url, get="P1_001N").headers["X-Cache"])
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert stub.requests == 1
+    assert statuses.count("MISS") == 1
+    assert statuses.count("COALESCED") == 7
+
+
+def test_upstream_errors_are_passed_through_uncached(client, stub):
+    url = f"http://{stub.host}/status/400"
+    assert get(client, url).status_code == 400
+    assert get(client, url).headers["X-Cache"] == "MISS"
+    assert stub.requests == 2
+
+
+def test_disallowed_and_malformed_urls_are_rejected(client, stub):
+    assert client.get("/proxy").status_code == 400
+    assert get(client, "file:///etc/passwd").status_code == 400
+    assert get(client, "http://example.com/data").status_code == 403
+    assert get(client, f"http://user:secret@{stub.host}/data").status_code == 400
+    assert stub.requests == 0
+
+
+def test_redirects_are_followed_only_to_allowed_hosts(client, stub):
+    target = f"http://{stub.host}/data/2019/acs/acs1?get=NAME"
+    followed = get(client, f"http://{stub.host}/redirect?to={quote(target, safe='')}")
+    assert followed.status_code == 200
+    assert json.loads(followed.data)[0] == ["NAME", "state"]
+
+    with UpstreamStub(delay=0) as elsewhere:
+        rejected = get(client, f"http://{stub.host}/redirect?to=http://{elsewhere.host}/private")
+        assert rejected.status_code == 502
+        assert elsewhere.requests == 0
+
+
+def test_slow_upstream_times_out(client, stub, monkeypatch):
+    monkeypatch.setattr(upstream_proxy, "PROXY_TIMEOUT_SECONDS", 0.2)
+    response = get(client, f"http://{stub.host}/slow/2")
+    assert response.status_code == 504
+
+
+def cached_response(body, fetched_at=None):
+    return upstream_proxy.ProxyResponse(200, "application/json", gzip.compress(body),
+                                        time.time() if fetched_at is None else fetched_at)
+
+
+def test_disk_cache_expires_old_entries(tmp_path):
+    cache = DiskCache(str(tmp_path), ttl_seconds=60)
+    cache.put("fresh", cached_response(b"[1]"))
+    cache.put("stale", cached_response(b"[2]", fetched_at=time.time() - 120))
+
+    assert cache.get("fresh").body() == b"[1]"
+    assert cache.get("fresh").cache_status == "hit"
+    assert cache.get("stale") is None
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_disk_cache_evicts_the_least_recently_used_entries(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=10 ** 6)
+    for key in ("a", "b", "c"):
+        cache.put(key, cached_response(os.urandom(200)))
+    # Last used: 'b' longest ago, then 'c', then 'a'.
+    for seconds_ago, key in ((10, "a"), (30, "b"), (20, "c")):
+        used = time.time() - seconds_ago
+        os.utime(cache._path(key), (used, used))
+
+    cache.max_bytes = sum(path.stat().st_size for path in tmp_path.iterdir()) - 1
+    cache.put("d", cached_response(b"[]"))
+
+    assert cache.get("b") is None
+    assert all(cache.get(key) is not None for key in ("a", "c", "d"))
@@ -0,0 +1,124 @@
+import json
+
+import pytest
+
+import app as api
+from response_cache import ResponseCache
+
+
+def api_paths():
+    return api.data_cache.peek().frames["API Name and Path"]
+
+
+def test_api_name_filters_dataset_names(api_client):
+    df = api_paths()
+    response = api_client.get("/query_api_paths?api_name=gi bill")
+
+    assert response.status_code == 200
+    expected = df[df["Dataset / Table Name"].str.contains("gi bill", case=False, regex=False)]
+    assert response.get_json() == expected.to_dict(orient="records")
+    assert response.headers["X-Total-Count"] == str(len(expected))
+
+    combined = api_client.get("/query_api_paths?api_name=gi bill&category=education").get_json()
+    assert combined and all(row["Categorization"] == "Education" and "GI Bill" in row["Dataset / Table Name"]
+                            for row in combined)
+
+
+def test_limit_and_offset_page_through_the_matches(api_client):
+    everything = api_client.get("/query_api_paths?category=health").get_json()
+    total = len(everything)
+
+    page = api_client.get("/query_api_paths?category=health&limit=5&offset=3")
+    assert page.status_code == 200
+    assert page.get_json() == everything[3:8]
+    assert page.headers["X-Total-Count"] == str(total)
+
+    # Paging past the last match is an empty page, not a 404: the filters did match.
+    past = api_client.get(f"/query_api_paths?category=health&offset={total}")
+    assert past.status_code == 200
+    assert past.get_json() == []
+    assert past.headers["X-Total-Count"] == str(total)
+
+    assert api_client.get("/query_api_paths?limit=0").get_json() == []
+    unfiltered = api_client.get("/query_api_paths?offset=95")
+    assert unfiltered.get_json() == api_paths().iloc[95:].to_dict(orient="records")
+    assert len(unfiltered.get_json()) == 5
+    assert unfiltered.headers["X-Total-Count"] == str(len(api_paths()))
+
+
+def test_fields_selects_columns_in_the_requested_order(api_client):
+    rows = api_client.get("/query_api_paths?category=health&fields=API Path, Categorization,API Path").get_json()
+
+    assert rows
+    assert all(list(row) == ["API Path", "Categorization"] for row in rows)
+    full = api_client.get("/query_api_paths?category=health").get_json()
+    assert rows == [{"API Path": row["API Path"], "Categorization": row["Categorization"]} for row in full]
+
+
+def test_no_matching_rows_is_a_404_with_the_sheets_message(api_client):
+    response = api_client.get("/query_api_paths?category=no such category")
+    assert response.status_code == 404
+    assert response.get_json() == {"message": "No matching API paths found for the given criteria."}
+
+    response = api_client.get("/query_census_apis_full_list?dataset_name=no such dataset")
+    assert response.status_code == 404
+    assert response.get_json() == {"message": "No matching Census APIs found for the given criteria."}
+
+
+@pytest.mark.parametrize("query, message", [
+    ("limit=-1", "must not be negative"),
+    ("limit=ten", "must be a whole number"),
+    ("offset=1.5", "must be a whole number"),
+    ("fields=API Path,Nope", "Unknown field(s) ['Nope']"),
+    ("match=regex", "'match' must be one of"),
+    ("format=csv", "'format' must be one of"),
+])
+def test_invalid_parameters_are_a_400(api_client, query, message):
+    response = api_client.get(f"/query_api_paths?category=health&{query}")
+
+    assert response.status_code == 400
+    assert message in json.dumps(response.get_json())
+
+
+def test_response_cache_evicts_by_encoded_bytes():
+    cache = ResponseCache(max_entries=100, max_bytes=1000)
+    for i in range(5):
+        cache.get_or_build(i, lambda: (200, b"x" * 300, 1))
+
+    # Only the three most recent 300-byte bodies fit in 1000 bytes.
+    assert len(cache) == 3
+    assert cache.size_bytes == 900
+    assert [key for key in range(5) if cache.peek(key) is not None] == [2, 3, 4]
+
+    # A lookup makes an entry the most recently used one.
+    cache.peek(2)
+    cache.get_or_build(5, lambda: b"y" * 300)
+    assert [key for key in range(6) if cache.peek(key) is not None] == [2, 4, 5]
+
+
+def test_response_cache_returns_but_does_not_keep_oversized_bodies():
+    cache = ResponseCache(max_entries=100, max_bytes=1000)
+    builds = []
+
+    def build():
+        builds.append(1)
+        return 200, b"x" * 1001, 1
+
+    assert cache.get_or_build("big", build)[1] == b"x" * 1001
+    cache.get_or_build("big", build)
+    assert len(builds) == 2
+    assert len(cache) == 0
+    assert cache.size_bytes == 0
+
+
+def test_pinned_responses_are_outside_the_budget():
+    cache = ResponseCache(max_entries=1, max_bytes=100)
+    with cache.pinned():
+        cache.get_or_build("whole sheet", lambda: b"x" * 500)
+    cache.get_or_build("a", lambda: b"a" * 50)
+    cache.get_or_build("b", lambda: b"b" * 50)
+
+    assert cache.peek("whole sheet") == b"x" * 500
+    assert cache.peek("a") is None
+    assert cache.peek("b") == b"b" * 50
+    assert cache.size_bytes == 50
@@ -0,0 +1,106 @@
+import math
+from collections import Counter
+
+import pandas as pd
+import pytest
+
+import synthetic
+from sheet_search import BM25_B, BM25_K1, SearchIndex, tokenize
+
+
+def brute_force_scores(frames, tokens, sheets=None):
+    """Scores every row of every sheet with BM25 straight from the cells, in float64."""
+    documents = []
+    for sheet_name, df in frames.items():
+        for row, values in enumerate(df.itertuples(index=False)):
+            words = [word for value in values if not pd.isna(value) for word in tokenize(str(value))]
+            documents.append((sheet_name, row, Counter(words), len(words)))
+
+    doc_count = len(documents)
+    average_length = sum(length for _, _, _, length in documents) / doc_count
+    scores = {}
+    for token in dict.fromkeys(tokens):
+        containing = sum(1 for _, _, counts, _ in documents if token in counts)
+        idf = math.log1p((doc_count - containing + 0.5) / (containing + 0.5))
+        for sheet_name, row, counts, length in documents:
+            tf = counts.get(token, 0)
+            if tf and (sheets is None or sheet_name in sheets):
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+                scores[(sheet_name, row)] = scores.get((sheet_name, row), 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+    return scores
+
+
+def assert_top_k(hits, expected, limit):
+    """`hits` must be a best-first top `limit` of `expected` (up to float32 rounding)."""
+    assert len(hits) == min(limit, len(expected))
+    if not hits:
+        return
+    ranked = sorted(expected.values(), reverse=True)
+    cutoff = ranked[len(hits) - 1]
+    previous = math.inf
+    for sheet_name, row, score in hits:
+        exact = expected[(sheet_name, row)]
+        assert score == pytest.approx(exact, rel=1e-4)
+        assert exact >= cutoff - 1e-4
+        assert exact <= previous + 1e-4
+        previous = exact
+    assert len(set((sheet_name, row) for sheet_name, row, _ in hits)) == len(hits)
+
+
+@pytest.fixture(scope="module")
+def frames():
+    return synthetic.make_frames(3000)
+
+
+@pytest.fixture(scope="module")
+def index(frames):
+    return SearchIndex(frames)
+
+
+QUERIES = ["veteran", "acs population 2019", "census county income poverty", "health claims",
+           "Item 7", "https api census gov data", "employment payroll business", "zbp 1999", "nothing here"]
+
+
+@pytest.mark.parametrize("text", QUERIES)
+@pytest.mark.parametrize("limit", [1, 10, 100])
+def test_search_matches_brute_force_bm25(frames, index, text, limit):
+    tokens = tokenize(text)
+    assert_top_k(index.search(tokens, limit), brute_force_scores(frames, tokens), limit)
+
+
+@pytest.mark.parametrize("text", ["veteran population", "acs 2019", "item"])
+def test_search_limited_to_sheets(frames, index, text):
+    tokens = tokenize(text)
+    sheets = {"VA Data Census Bureau APIs", "Census Bureau APIs - Full List"}
+    hits = index.search(tokens, 20, sheets)
+
+    assert hits and all(sheet_name in sheets for sheet_name, _, _ in hits)
+    assert_top_k(hits, brute_force_scores(frames, tokens, sheets), 20)
+
+
+def test_equal_scores_come_back_in_sheet_and_row_order():
+    frames = {
+        "First": pd.DataFrame({"Text": ["veteran benefits", "other", "veteran benefits", "veteran benefits"]}),
+        "Second": pd.DataFrame({"Text": ["veteran benefits", "veteran", "veteran benefits"]}),
+    }
+    index = SearchIndex(frames)
+
+    hits = index.search(["veteran", "benefits"], 4)
+    assert [(sheet_name, row) for sheet_name, row, _ in hits] == [("First", 0), ("First", 2), ("First", 3), ("Second", 0)]
+    assert len({score for _, _, score in hits}) == 1
+
+    hits = index.search(["veteran", "benefits"], 3, {"Second"})
+    assert [(sheet_name, row) for sheet_name, row, _ in hits] == [("Second", 0), ("Second", 2), ("Second", 1)]
+    assert_top_k(hits, brute_force_scores(frames, ["veteran", "benefits"], {"Second"}), 3)
+
+
+def test_search_endpoint_returns_ranked_records(api_client):
+    response = api_client.get("/search?q=acs population 2019&limit=5&sheets=Census Bureau APIs - Full List")
+
+    assert response.status_code == 200
+    results = response.get_json()
+    assert len(results) == 5
+    assert all(result["sheet"] == "Census Bureau APIs - Full List" for result in results)
+    assert [result["score"] for result in results] == sorted((result["score"] for result in results), reverse=True)
+    assert api_client.get("/search?q=%20%20").status_code == 400
+    assert api_client.get("/search?q=acs&sheets=Nope").status_code == 400
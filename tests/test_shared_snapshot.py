@@ -0,0 +1,126 @@
+import multiprocessing
+import threading
+
+import pandas as pd
+import pytest
+
+import shared_snapshot
+import snapshot_store
+from shared_snapshot import SharedSnapshotLoader
+
+
+class StubWatcher:
+    """Stands in for the SheetWatcher: returns the next of `results` from each load."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.loads = 0
+        self.adopted = None
+
+    def load(self, current_frames=None):
+        self.loads += 1
+        return self.results.pop(0) if len(self.results) > 1 else self.results[0]
+
+    def adopt(self, frames):
+        self.adopted = frames
+
+
+def make_frames(notes="veteran"):
+    return {
+        "Utilities": pd.DataFrame({"Name": ["Unzip", "Chunker"], "Notes": [notes, "markdown"]}, dtype=str),
+        "VISTA Custom GPT Actions": pd.DataFrame({"Action": ["lookup", "search"]}, dtype=str),
+    }
+
+
+def assert_same_data(frames, expected):
+    assert set(frames) == set(expected)
+    for name, df in expected.items():
+        assert frames[name].astype(object).to_dict("records") == df.astype(object).to_dict("records")
+
+
+def test_the_leader_publishes_and_a_follower_maps_the_same_version(tmp_path):
+    leader_watcher, follower_watcher = StubWatcher(make_frames()), StubWatcher(make_frames("other"))
+    leader = SharedSnapshotLoader(leader_watcher, str(tmp_path))
+    follower = SharedSnapshotLoader(follower_watcher, str(tmp_path))
+
+    frames = leader.load()
+    assert leader.is_leader
+    assert_same_data(frames, make_frames())
+    # The leader serves (and its watcher keeps) the memory-mapped copy it published.
+    assert leader_watcher.adopted is frames
+
+    followed = follower.load()
+    assert not follower.is_leader
+    assert follower_watcher.loads == 0
+    assert follower.version == leader.version == snapshot_store.current_version(str(tmp_path))
+    assert_same_data(followed, make_frames())
+
+    # Nothing new: both keep what they serve.
+    assert leader.load(frames) is None
+    assert follower.load(followed) is None
+
+
+def test_followers_pick_up_new_versions_and_reuse_unchanged_sheets(tmp_path):
+    leader = SharedSnapshotLoader(StubWatcher(make_frames(), make_frames("changed")), str(tmp_path))
+    follower = SharedSnapshotLoader(StubWatcher(None), str(tmp_path))
+    leader.load()
+    first = follower.load()
+    first_version = follower.version
+
+    leader.load(first)
+    second = follower.load(first)
+    assert follower.version != first_version
+    assert second["Utilities"]["Notes"].tolist() == ["changed", "markdown"]
+    assert second["VISTA Custom GPT Actions"] is first["VISTA Custom GPT Actions"]
+
+
+def test_a_follower_waits_for_the_first_version(tmp_path, monkeypatch):
+    monkeypatch.setattr(shared_snapshot, "SHARED_SNAPSHOT_POLL_SECONDS", 0.02)
+    follower = SharedSnapshotLoader(StubWatcher(None), str(tmp_path), can_lead=False)
+    results = []
+    waiting = threading.Thread(target=lambda: results.append(follower.load()))
+    waiting.start()
+
+    SharedSnapshotLoader(StubWatcher(make_frames()), str(tmp_path)).load()
+    waiting.join(5)
+    assert_same_data(results[0], make_frames())
+
+    monkeypatch.setattr(shared_snapshot, "SHARED_SNAPSHOT_WAIT_SECONDS", 0.05)
+    alone = SharedSnapshotLoader(StubWatcher(None), str(tmp_path / "empty"), can_lead=False)
+    with pytest.raises(RuntimeError, match="No shared snapshot"):
+        alone.load()
+
+
+def _lead_in_child(snapshot_dir, published, release):
+    loader = SharedSnapshotLoader(StubWatcher(make_frames("from the child")), snapshot_dir)
+    loader.load()
+    published.set()
+    release.wait(10)
+
+
+def test_leadership_moves_to_another_process_when_the_leader_exits(tmp_path):
+    snapshot_dir = str(tmp_path)
+    context = multiprocessing.get_context("fork")
+    published, release = context.Event(), context.Event()
+    child = context.Process(target=_lead_in_child, args=(snapshot_dir, published, release))
+    child.start()
+    try:
+        assert published.wait(10)
+        watcher = StubWatcher(make_frames("from the parent"))
+        loader = SharedSnapshotLoader(watcher, snapshot_dir)
+
+        # The child holds the lock: this process follows.
+        frames = loader.load()
+        assert not loader.is_leader
+        assert watcher.loads == 0
+        assert frames["Utilities"]["Notes"].tolist()[0] == "from the child"
+    finally:
+        release.set()
+        child.join(10)
+    assert child.exitcode == 0
+
+    # The lock died with the child, so the next refresh takes over and publishes.
+    frames = loader.load(frames)
+    assert loader.is_leader
+    assert watcher.loads == 1
+    assert frames["Utilities"]["Notes"].tolist()[0] == "from the parent"
@@ -0,0 +1,164 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import sheet_cache
+from sheet_cache import SheetCache, SheetCacheError
+
+
+class FakeClock:
+    """Stands in for the `time` module in sheet_cache, so tests move time by hand."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def perf_counter(self):
+        return self.now
+
+
+class CountingLoader:
+    """
+    A SheetCache loader that returns the next item of `results` on each call (raising
+    it if it is an exception) and counts the calls. With `gate` set, each call waits
+    for it first.
+    """
+
+    def __init__(self, *results, gate=None):
+        self.results = list(results)
+        self.calls = 0
+        self.gate = gate
+
+    def __call__(self):
+        self.calls += 1
+        if self.gate is not None:
+            self.gate.wait(5)
+        result = self.results.pop(0) if len(self.results) > 1 else self.results[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def frames(rows):
+    return {"Utilities": pd.DataFrame({"Name": [f"tool {i}" for i in range(rows)]}, dtype=str)}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(sheet_cache, "time", fake)
+    return fake
+
+
+def test_concurrent_cold_gets_share_one_load(clock):
+    gate = threading.Event()
+    loader = CountingLoader(frames(2), gate=gate)
+    cache = SheetCache(loader, ttl_seconds=60)
+    snapshots = []
+
+    threads = [threading.Thread(target=lambda: snapshots.append(cache.get())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1) # Let every thread reach the cache before the load finishes.
+    gate.set()
+    for thread in threads:
+        thread.join()
+
+    assert loader.calls == 1
+    assert len(snapshots) == 8
+    assert all(snapshot is snapshots[0] for snapshot in snapshots)
+    assert snapshots[0].version == 1
+
+
+def test_stale_get_returns_the_old_snapshot_and_schedules_one_refresh(clock):
+    loader = CountingLoader(frames(1), frames(2))
+    prepared = []
+    cache = SheetCache(loader, prepare=prepared.append, ttl_seconds=60)
+    first = cache.get()
+
+    clock.now += 30
+    scheduled = []
+    assert cache.get(runner=scheduled.append) is first
+    assert scheduled == []
+
+    clock.now += 31
+    assert cache.get(runner=scheduled.append) is first
+    assert cache.get(runner=scheduled.append) is first
+    assert len(scheduled) == 1
+
+    scheduled[0]()
+    second = cache.get()
+    assert loader.calls == 2
+    assert second is not first
+    assert second.version == 2
+    assert len(second.frames["Utilities"]) == 2
+    assert prepared == [first, second]
+
+
+def test_failed_cold_load_backs_off_before_retrying(clock):
+    loader = CountingLoader(RuntimeError("Sheets unavailable"), RuntimeError("still down"), frames(1))
+    cache = SheetCache(loader, ttl_seconds=60, min_backoff_seconds=5, max_backoff_seconds=60)
+
+    with pytest.raises(SheetCacheError, match="Sheets unavailable"):
+        cache.get()
+    with pytest.raises(SheetCacheError):
+        cache.get()
+    assert loader.calls == 1
+
+    # The second failure doubles the wait.
+    clock.now += 5
+    with pytest.raises(SheetCacheError, match="still down"):
+        cache.get()
+    clock.now += 5
+    with pytest.raises(SheetCacheError):
+        cache.get()
+    assert loader.calls == 2
+
+    clock.now += 5
+    assert cache.get().version == 1
+    assert loader.calls == 3
+    assert cache.last_error is None
+
+
+def test_failed_refresh_keeps_serving_the_last_good_snapshot(clock):
+    loader = CountingLoader(frames(1), RuntimeError("quota exceeded"))
+    cache = SheetCache(loader, ttl_seconds=60, min_backoff_seconds=5)
+    first = cache.get()
+
+    clock.now += 61
+    scheduled = []
+    assert cache.get(runner=scheduled.append) is first
+    scheduled[0]()
+    assert cache.get(runner=scheduled.append) is first
+    assert str(cache.last_error) == "quota exceeded"
+    # Still stale, but inside the backoff window: no new refresh.
+    assert len(scheduled) == 1
+
+    clock.now += 5
+    assert cache.get(runner=scheduled.append) is first
+    assert len(scheduled) == 2
+
+
+def test_unchanged_result_keeps_the_snapshot_and_renews_it(clock):
+    loader = CountingLoader(frames(1), None)
+    cache = SheetCache(loader, ttl_seconds=60)
+    first = cache.get()
+
+    clock.now += 61
+    assert cache.refresh_now() is first
+    assert first.version == 1
+    assert first.loaded_at == clock.now
+
+    scheduled = []
+    assert cache.get(runner=scheduled.append) is first
+    assert scheduled == []
+
+
+def test_unchanged_result_without_a_snapshot_is_an_error(clock):
+    cache = SheetCache(CountingLoader(None), ttl_seconds=60)
+    with pytest.raises(SheetCacheError, match="no changes"):
+        cache.get()
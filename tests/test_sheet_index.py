@@ -0,0 +1,89 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sheet_index import ColumnIndex
+
+
+def synthetic_column(rows=3000, seed=0):
+    """
+    A column like the sheet's text columns: repeated values in mixed case, plus blank
+    and missing cells, numbers, regex metacharacters and non-ASCII text.
+    """
+    rng = random.Random(seed)
+    words = ["Health", "Benefits & Claims", "VetPop", "COVID-19", "acs5", "api.census.gov/data/2019",
+             "Démographie", "a.c", "abc", "(beta)", "cost*", "[draft]", "x+y", "50%", "Ab", "a", ""]
+    values = []
+    for _ in range(rows):
+        roll = rng.random()
+        if roll < 0.05:
+            values.append(None)
+        elif roll < 0.08:
+            values.append(np.nan)
+        elif roll < 0.1:
+            values.append(rng.randint(0, 2020))
+        else:
+            parts = rng.sample(words, rng.randint(1, 3))
+            text = " ".join(parts)
+            values.append(text.upper() if rng.random() < 0.2 else text)
+    return pd.Series(values, dtype=object)
+
+
+NEEDLES = ["a", "A", "ab", "é", "hea", "HEALTH", "claims", "covid-19", "2019", "census.gov/data", "démo",
+           ".", "a.c", "(", "(beta)", "*", "cost*", "[", "x+y", "%", "&", "not there", "  ", "a a"]
+
+
+def reference_rows(values, needle):
+    # The semantics the index replaces, without the old regex interpretation.
+    return np.flatnonzero(values.str.contains(needle, case=False, na=False, regex=False).to_numpy())
+
+
+@pytest.mark.parametrize("dtype", ["object", "category", "str"])
+def test_contains_matches_str_contains(dtype):
+    values = synthetic_column()
+    if dtype == "str":
+        # The loader's string columns (Arrow-backed strings), which hold no numbers.
+        values = pd.Series([v if isinstance(v, str) else None for v in values], dtype="str")
+    index = ColumnIndex(values.astype(dtype) if dtype == "category" else values, modes=("contains", "fuzzy"))
+
+    for needle in NEEDLES:
+        assert index.lookup(needle).tolist() == reference_rows(values, needle).tolist(), needle
+
+
+def test_prefix_and_exact_match_the_lowercased_values():
+    values = synthetic_column(seed=1)
+    index = ColumnIndex(values, modes=("prefix", "exact"))
+    lowered = [v.lower() if isinstance(v, str) else None for v in values]
+
+    for needle in NEEDLES:
+        needle_lower = needle.lower()
+        expected = [row for row, v in enumerate(lowered) if v is not None and v.startswith(needle_lower)]
+        assert index.lookup(needle, "prefix").tolist() == expected, needle
+        expected = [row for row, v in enumerate(lowered) if v == needle_lower]
+        assert index.lookup(needle, "exact").tolist() == expected, needle
+
+
+def test_regex_metacharacters_are_literal():
+    values = pd.Series(["abc", "a.c", "A*C", "ac"], dtype=object)
+    index = ColumnIndex(values)
+
+    # As a regular expression 'a.c' would also match 'abc', and '(' would be an error.
+    assert index.lookup("a.c").tolist() == [1]
+    assert index.lookup("*").tolist() == [2]
+    assert index.lookup("(").tolist() == []
+
+
+def test_year_matches_whole_four_digit_numbers():
+    values = pd.Series(["api.census.gov/data/2019/acs/acs1", "api.census.gov/data/12019",
+                        "timeseries/2019-2020", None], dtype=object)
+    index = ColumnIndex(values, modes=("year",))
+
+    assert index.lookup("2019", "year").tolist() == [0, 2]
+    assert index.lookup("2020", "year").tolist() == [2]
+
+
+def test_unsupported_mode_is_rejected():
+    with pytest.raises(ValueError):
+        ColumnIndex(pd.Series(["a"], dtype=object)).lookup("a", "prefix")
@@ -0,0 +1,207 @@
+import gspread
+import pandas as pd
+import pytest
+
+from fake_spreadsheet import FakeSpreadsheet
+from sheet_loader import WORKSHEET_SCHEMAS, WorksheetSchema, fetch_worksheet_values, load_worksheets
+from sheet_watcher import SheetWatcher
+
+
+SCHEMAS = [
+    WorksheetSchema("API Name and Path", header_row=2, categorical=["Categorization"]),
+    WorksheetSchema("Utilities"),
+    WorksheetSchema("Bob's Sheet"),
+]
+
+
+def make_values():
+    return {
+        "API Name and Path": [
+            ["VA APIs"],
+            ["Categorization", "API Name", "API Path"],
+            ["Health", "Facilities", "/facilities"],
+            ["Benefits", "Claims"], # Trailing blank cells are omitted by the API.
+        ],
+        "Utilities": [
+            ["Name", "Notes", "Notes"],
+            ["Unzip", "PAR archives", "streams"],
+        ],
+        "Bob's Sheet": [
+            ["Name"],
+        ],
+    }
+
+
+def sheet_names():
+    return [schema.name for schema in SCHEMAS]
+
+
+def test_fetch_reads_every_worksheet_in_one_batch():
+    spreadsheet = FakeSpreadsheet(make_values())
+    result = fetch_worksheet_values(spreadsheet, sheet_names())
+
+    assert result.mode == "batch"
+    assert [call[0] for call in spreadsheet.calls] == ["batch"]
+    assert spreadsheet.calls[0][1][2] == "'Bob''s Sheet'"
+    assert result.values["API Name and Path"][3] == ["Benefits", "Claims"]
+    assert set(result.timings) == set(sheet_names())
+
+
+def test_fetch_falls_back_to_one_request_per_worksheet():
+    spreadsheet = FakeSpreadsheet(make_values())
+    result = fetch_worksheet_values(spreadsheet, sheet_names() + ["Removed Sheet"], max_workers=2)
+
+    assert result.mode == "parallel"
+    assert set(result.values) == set(sheet_names())
+    assert isinstance(result.errors["Removed Sheet"], gspread.exceptions.WorksheetNotFound)
+    assert sorted(call[1] for call in spreadsheet.calls if call[0] == "worksheet") == sorted(sheet_names())
+
+
+def test_load_worksheets_builds_typed_frames():
+    frames, fetched = load_worksheets(FakeSpreadsheet(make_values()), SCHEMAS)
+
+    paths = frames["API Name and Path"]
+    assert list(paths.columns) == ["Categorization", "API Name", "API Path"]
+    assert paths["Categorization"].dtype == "category"
+    assert paths.iloc[1].tolist() == ["Benefits", "Claims", ""]
+    assert list(frames["Utilities"].columns) == ["Name", "Notes", "Notes_1"]
+    # A worksheet with headers but no data rows is left out.
+    assert "Bob's Sheet" not in frames
+    assert not fetched.errors
+
+
+def workbook_values():
+    """Two data rows for every worksheet in WORKSHEET_SCHEMAS, with numeric-looking cells."""
+    return {
+        "API Name and Path": [
+            ["VA APIs"],
+            ["Categorization", "Source", "API Name", "API Path"],
+            ["Health", "VA", "Facilities", "/facilities"],
+            ["Benefits", "VA", "Claims", "/claims"],
+            ["Health", "Lighthouse", "Appeals", "/appeals"],
+        ],
+        "VA Data Census Bureau APIs": [
+            ["Dataset", "Year", "Rows"],
+            ["VetPop", "2019", "1200"],
+            ["ACS", "", "3.5"],
+        ],
+        "Census Bureau APIs - Full List": [
+            ["Census APIs"],
+            ["Dataset Name", "Dataset Type", "API Base URL"],
+            ["acs5", "Aggregate", "api.census.gov/data/2019/acs/acs5"],
+            ["cps", "Microdata", "api.census.gov/data/2019/cps"],
+            ["pep", "Aggregate", "api.census.gov/data/2019/pep"],
+        ],
+        "VISTA Custom GPT Actions": [
+            ["Action", "Version"],
+            ["lookup", "2"],
+            ["search", "10"],
+        ],
+        "Utilities": [
+            ["Name", "Size MB"],
+            ["Unzip", "12"],
+            ["Chunker", "0.5"],
+        ],
+    }
+
+
+def test_worksheet_schemas_keep_text_and_categorize_the_declared_columns():
+    frames, fetched = load_worksheets(FakeSpreadsheet(workbook_values()))
+
+    assert set(frames) == {schema.name for schema in WORKSHEET_SCHEMAS}
+    assert not fetched.errors
+
+    # Category codes index the sorted categories.
+    categorization = frames["API Name and Path"]["Categorization"]
+    assert list(categorization.cat.categories) == ["Benefits", "Health"]
+    assert categorization.cat.codes.tolist() == [1, 0, 1]
+    assert frames["API Name and Path"]["Source"].cat.codes.tolist() == [1, 1, 0]
+    dataset_type = frames["Census Bureau APIs - Full List"]["Dataset Type"]
+    assert list(dataset_type.cat.categories) == ["Aggregate", "Microdata"]
+    assert dataset_type.cat.codes.tolist() == [0, 1, 0]
+
+    # Every other column is text, numeric-looking cells included (get_all_records()
+    # used to turn these into numbers).
+    categorical = {"Categorization", "Source", "Dataset Type"}
+    for name, df in frames.items():
+        for column in df.columns:
+            if column not in categorical:
+                assert pd.api.types.is_string_dtype(df[column]), (name, column)
+    assert frames["VA Data Census Bureau APIs"].to_dict("records") == [
+        {"Dataset": "VetPop", "Year": "2019", "Rows": "1200"},
+        {"Dataset": "ACS", "Year": "", "Rows": "3.5"},
+    ]
+    assert frames["VISTA Custom GPT Actions"]["Version"].tolist() == ["2", "10"]
+    assert frames["Utilities"]["Size MB"].tolist() == ["12", "0.5"]
+
+
+def test_declared_dtypes_are_applied():
+    schema = WorksheetSchema("Utilities", dtypes={"Size MB": "Float64"})
+    frames, _ = load_worksheets(FakeSpreadsheet(workbook_values()), [schema])
+
+    assert frames["Utilities"]["Size MB"].dtype == "Float64"
+    assert frames["Utilities"]["Size MB"].tolist() == [12.0, 0.5]
+
+
+def test_watcher_skips_the_fetch_while_the_revision_is_unchanged():
+    spreadsheet = FakeSpreadsheet(make_values())
+    opened = []
+    watcher = SheetWatcher(lambda: opened.append(1) or spreadsheet, SCHEMAS)
+
+    frames = watcher.load()
+    assert set(frames) == {"API Name and Path", "Utilities"}
+    assert watcher.revision == spreadsheet.revision
+
+    spreadsheet.calls.clear()
+    assert watcher.load(frames) is None
+    assert spreadsheet.calls == [("revision",)]
+    assert watcher.changed == []
+    assert len(opened) == 1
+
+
+def test_watcher_rebuilds_only_the_changed_worksheets():
+    spreadsheet = FakeSpreadsheet(make_values())
+    watcher = SheetWatcher(lambda: spreadsheet, SCHEMAS)
+    first = watcher.load()
+
+    # A new revision whose values are unchanged (e.g. a formatting edit).
+    spreadsheet.revision = "2024-01-02T00:00:00Z"
+    assert watcher.load(first) is None
+
+    spreadsheet.revision = "2024-01-03T00:00:00Z"
+    spreadsheet.values["Utilities"].append(["Restructure", "moves files", ""])
+    spreadsheet.calls.clear()
+    second = watcher.load(first)
+    assert watcher.changed == ["Utilities"]
+    # Every worksheet is fetched again; only the changed one is parsed.
+    assert [call[0] for call in spreadsheet.calls] == ["revision", "batch"]
+    assert len(spreadsheet.calls[1][1]) == len(SCHEMAS)
+    assert second["API Name and Path"] is first["API Name and Path"]
+    assert len(second["Utilities"]) == 2
+
+
+def test_watcher_republishes_frames_the_cache_is_not_serving():
+    spreadsheet = FakeSpreadsheet(make_values())
+    watcher = SheetWatcher(lambda: spreadsheet, SCHEMAS)
+    frames = watcher.load()
+
+    assert watcher.load(current_frames={}) is frames
+
+
+def test_watcher_reopens_the_spreadsheet_after_a_failed_load():
+    spreadsheet = FakeSpreadsheet(make_values())
+    opened = []
+    watcher = SheetWatcher(lambda: opened.append(1) or spreadsheet, SCHEMAS)
+    frames = watcher.load()
+
+    spreadsheet.revision = "2024-01-02T00:00:00Z"
+    spreadsheet.batch_fails = True
+    del spreadsheet.values["Utilities"]
+    with pytest.raises(RuntimeError):
+        watcher.load(frames)
+    assert watcher.revision == "2024-01-01T00:00:00Z"
+
+    spreadsheet.batch_fails = False
+    spreadsheet.values = make_values()
+    assert watcher.load(frames) is None
+    assert len(opened) == 2
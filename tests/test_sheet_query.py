@@ -0,0 +1,123 @@
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app as api
+from sheet_index import ColumnIndex, sort_rows
+
+
+def frame(sheet_name):
+    return api.data_cache.peek().frames[sheet_name]
+
+
+def records(df):
+    return df.to_dict(orient="records")
+
+
+def census(api_client, query):
+    return api_client.get(f"/query_census_apis_full_list?{query}")
+
+
+@pytest.mark.parametrize("year", ["2019", "1999"])
+def test_four_digit_year_matches_whole_years(api_client, year):
+    df = frame("Census Bureau APIs - Full List")
+    pattern = re.compile(rf"(?<!\d){year}(?!\d)")
+    expected = df[[bool(pattern.search(url)) for url in df["API Base URL"]]]
+
+    response = census(api_client, f"year={year}")
+    assert response.status_code == 200
+    assert response.get_json() == records(expected)
+
+
+@pytest.mark.parametrize("year", ["201", "12019", "19", "data/20"])
+def test_other_year_values_are_substring_matches(api_client, year):
+    df = frame("Census Bureau APIs - Full List")
+    expected = df[df["API Base URL"].str.contains(year, case=False, regex=False)]
+
+    response = census(api_client, f"year={year}")
+    assert response.status_code == (200 if len(expected) else 404)
+    if len(expected):
+        assert response.get_json() == records(expected)
+        assert census(api_client, f"year={year}&match=contains").get_json() == records(expected)
+
+
+def test_year_combines_with_other_filters(api_client):
+    df = frame("Census Bureau APIs - Full List")
+    expected = df[df["API Base URL"].str.contains("/2019/", regex=False)
+                  & df["Dataset Name"].str.contains("acs5", case=False, regex=False)]
+
+    assert census(api_client, "year=2019&dataset_name=ACS5").get_json() == records(expected)
+
+
+@pytest.mark.parametrize("sort", ["Dataset Type", "-Dataset Type", "Dataset Type,-API Base URL",
+                                  "-Dataset Name,Dataset Type"])
+def test_sort_orders_rows_like_a_stable_case_insensitive_sort(api_client, sort):
+    df = frame("Census Bureau APIs - Full List")
+    rows = records(df[df["Dataset Name"].str.contains("acs", case=False, regex=False)])
+    # Stable sorts from the least to the most significant column.
+    for item in reversed(sort.split(",")):
+        column = item.lstrip("-")
+        rows = sorted(rows, key=lambda row: row[column].lower(), reverse=item.startswith("-"))
+
+    response = census(api_client, f"dataset_name=acs&sort={sort}")
+    assert response.status_code == 200
+    assert response.get_json() == rows
+
+    paged = census(api_client, f"dataset_name=acs&sort={sort}&limit=7&offset=3")
+    assert paged.get_json() == rows[3:10]
+
+
+def test_blank_cells_sort_last_in_both_directions():
+    values = pd.Series(["b", "", "A", None, "c", "a"], dtype=object)
+    index = {"Name": ColumnIndex(values, modes=("contains", "sort"))}
+    rows = np.arange(len(values))
+
+    assert sort_rows(index, rows, [("Name", False)]).tolist() == [2, 5, 0, 4, 1, 3]
+    assert sort_rows(index, rows, [("Name", True)]).tolist() == [4, 0, 2, 5, 1, 3]
+
+
+def test_sort_by_an_undeclared_column_is_a_400(api_client):
+    response = api_client.get("/query_api_paths?sort=operationId")
+
+    assert response.status_code == 400
+    assert "Cannot sort by 'operationId'" in response.get_json()["error"]
+
+
+def test_exact_and_prefix_matching(api_client):
+    df = frame("API Name and Path")
+    lowered = df["Categorization"].astype(str).str.lower()
+
+    exact = api_client.get("/query_api_paths?category=benefits %26 claims&match=exact").get_json()
+    assert exact == records(df[lowered == "benefits & claims"])
+    assert api_client.get("/query_api_paths?category=benefits&match=exact").status_code == 404
+
+    prefix = api_client.get("/query_api_paths?category=ED&match=prefix").get_json()
+    assert prefix == records(df[lowered.str.startswith("ed")])
+
+
+def test_sheets_lists_every_sheet_and_its_filters(api_client):
+    sheets = {sheet["name"]: sheet for sheet in api_client.get("/sheets").get_json()}
+
+    assert set(sheets) == {"api-paths", "census-apis", "va-census-apis", "gpt-actions", "utilities"}
+    year = next(f for f in sheets["census-apis"]["filters"] if f["param"] == "year")
+    assert year == {"param": "year", "column": "API Base URL", "modes": ["year", "contains"]}
+    assert [f["param"] for f in sheets["utilities"]["filters"]] == ["name", "notes"]
+    assert sheets["utilities"]["sort"] == ["Name", "Notes"]
+
+
+def test_generic_sheet_queries(api_client):
+    df = frame("VA Data Census Bureau APIs")
+    expected = records(df[df["Notes"].str.contains("veteran", case=False, regex=False)])
+
+    response = api_client.get("/sheets/va-census-apis/query?notes=Veteran")
+    assert response.status_code == 200
+    assert response.get_json() == expected
+    # The worksheet title works as well as the URL name.
+    assert api_client.get("/sheets/VA Data Census Bureau APIs/query?notes=Veteran").get_json() == expected
+    assert api_client.get("/sheets/utilities/query").get_json() == records(frame("Utilities"))
+
+    unknown = api_client.get("/sheets/nope/query")
+    assert unknown.status_code == 404
+    assert "Available sheets" in unknown.get_json()["error"]
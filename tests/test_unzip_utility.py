@@ -0,0 +1,182 @@
+import hashlib
+import io
+import os
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import unzip_utility
+
+
+class ArchiveServer:
+    """
+    Serves in-memory files from a local http.server with an ETag, and honours Range
+    requests guarded by If-Range, like the va.gov archive host. Every request is
+    recorded in `requests` as (method, path, Range header).
+    """
+
+    def __init__(self):
+        self.files = {}
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _answer(self, send_body):
+                server.requests.append((self.command, self.path, self.headers.get("Range")))
+                body = server.files.get(self.path)
+                if body is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                etag = '"' + hashlib.md5(body).hexdigest() + '"'
+                start = 0
+                requested = self.headers.get("Range")
+                if requested and self.headers.get("If-Range") == etag:
+                    start = int(requested[len("bytes="):].split("-")[0])
+                    if start >= len(body):
+                        self.send_response(416)
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+                else:
+                    self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Type", "application/zip")
+                self.send_header("Content-Length", str(len(body) - start))
+                self.end_headers()
+                if send_body:
+                    self.wfile.write(body[start:])
+
+            def do_HEAD(self):
+                self._answer(send_body=False)
+
+            def do_GET(self):
+                self._answer(send_body=True)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def gets(self):
+        return [request for request in self.requests if request[0] == "GET"]
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def make_zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+MEMBERS = {
+    "FY-2010/report.pdf": os.urandom(64 * 1024),
+    "FY-2010/tables/budget.xlsx": b"budget " * 5000,
+    "readme.txt": b"Performance and Accountability Report",
+}
+
+
+@pytest.fixture
+def server():
+    archive_server = ArchiveServer()
+    archive_server.files["/FY-2010_PAR.zip"] = make_zip(MEMBERS)
+    yield archive_server
+    archive_server.close()
+
+
+def read(folder, name):
+    with open(os.path.join(folder, *name.split("/")), "rb") as f:
+        return f.read()
+
+
+def test_extracts_every_member(server, tmp_path):
+    destination = str(tmp_path)
+    url = server.base_url + "/FY-2010_PAR.zip"
+
+    assert unzip_utility.download_and_unzip(url, destination, extract_workers=2) == "extracted"
+    for name, content in MEMBERS.items():
+        assert read(destination, name) == content
+    # The archive itself is removed once extracted.
+    assert not os.listdir(os.path.join(destination, unzip_utility.DOWNLOADS_SUBFOLDER))
+
+
+def test_unchanged_archive_is_skipped(server, tmp_path):
+    destination = str(tmp_path)
+    url = server.base_url + "/FY-2010_PAR.zip"
+    unzip_utility.download_and_unzip(url, destination)
+
+    assert unzip_utility.download_and_unzip(url, destination) == "skipped"
+    assert len(server.gets()) == 1
+
+
+def test_changed_or_deleted_files_are_extracted_again(server, tmp_path):
+    destination = str(tmp_path)
+    url = server.base_url + "/FY-2010_PAR.zip"
+    unzip_utility.download_and_unzip(url, destination)
+
+    os.remove(os.path.join(destination, "readme.txt"))
+    assert unzip_utility.download_and_unzip(url, destination) == "extracted"
+    assert read(destination, "readme.txt") == MEMBERS["readme.txt"]
+
+    server.files["/FY-2010_PAR.zip"] = make_zip({"readme.txt": b"revised"})
+    assert unzip_utility.download_and_unzip(url, destination) == "extracted"
+    assert read(destination, "readme.txt") == b"revised"
+
+
+def test_interrupted_download_resumes_where_it_stopped(server, tmp_path):
+    destination = str(tmp_path)
+    url = server.base_url + "/FY-2010_PAR.zip"
+    body = server.files["/FY-2010_PAR.zip"]
+    etag = '"' + hashlib.md5(body).hexdigest() + '"'
+
+    # What an interrupted earlier attempt leaves behind.
+    archive_path = os.path.join(destination, unzip_utility.DOWNLOADS_SUBFOLDER, "FY-2010_PAR.zip")
+    os.makedirs(os.path.dirname(archive_path))
+    with open(f"{archive_path}.part", "wb") as f:
+        f.write(body[:1000])
+    unzip_utility._write_json(f"{archive_path}.part.json", {"url": url, "validator": etag})
+
+    assert unzip_utility.download_and_unzip(url, destination) == "extracted"
+    assert server.gets() == [("GET", "/FY-2010_PAR.zip", "bytes=1000-")]
+    for name, content in MEMBERS.items():
+        assert read(destination, name) == content
+
+
+def test_partial_download_of_a_replaced_archive_starts_over(server, tmp_path):
+    destination = str(tmp_path)
+    url = server.base_url + "/FY-2010_PAR.zip"
+
+    archive_path = os.path.join(destination, unzip_utility.DOWNLOADS_SUBFOLDER, "FY-2010_PAR.zip")
+    os.makedirs(os.path.dirname(archive_path))
+    with open(f"{archive_path}.part", "wb") as f:
+        f.write(b"x" * 1000)
+    unzip_utility._write_json(f"{archive_path}.part.json", {"url": url, "validator": '"stale"'})
+
+    assert unzip_utility.download_and_unzip(url, destination) == "extracted"
+    assert read(destination, "readme.txt") == MEMBERS["readme.txt"]
+
+
+def test_missing_archive_is_reported(server, tmp_path):
+    assert unzip_utility.download_and_unzip(server.base_url + "/FY-1999_PAR.zip", str(tmp_path)) == "missing"
+
+
+def test_download_all_shares_one_session(server, tmp_path):
+    server.files["/FY-2011_PAR.zip"] = make_zip({"FY-2011/report.pdf": b"2011"})
+    urls = unzip_utility.archive_urls(2009, 2011, server.base_url + "/FY-{}_PAR.zip")
+
+    statuses = unzip_utility.download_and_unzip_all(urls, str(tmp_path), download_workers=3, extract_workers=2)
+    assert statuses == {urls[0]: "extracted", urls[1]: "extracted", urls[2]: "missing"}
+    assert read(str(tmp_path), "FY-2011/report.pdf") == b"2011"